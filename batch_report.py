@@ -0,0 +1,52 @@
+import argparse
+import os
+import time
+
+from modules.dataset import find_dataset_path
+from modules.reports import REPORT_FORMATS, run_batch, write_batch_summary
+
+# Headless: only the Streamlit-free engines in modules/ are imported here,
+# so this runs from cron on a batch box without a browser session.
+output_reports = "reports"
+
+
+def generate_reports(dataset, out_dir, states, formats, workers, top_n):
+    """Nightly per-state packs: metrics, top districts, anomaly lists, forecasts."""
+    dataset = dataset or find_dataset_path()
+    if not dataset:
+        print("❌ No dataset found. Please run 'convert_data.py' first.")
+        return
+
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    print(f"🔄 Building state reports from '{dataset}' with {workers} worker(s)...")
+    start = time.perf_counter()
+    summaries = []
+    for summary in run_batch(out_dir, dataset, states=states, formats=formats, workers=workers, top_n=top_n):
+        summaries.append(summary)
+        icon = {'ok': '✅', 'empty': '⚠️'}.get(summary['status'], '❌')
+        detail = summary.get('error') or f"{summary['rows']:,} rows"
+        print(f"   {icon} {summary['state']}: {detail} ({summary['seconds']:.1f}s)")
+    elapsed = time.perf_counter() - start
+
+    report = write_batch_summary(out_dir, summaries, elapsed, workers)
+    print(f"✅ DONE! {report['states_ok']}/{report['states']} states, {report['rows']:,} rows "
+          f"in {elapsed:.1f}s ({report['states_per_second'] or 0:.2f} states/s) → '{out_dir}/'")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write per-state UIDAI report packs without Streamlit.")
+    parser.add_argument("--dataset", default=None,
+                        help="Dataset directory or Parquet file (default: the one the app uses).")
+    parser.add_argument("--output", default=output_reports,
+                        help="Output directory; one sub-folder per state plus summary.json.")
+    parser.add_argument("--states", nargs="+", default=None,
+                        help="Only these states (default: every state in the dataset).")
+    parser.add_argument("--formats", nargs="+", choices=REPORT_FORMATS, default=list(REPORT_FORMATS),
+                        help="Table formats to write.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: all cores, 1 = in-process).")
+    parser.add_argument("--top", type=int, default=10,
+                        help="Districts per age group in the ranking.")
+    args = parser.parse_args()
+
+    generate_reports(args.dataset, args.output, args.states, args.formats, args.workers, args.top)
@@ -0,0 +1,66 @@
+"""
+Benchmark: per-row clean_coordinate (.apply) vs vectorised clean_coordinates.
+
+Run from the project root:
+    python -m benchmarks.bench_coordinates --rows 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules.data_processor import clean_coordinate, clean_coordinates
+
+
+def make_messy_coordinates(n_rows, seed=42):
+    """Mix of floats, NaN, hemisphere-suffixed text and garbage, like raw mapping files."""
+    rng = np.random.default_rng(seed)
+    values = rng.uniform(8.0, 35.0, n_rows).round(4)
+    kind = rng.integers(0, 10, n_rows)
+    column = pd.Series(values, dtype=object)
+    column[kind == 0] = np.nan
+    column[kind == 1] = [f"{v}N" for v in values[kind == 1]]
+    column[kind == 2] = [f"{v} S" for v in values[kind == 2]]
+    column[kind == 3] = "NA"
+    column[kind == 4] = [str(v) for v in values[kind == 4]]
+    # Raw CSVs read with dtype=str: every value is text (or missing)
+    text = column.where(column.isna(), column.astype(str)).astype('string')
+    return column, text, pd.Series(values)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    messy, text, numeric = make_messy_coordinates(args.rows)
+
+    old_messy, t_old_messy = timed(lambda s: s.apply(clean_coordinate), messy)
+    new_messy, t_new_messy = timed(clean_coordinates, messy)
+    old_text, t_old_text = timed(lambda s: s.apply(clean_coordinate), text)
+    new_text, t_new_text = timed(clean_coordinates, text)
+    old_float, t_old_float = timed(lambda s: s.apply(clean_coordinate), numeric)
+    new_float, t_new_float = timed(clean_coordinates, numeric)
+
+    assert np.array_equal(old_messy.to_numpy(dtype=float), new_messy.to_numpy()), "messy column mismatch"
+    assert np.array_equal(old_text.to_numpy(dtype=float), new_text.to_numpy()), "text column mismatch"
+    assert np.array_equal(old_float.to_numpy(dtype=float), new_float.to_numpy()), "float column mismatch"
+
+    print(f"{args.rows:,} rows")
+    print(f"  messy object column : apply {t_old_messy:7.3f}s | vectorised {t_new_messy:7.3f}s "
+          f"| {t_old_messy / t_new_messy:6.1f}x")
+    print(f"  text (CSV) column   : apply {t_old_text:7.3f}s | vectorised {t_new_text:7.3f}s "
+          f"| {t_old_text / t_new_text:6.1f}x")
+    print(f"  float64 column      : apply {t_old_float:7.3f}s | vectorised {t_new_float:7.3f}s "
+          f"| {t_old_float / t_new_float:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark: per-row CircleMarker loop vs the bulk GeoJSON signal layer.
+
+Run from the project root:
+    python -m benchmarks.bench_markers --sizes 10000 100000 1000000
+The per-row loop is only timed up to --legacy-max points (it is minutes
+per million markers); larger sizes report the bulk path alone.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules.map_utils import create_base_map, add_signals
+
+
+def make_points(n_points, seed=7):
+    """Pincode-like points across India with skewed counts."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'lat': rng.uniform(8.0, 35.0, n_points),
+        'lon': rng.uniform(68.0, 97.0, n_points),
+        'district': rng.choice([f"District {i}" for i in range(750)], n_points),
+        'age_0_5': rng.pareto(1.5, n_points).round() * 10,
+    })
+
+
+def measure(data, bulk):
+    """Seconds to build the layer, seconds to render HTML, HTML size in MB."""
+    m = create_base_map([22.0, 78.0], 5)
+    start = time.perf_counter()
+    add_signals(m, data, 'age_0_5', bulk=bulk)
+    built = time.perf_counter()
+    html = m.get_root().render()
+    rendered = time.perf_counter()
+    return built - start, rendered - built, len(html.encode('utf-8')) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max", type=int, default=10_000)
+    args = parser.parse_args()
+
+    print(f"{'points':>10} | {'path':<7} | {'build s':>8} | {'render s':>8} | {'HTML MB':>8}")
+    for size in args.sizes:
+        data = make_points(size)
+        paths = [('bulk', True)] + ([('legacy', False)] if size <= args.legacy_max else [])
+        for label, bulk in paths:
+            build_s, render_s, html_mb = measure(data, bulk)
+            print(f"{size:>10,} | {label:<7} | {build_s:8.2f} | {render_s:8.2f} | {html_mb:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark: per-pincode lambda rolling vs the cumulative-sum rolling kernel
+behind intelligence.get_rolling_anomalies.
+
+Run from the project root:
+    python -m benchmarks.bench_rolling --rows 100000 1000000 --pincodes 19000
+Each size also checks that both paths flag the same rows with the same
+rolling mean, std and z-score.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules.intelligence import get_rolling_anomalies
+
+
+def reference_rolling_anomalies(df, age_col, window=14):
+    """The previous implementation: two groupby-transform lambdas after a full sort."""
+    if df.empty: return pd.DataFrame()
+    df_sorted = df.sort_values(['pincode', 'date'])
+    group = df_sorted.groupby('pincode')[age_col]
+    df_sorted['rolling_avg'] = group.transform(lambda x: x.rolling(window=window, min_periods=1).mean())
+    df_sorted['rolling_std'] = group.transform(lambda x: x.rolling(window=window, min_periods=1).std())
+    df_sorted['rolling_z'] = (df_sorted[age_col] - df_sorted['rolling_avg']) / (df_sorted['rolling_std'] + 1e-6)
+    return df_sorted[df_sorted['rolling_z'] > 3].sort_values(by='date', ascending=False)
+
+
+def make_rows(n_rows, n_pincodes, seed=11):
+    """Daily pincode rows with occasional spikes, like the engine frame."""
+    rng = np.random.default_rng(seed)
+    pincodes = rng.choice(np.arange(110001, 110001 + n_pincodes * 7, 7, dtype=np.uint32), n_rows)
+    counts = rng.poisson(20, n_rows)
+    spikes = rng.random(n_rows) < 0.01
+    counts[spikes] *= 10
+    return pd.DataFrame({
+        'date': pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 365, n_rows), unit='D'),
+        'pincode': pincodes,
+        'age_0_5': counts,
+    })
+
+
+def same_result(a, b):
+    if len(a) != len(b) or not a.index.equals(b.index):
+        return False
+    return all(np.allclose(a[c], b[c], rtol=1e-9, atol=1e-9, equal_nan=True)
+               for c in ('rolling_avg', 'rolling_std', 'rolling_z'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--pincodes", type=int, default=19_000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} | {'reference s':>11} | {'kernel s':>8} | {'speedup':>7} | {'flagged':>7} | same")
+    for size in args.rows:
+        data = make_rows(size, args.pincodes)
+
+        start = time.perf_counter()
+        expected = reference_rolling_anomalies(data, 'age_0_5')
+        reference = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = get_rolling_anomalies(data, 'age_0_5')
+        kernel = time.perf_counter() - start
+
+        print(f"{size:>10,} | {reference:>11.2f} | {kernel:>8.3f} | {reference / kernel:>6.0f}x | "
+              f"{len(result):>7,} | {same_result(expected, result)}")
+
+
+if __name__ == "__main__":
+    main()
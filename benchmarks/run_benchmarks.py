@@ -0,0 +1,266 @@
+"""
+Benchmark suite: times the data path end to end on synthetic data.
+
+Stages (per dataset size): Parquet scan, coordinate join, engine frame
+build, dashboard filtering (filter index + slice, rollup cube + slice, map
+bins), every modules/intelligence engine and every modules/prediction
+function, the pandas vs DuckDB query backends (group_totals from disk at
+each grain the pages use) and the heatmap tile pyramid render. Only the
+Streamlit-free module functions are timed, so no Streamlit runtime or
+cache is involved. Datasets come from benchmarks/synthetic.py and are
+reused between runs.
+
+Run from the project root:
+    python -m benchmarks.run_benchmarks --sizes 100000 1000000 10000000 \
+        --workdir /tmp/uidai_bench --output bench-results.json
+Compare two runs (e.g. before/after a commit):
+    python -m benchmarks.run_benchmarks --compare old.json new.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import build_dataset, START_DATE
+from modules.dataset import scan_dataset, load_geocode_index, lookup_coordinates, compact_frame, dataset_row_count
+from modules.filter_index import sort_for_filtering, build_filter_index, slice_rows, build_date_index
+from modules.aggregates import (
+    build_rollup_cube, slice_cube, cube_totals, cube_daily_trend, cube_top_districts, group_totals,
+    AGE_COLUMNS, CUBE_KEYS,
+)
+from modules.grid_bins import bin_frame
+from modules.query_backend import duckdb_group_totals, duckdb_available
+from modules.tiles import heatmap_points, pyramid_zooms, build_tile_layer
+from modules.intelligence import (
+    score_anomalies, detect_anomalies, z_score_audit, get_rolling_anomalies,
+    decompose_signals, decompose_signals_batch, surge_table,
+)
+from modules.early_warning import refresh_early_warning, scan_rows_since
+from modules.prediction import (
+    predict_traffic, fit_saturation_model, evaluate_saturation, predict_saturation_date,
+    get_burn_trend, forecast_all_districts,
+)
+
+AGE_COL = 'age_0_5'
+INTELLIGENCE_COLUMNS = ('date', 'district', 'pincode', 'age_0_5', 'age_5_17', 'age_18_greater')
+# Grains the pages aggregate at (see data_processor.get_aggregate and dashboard_cache.get_rollup_cube)
+BACKEND_GRAINS = [tuple(CUBE_KEYS), ('pincode',), ('date',), ('district', 'date'), ('pincode', 'date')]
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(results, size, stage, fn, repeat=1):
+    """Runs fn `repeat` times, records the best wall time and the output size."""
+    best, out = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    rows_out = len(out) if isinstance(out, (pd.DataFrame, pd.Series, np.ndarray)) else None
+    results.append({'rows': size, 'stage': stage, 'seconds': round(best, 4), 'rows_out': rows_out})
+    print(f"{size:>10,} | {stage:<44} | {best:>9.3f}s | {'' if rows_out is None else f'{rows_out:,}'}")
+    return out
+
+
+def engine_frame(dataset, geocode):
+    """
+    The engine frame the app builds (data_processor.build_engine_frame),
+    from the module functions alone: scan, coordinate join, compact schema,
+    (state, date) sort. Misses get 0.0 coordinates like clean_coordinates.
+    """
+    df = scan_dataset(dataset)
+    lat, lon, _, _ = lookup_coordinates(df['pincode'], geocode)
+    df['lat'], df['lon'] = np.nan_to_num(lat), np.nan_to_num(lon)
+    return sort_for_filtering(compact_frame(df))
+
+
+def same_totals(a, b, keys):
+    """Backend outputs hold the same values (dtypes and category order aside)."""
+    if a is None or b is None or len(a) != len(b):
+        return False
+
+    def as_text(t):
+        text = {k: t[k].astype(str) for k in keys if k in ('state', 'district')}
+        return t.assign(**text).sort_values(list(keys), ignore_index=True)
+
+    try:
+        pd.testing.assert_frame_equal(as_text(a), as_text(b), check_dtype=False)
+    except AssertionError:
+        return False
+    return True
+
+
+def run_size(size, workdir, seed, repeat):
+    """All stages against one synthetic dataset (cwd is its workdir)."""
+    results = []
+    paths = build_dataset(os.path.join(workdir, f"rows_{size}"), size, seed)
+    if paths.get('convert_seconds') is not None:
+        results.append({'rows': size, 'stage': 'ingest.stream_convert', 'seconds': round(paths['convert_seconds'], 4),
+                        'rows_out': size})
+
+    previous_dir = os.getcwd()
+    os.chdir(paths['workdir'])  # tile and early-warning state land in its .cache/
+    try:
+        def bench(stage, fn, n=repeat):
+            return timed(results, size, stage, fn, n)
+
+        # 1. Loading
+        dataset = paths['dataset']
+        raw = bench('scan_dataset', lambda: scan_dataset(dataset))
+        bench('scan_dataset[intelligence cols]', lambda: scan_dataset(dataset, columns=INTELLIGENCE_COLUMNS))
+        geocode = bench('load_geocode_index', lambda: load_geocode_index(paths['geocode_index']))
+        bench('lookup_coordinates', lambda: lookup_coordinates(raw['pincode'], geocode)[0])
+        df = bench('engine frame (scan + join + compact + sort)', lambda: engine_frame(dataset, geocode))
+
+        # 2. Dashboard filtering (busiest state, last 90 days)
+        state = df['state'].value_counts().idxmax()
+        end = df['date'].max().date()
+        date_range = (end - datetime.timedelta(days=89), end)
+        index = bench('build_filter_index', lambda: build_filter_index(df))
+        bench('slice_rows', lambda: slice_rows(df, index, state=state, date_range=date_range))
+        bench('slice_rows[all india, stitched]', lambda: slice_rows(df, index, date_range=date_range))
+        date_index = bench('build_date_index', lambda: build_date_index(df), 1)
+        bench('slice_rows[all india, date index]',
+              lambda: slice_rows(df, index, date_range=date_range, date_index=lambda: date_index))
+        # The pandas backend's cube: grouped from the shared engine frame
+        cube = bench('build_rollup_cube', lambda: build_rollup_cube(df))
+        cells = bench('slice_cube', lambda: slice_cube(cube, state=state, date_range=date_range))
+        bench('cube_totals+trend+top', lambda: (cube_totals(cells), cube_daily_trend(cells, AGE_COL),
+                                                cube_top_districts(cells, AGE_COL)))
+        selected = slice_rows(df, index, state=state, date_range=date_range)
+        bench('bin_frame', lambda: bin_frame(selected, AGE_COL))
+        tile_root = os.path.join('.cache', 'bench_tiles')
+        shutil.rmtree(tile_root, ignore_errors=True)
+        for label, scope in (('all india', None), ('state', state)):
+            rows = df if scope is None else df[(df['state'] == scope).to_numpy()]
+            view = bin_frame(rows, AGE_COL)['view']
+            points = heatmap_points(rows, AGE_COL)
+            # Fresh key per repeat so every run renders (a reused key is a disk-cache hit)
+            keys = iter(range(repeat))
+            bench(f'heatmap tiles[{label}]',
+                  lambda: build_tile_layer(f"{label.replace(' ', '_')}_{next(keys)}", *points,
+                                           pyramid_zooms(view['zoom']), root=tile_root, max_mb=1e6))
+
+        # 3. Intelligence engines
+        intel = df  # the pages share the full frame
+        scored = bench('score_anomalies', lambda: score_anomalies(intel, AGE_COL))
+        bench('detect_anomalies[fit]', lambda: detect_anomalies(intel, AGE_COL))
+        bench('detect_anomalies[cached scores]', lambda: detect_anomalies(intel, AGE_COL, scored=scored))
+        bench('z_score_audit', lambda: z_score_audit(intel, AGE_COL))
+        bench('get_rolling_anomalies', lambda: get_rolling_anomalies(intel, AGE_COL))
+        state_dir = os.path.join('.cache', 'bench_early_warning')
+        for name in os.listdir(state_dir) if os.path.isdir(state_dir) else []:
+            os.remove(os.path.join(state_dir, name))
+        def refresh():
+            return refresh_early_warning(scan_rows_since(dataset, AGE_COL), dataset_row_count(dataset, dated=True),
+                                         AGE_COL, state_dir=state_dir)
+        bench('refresh_early_warning[cold]', refresh, 1)
+        bench('refresh_early_warning[warm]', refresh)
+        bench('decompose_signals', lambda: decompose_signals(intel, AGE_COL))
+        districts = bench('decompose_signals_batch[district]', lambda: decompose_signals_batch(intel, AGE_COL)['resid'])
+        bench('decompose_signals_batch[pincode]',
+              lambda: decompose_signals_batch(intel, AGE_COL, by='pincode', last_days=180)['resid'])
+        bench('surge_table', lambda: surge_table({'resid': districts}))
+
+        # 4. Predictions (busiest district)
+        forecast = df
+        district = forecast['district'].value_counts().idxmax()
+        one = forecast[forecast['district'] == district]
+        # predict_traffic writes df['date'], so it gets its own copy (as a caller would pass)
+        bench('predict_traffic', lambda: predict_traffic(forecast[['date']].copy()))
+        model = bench('fit_saturation_model', lambda: fit_saturation_model(one, AGE_COL))
+        target = model['current_total'] * 1.3
+        bench('evaluate_saturation', lambda: evaluate_saturation(model, target, 1.5))
+        bench('predict_saturation_date', lambda: predict_saturation_date(one, AGE_COL, target))
+        bench('get_burn_trend', lambda: get_burn_trend(one, AGE_COL))
+        bench('forecast_all_districts', lambda: forecast_all_districts(forecast))
+
+        # 5. Query backends: totals straight from disk (pandas = load + groupby, DuckDB = SQL)
+        for keys in BACKEND_GRAINS:
+            grain = ','.join(keys)
+            expected = bench(f'group_totals[pandas] {grain}',
+                             lambda: group_totals(compact_frame(scan_dataset(dataset, columns=list(keys) + AGE_COLUMNS)),
+                                                  keys))
+            if not duckdb_available():
+                continue
+            totals = bench(f'group_totals[duckdb] {grain}', lambda: duckdb_group_totals(dataset, keys))
+            results[-1]['matches'] = same_totals(expected, totals, keys)
+    finally:
+        os.chdir(previous_dir)
+    return results
+
+
+def compare(old_path, new_path):
+    """Per-stage speedup of new over old, for sizes both runs cover."""
+    with open(old_path) as f:
+        old = {(r['rows'], r['stage']): r['seconds'] for r in json.load(f)['results']}
+    with open(new_path) as f:
+        new = json.load(f)['results']
+
+    print(f"{'rows':>10} | {'stage':<44} | {'old s':>9} | {'new s':>9} | speedup")
+    for r in new:
+        before = old.get((r['rows'], r['stage']))
+        if before is None:
+            continue
+        speedup = before / r['seconds'] if r['seconds'] else float('inf')
+        print(f"{r['rows']:>10,} | {r['stage']:<44} | {before:>9.3f} | {r['seconds']:>9.3f} | {speedup:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--workdir", default=os.path.join("/tmp", "uidai_bench"),
+                        help="Where synthetic datasets are built (and reused)")
+    parser.add_argument("--output", default="bench-results.json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of-N for warm stages")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Print speedups between two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    warnings.filterwarnings('ignore', category=UserWarning)  # sklearn feature-name notices
+    output = os.path.abspath(args.output)
+    workdir = os.path.abspath(args.workdir)
+
+    print(f"{'rows':>10} | {'stage':<44} | {'seconds':>10} | rows out")
+    results = []
+    for size in args.sizes:
+        results.extend(run_size(size, workdir, args.seed, args.repeat))
+
+    report = {
+        'commit': git_commit(),
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'cpus': os.cpu_count(),
+        'seed': args.seed,
+        'synthetic_start': START_DATE,
+        'results': results,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to '{output}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Deterministic synthetic UIDAI-shaped data for tests and benchmarks.
+
+Writes the same inputs the real pipeline expects: a raw enrolment CSV
+(date,state,district,pincode,age_0_5,age_5_17,age_18_greater, dd-mm-yyyy
+dates) and data/pincode-mapping.csv. With --build it then converts them
+the way convert_data.py does (partitioned dataset + geocode index).
+
+Run from the project root:
+    python -m benchmarks.synthetic --rows 1000000 --out /tmp/uidai_synth --build
+Shape: 36 states, ~750 districts, ~19k pincodes, three years of daily rows,
+with messy pincodes ('504299.0', padded, blank) and messy coordinates
+('17.38N', 'NA', duplicates), like the real files.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules.ingest import (
+    COLUMN_NAMES, stream_convert, compact_dataset, new_batch_id, load_manifest, save_manifest, record_ingest,
+    compile_geocode_index, save_geocode_index,
+)
+
+STATES = [
+    'Andaman and Nicobar Islands', 'Andhra Pradesh', 'Arunachal Pradesh', 'Assam', 'Bihar', 'Chandigarh',
+    'Chhattisgarh', 'Dadra and Nagar Haveli and Daman and Diu', 'Delhi', 'Goa', 'Gujarat', 'Haryana',
+    'Himachal Pradesh', 'Jammu and Kashmir', 'Jharkhand', 'Karnataka', 'Kerala', 'Ladakh', 'Lakshadweep',
+    'Madhya Pradesh', 'Maharashtra', 'Manipur', 'Meghalaya', 'Mizoram', 'Nagaland', 'Odisha', 'Puducherry',
+    'Punjab', 'Rajasthan', 'Sikkim', 'Tamil Nadu', 'Telangana', 'Tripura', 'Uttar Pradesh', 'Uttarakhand',
+    'West Bengal',
+]
+N_DISTRICTS = 750
+N_PINCODES = 19_000
+START_DATE = '2023-01-01'
+YEARS = 3
+CHUNK_ROWS = 1_000_000
+
+
+def make_geography(seed=0):
+    """States -> districts -> pincodes, each pincode with a home coordinate."""
+    rng = np.random.default_rng(seed)
+
+    # Districts per state roughly proportional to a skewed "size"
+    size = rng.pareto(1.2, len(STATES)) + 0.2
+    per_state = np.maximum(1, np.round(size / size.sum() * N_DISTRICTS)).astype(int)
+    district_state = np.repeat(np.arange(len(STATES)), per_state)
+    district_name = np.array([f"{STATES[s][:3].upper()} District {i + 1}"
+                              for s in range(len(STATES)) for i in range(per_state[s])], dtype=object)
+
+    state_lat = rng.uniform(9.0, 33.0, len(STATES))
+    state_lon = rng.uniform(70.0, 94.0, len(STATES))
+    district_lat = state_lat[district_state] + rng.normal(0, 1.2, len(district_state))
+    district_lon = state_lon[district_state] + rng.normal(0, 1.2, len(district_state))
+
+    pincode_district = rng.integers(0, len(district_state), N_PINCODES)
+    pincodes = np.sort(rng.choice(np.arange(110_001, 855_999), N_PINCODES, replace=False)).astype(np.int64)
+    return {
+        'state': np.asarray(STATES, dtype=object),
+        'district_state': district_state,
+        'district_name': district_name,
+        'pincode': pincodes,
+        'pincode_district': pincode_district,
+        'lat': district_lat[pincode_district] + rng.normal(0, 0.25, N_PINCODES),
+        'lon': district_lon[pincode_district] + rng.normal(0, 0.25, N_PINCODES),
+        'activity': rng.pareto(1.1, N_PINCODES) + 0.05,  # busy centres vs quiet ones
+    }
+
+
+def write_mapping(path, geo, seed=0):
+    """pincode-mapping.csv with ~3% messy rows: text coordinates, NA, '.0' pincodes, duplicates."""
+    rng = np.random.default_rng(seed + 1)
+    n = len(geo['pincode'])
+    pincode = geo['pincode'].astype(str).astype(object)
+    lat = np.round(geo['lat'], 4).astype(str).astype(object)
+    lon = np.round(geo['lon'], 4).astype(str).astype(object)
+
+    messy = rng.random(n)
+    lat[messy < 0.01] = [f"{v}N" for v in np.round(geo['lat'][messy < 0.01], 2)]
+    lon[(messy >= 0.01) & (messy < 0.02)] = 'NA'
+    dotted = (messy >= 0.02) & (messy < 0.03)
+    pincode[dotted] = [f"{p}.0" for p in geo['pincode'][dotted]]
+
+    table = pd.DataFrame({'pincode': pincode, 'latitude': lat, 'longitude': lon})
+    duplicates = table.sample(frac=0.01, random_state=seed)
+    table = pd.concat([table, duplicates], ignore_index=True)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    table.to_csv(path, index=False)
+
+
+def write_rows(path, n_rows, geo, seed=0, chunk_rows=CHUNK_ROWS):
+    """Raw enrolment CSV in chunks, so 10M rows never sit in memory at once."""
+    rng = np.random.default_rng(seed + 2)
+    days = pd.date_range(START_DATE, periods=365 * YEARS, freq='D')
+    day_text = np.asarray(days.strftime('%d-%m-%Y'), dtype=object)
+
+    # Weekly rhythm (quiet Sundays) plus a slow upward trend
+    weekday_factor = np.array([1.1, 1.05, 1.0, 1.0, 1.15, 0.9, 0.4])[days.dayofweek]
+    day_weight = weekday_factor * np.linspace(0.8, 1.2, len(days))
+    day_p = day_weight / day_weight.sum()
+    pincode_p = geo['activity'] / geo['activity'].sum()
+
+    pincode_text = geo['pincode'].astype(str).astype(object)
+    district = geo['pincode_district']
+    written = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(','.join(COLUMN_NAMES) + '\n')
+        while written < n_rows:
+            size = min(chunk_rows, n_rows - written)
+            pin = rng.choice(len(pincode_p), size, p=pincode_p)
+            day = rng.choice(len(days), size, p=day_p)
+            base = 4 + 20 * geo['activity'][pin] / geo['activity'].max() * day_weight[day]
+
+            pincodes = pincode_text[pin].copy()
+            mess = rng.random(size)
+            pincodes[mess < 0.01] = [f"{p}.0" for p in geo['pincode'][pin[mess < 0.01]]]
+            pincodes[(mess >= 0.01) & (mess < 0.015)] = [f" {p} " for p in geo['pincode'][pin[(mess >= 0.01) & (mess < 0.015)]]]
+            pincodes[(mess >= 0.015) & (mess < 0.017)] = ''
+
+            chunk = pd.DataFrame({
+                'date': day_text[day],
+                'state': geo['state'][geo['district_state'][district[pin]]],
+                'district': geo['district_name'][district[pin]],
+                'pincode': pincodes,
+                'age_0_5': rng.poisson(base * 0.6),
+                'age_5_17': rng.poisson(base * 0.8),
+                'age_18_greater': rng.poisson(base * 0.3),
+            })
+            # Occasional spikes for the anomaly engines to find
+            spikes = rng.random(size) < 0.002
+            chunk.loc[spikes, 'age_0_5'] *= 15
+            chunk.to_csv(f, header=False, index=False)
+            written += size
+    return written
+
+
+def build_dataset(workdir, n_rows, seed=0, workers=None):
+    """
+    Generates inputs under workdir and converts them like convert_data.py
+    --stream: uidai_dataset/ (with manifest) and pincode_index.npz.
+    A finished build for the same rows and seed is reused.
+    Returns dict of paths (+ convert_seconds for the conversion step).
+    """
+    os.makedirs(workdir, exist_ok=True)
+    geo = make_geography(seed)
+    csv_path = os.path.join(workdir, 'datasets-uidai.csv')
+    mapping_path = os.path.join(workdir, 'data', 'pincode-mapping.csv')
+    dataset_dir = os.path.join(workdir, 'uidai_dataset')
+    index_path = os.path.join(workdir, 'pincode_index.npz')
+
+    paths = {'workdir': workdir, 'csv': csv_path, 'mapping': mapping_path,
+             'dataset': dataset_dir, 'geocode_index': index_path}
+
+    # Output is deterministic per (rows, seed): reuse a finished build
+    manifest = load_manifest(dataset_dir) if os.path.isdir(dataset_dir) else None
+    if manifest and os.path.exists(index_path):
+        built_rows = sum(entry['rows'] for entry in manifest['files'].values())
+        if manifest.get('synthetic') == {'rows': n_rows, 'seed': seed} and built_rows > 0:
+            compact_dataset(dataset_dir, workers=workers)  # no-op unless built before compaction existed
+            paths['convert_seconds'] = manifest.get('convert_seconds')
+            return paths
+    if os.path.isdir(dataset_dir) and os.listdir(dataset_dir):
+        raise RuntimeError(f"'{dataset_dir}' holds a different build; delete it first.")
+
+    write_mapping(mapping_path, geo, seed)
+    write_rows(csv_path, n_rows, geo, seed)
+
+    start = time.perf_counter()
+    stats = {csv_path: os.stat(csv_path)}
+    batch_id = new_batch_id()
+    summaries = stream_convert([csv_path], dataset_dir, workers=workers, batch_id=batch_id,
+                               ends={csv_path: stats[csv_path].st_size}, min_files=2)
+    manifest = record_ingest(load_manifest(dataset_dir), [csv_path], summaries, batch_id, stats)
+    save_geocode_index(compile_geocode_index(mapping_path), index_path)
+    paths['convert_seconds'] = time.perf_counter() - start
+
+    manifest['synthetic'] = {'rows': n_rows, 'seed': seed}
+    manifest['convert_seconds'] = paths['convert_seconds']
+    save_manifest(dataset_dir, manifest)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--out", required=True, help="Directory for the generated files")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--build", action="store_true", help="Also convert to the Parquet dataset + geocode index")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.build:
+        paths = build_dataset(args.out, args.rows, args.seed)
+    else:
+        geo = make_geography(args.seed)
+        write_mapping(os.path.join(args.out, 'data', 'pincode-mapping.csv'), geo, args.seed)
+        write_rows(os.path.join(args.out, 'datasets-uidai.csv'), args.rows, geo, args.seed)
+        paths = {'workdir': args.out}
+    print(f"✅ {args.rows:,} synthetic rows in '{paths['workdir']}' ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,171 @@
-
 import pandas as pd
+import argparse
 import os
+import time
+
+from modules.ingest import (
+    COLUMN_NAMES, DEFAULT_CHUNKSIZE, expand_inputs, stream_convert,
+    incremental_convert, compact_dataset, load_manifest, save_manifest, record_ingest, new_batch_id,
+    compile_geocode_index, save_geocode_index
+)
 
-input_csv = "data/datasets-uidai.csv" 
+input_csv = "data/datasets-uidai.csv"
 output_parquet = "uidai_data.parquet"
+output_dataset = "uidai_dataset"
+mapping_csv = "data/pincode-mapping.csv"
+output_geocode = "pincode_index.npz"
 
 # Based on your example: 20-03-2025,Assam,Marigaon,782104,20,58,10
 # These are 7 columns. We MUST name all 7.
-col_names = ['date', 'state', 'district', 'pincode', 'age_0_5', 'age_5_17', 'age_18_greater']
+col_names = COLUMN_NAMES
+
+
+def convert_single_file():
+    """Original one-shot conversion: whole CSV in memory -> one Parquet file."""
+    print("🔄 Forcing column names onto CSV...")
+
+    # header=0 assumes your CSV has a title row.
+    # If your CSV starts directly with data, change header=0 to header=None
+    df = pd.read_csv(input_csv, names=col_names, header=0)
+
+    # Force Date format so the Trend Chart works
+    df['date'] = pd.to_datetime(df['date'], dayfirst=True, errors='coerce')
+
+    # Clean up text
+    df['state'] = df['state'].astype(str).str.strip()
+    df['district'] = df['district'].astype(str).str.strip()
+
+    # Save it
+    df.to_parquet(output_parquet, engine='pyarrow')
+
+    print("✅ DONE! New Column List:", df.columns.tolist())
+    print("Check: Does the list above include 'date' and 'district' now?")
+
+
+def convert_streaming(input_pattern, output_dir, chunksize, workers):
+    """Chunked conversion: CSV shards -> Hive-partitioned dataset (state/month)."""
+    files = expand_inputs(input_pattern)
+    if not files:
+        print(f"❌ No CSV files match '{input_pattern}'.")
+        return
+
+    if os.path.isdir(output_dir) and os.listdir(output_dir):
+        print(f"❌ '{output_dir}/' already has data. Use --incremental to append, "
+              "or delete it to rebuild from scratch.")
+        return
+
+    print(f"🔄 Streaming {len(files)} file(s) in chunks of {chunksize:,} rows...")
+    start = time.perf_counter()
+    stats = {path: os.stat(path) for path in files}
+    batch_id = new_batch_id()
+    summaries = stream_convert(files, output_dir, chunksize=chunksize, workers=workers,
+                               batch_id=batch_id, ends={p: st.st_size for p, st in stats.items()},
+                               min_files=2)  # a fresh build merges every partition
+    # Start the manifest so later --incremental runs only read new data
+    save_manifest(output_dir, record_ingest(load_manifest(output_dir), files, summaries, batch_id, stats))
+    elapsed = time.perf_counter() - start
+
+    total_rows = sum(s['rows'] for s in summaries.values())
+    for path, summary in summaries.items():
+        print(f"   {os.path.basename(path)}: {summary['rows']:,} rows "
+              f"({summary['min_date']} → {summary['max_date']})")
+    print(f"✅ DONE! {total_rows:,} rows written to '{output_dir}/' in {elapsed:.1f}s")
+
+
+def convert_incremental(input_pattern, output_dir, chunksize, workers, after_watermark):
+    """Appends only unseen files / appended rows to an existing dataset."""
+    files = expand_inputs(input_pattern)
+    if not files:
+        print(f"❌ No CSV files match '{input_pattern}'.")
+        return
+
+    start = time.perf_counter()
+    summaries, skipped, rewritten = incremental_convert(
+        files, output_dir, chunksize=chunksize, workers=workers, after_watermark=after_watermark
+    )
+    elapsed = time.perf_counter() - start
+
+    for path in rewritten:
+        print(f"⚠️ {os.path.basename(path)} changed in place since it was ingested; "
+              "skipped. Rebuild the dataset to pick up edits.")
+    if not summaries:
+        print(f"✅ Nothing new. {len(skipped)} file(s) already ingested.")
+        return
+
+    for path, entry in load_manifest(output_dir)['files'].items():
+        if path in map(os.path.abspath, summaries) and entry['size'] > entry['offset']:
+            print(f"⏳ {os.path.basename(path)}: last row has no newline yet; "
+                  "held back until the next run.")
+    new_rows = sum(s['rows'] for s in summaries.values())
+    print(f"✅ Appended {new_rows:,} rows from {len(summaries)} file(s) in {elapsed:.1f}s "
+          f"({len(skipped)} unchanged file(s) skipped). "
+          f"Watermark: {load_manifest(output_dir)['watermark']}")
+
+
+def compact_existing(output_dir, workers):
+    """
+    Merges the small part files of every partition (increments only merge a
+    partition once it holds COMPACT_MIN_FILES part files).
+    """
+    if not os.path.isdir(output_dir):
+        print(f"❌ '{output_dir}/' not found.")
+        return
+    start = time.perf_counter()
+    before, after = compact_dataset(output_dir, batch_id=new_batch_id(), workers=workers)
+    print(f"✅ Compacted {before:,} part files into {after:,} in {time.perf_counter() - start:.1f}s")
+
 
-print("🔄 Forcing column names onto CSV...")
+def build_geocode_index(mapping_path=mapping_csv, output_path=output_geocode, force=False):
+    """Compiles pincode-mapping.csv into the binary lookup index used by load_dataset."""
+    if not os.path.exists(mapping_path):
+        print(f"💡 '{mapping_path}' not found; skipping geocode index.")
+        return
+    if not force and os.path.exists(output_path) and \
+            os.path.getmtime(output_path) >= os.path.getmtime(mapping_path):
+        print(f"📍 Geocode index '{output_path}' is up to date.")
+        return
 
-# header=0 assumes your CSV has a title row. 
-# If your CSV starts directly with data, change header=0 to header=None
-df = pd.read_csv(input_csv, names=col_names, header=0) 
+    start = time.perf_counter()
+    index = compile_geocode_index(mapping_path)
+    save_geocode_index(index, output_path)
+    print(f"📍 Geocode index: {len(index['pincode']):,} pincodes -> '{output_path}' "
+          f"in {time.perf_counter() - start:.1f}s")
 
-# Force Date format so the Trend Chart works
-df['date'] = pd.to_datetime(df['date'], dayfirst=True, errors='coerce')
 
-# Clean up text
-df['state'] = df['state'].astype(str).str.strip()
-df['district'] = df['district'].astype(str).str.strip()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert raw UIDAI CSV drops to Parquet.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Chunked ingest into a state/month partitioned dataset (bounded memory).")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Append only new files / new rows to the partitioned dataset.")
+    parser.add_argument("--after-watermark", action="store_true",
+                        help="With --incremental, drop rows dated on/before the last ingested date.")
+    parser.add_argument("--compact", action="store_true",
+                        help="Only merge small part files in an existing partitioned dataset.")
+    parser.add_argument("--geocode-only", action="store_true",
+                        help="Only rebuild the pincode geocode index.")
+    parser.add_argument("--mapping", default=mapping_csv,
+                        help="Pincode mapping CSV for the geocode index.")
+    parser.add_argument("--input", default=input_csv,
+                        help="CSV path or glob of CSV shards (used with --stream/--incremental).")
+    parser.add_argument("--output", default=output_dataset,
+                        help="Output dataset directory (used with --stream/--incremental).")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help="Rows per chunk; bounds peak memory.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: all cores, 1 = in-process).")
+    args = parser.parse_args()
 
-# Save it
-df.to_parquet(output_parquet, engine='pyarrow')
+    if args.compact:
+        compact_existing(args.output, args.workers)
+    elif args.geocode_only:
+        build_geocode_index(args.mapping, force=True)
+    elif args.incremental:
+        convert_incremental(args.input, args.output, args.chunksize, args.workers, args.after_watermark)
+    elif args.stream:
+        convert_streaming(args.input, args.output, args.chunksize, args.workers)
+    else:
+        convert_single_file()
 
-print("✅ DONE! New Column List:", df.columns.tolist())
-print("Check: Does the list above include 'date' and 'district' now?")
+    if not (args.geocode_only or args.compact):
+        build_geocode_index(args.mapping)
@@ -3,7 +3,19 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import pydeck as pdk
-from modules.data_processor import get_engine_data
+from streamlit_folium import st_folium
+from modules.data_processor import get_resident_report
+from modules.dashboard_cache import (
+    get_rollup_cube, get_selection, get_map_bins, get_choropleth_totals, get_heatmap_tiles
+)
+from modules.map_utils import get_state_boundaries, build_choropleth_features, create_base_map, add_heatmap_tiles
+from modules.aggregates import slice_cube, cube_totals, cube_daily_trend, cube_top_districts
+from modules.data_loader import get_dataset_extent
+from modules.instrumentation import start_run, finish_run, stage, stage_report
+from modules.query_backend import query_backend
+
+# Per-stage timings for this rerun (shown under System Diagnostics)
+start_run('dashboard')
 
 # --- 1. UI STYLING & SETTINGS ---
 st.markdown("""
@@ -14,11 +26,12 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# --- 2. DATA LOADING ---
-df = get_engine_data()
+# --- 2. DATASET METADATA (no rows loaded yet) ---
+state_list, min_date, max_date = get_dataset_extent()
 
-if df.empty:
+if not state_list:
     st.error("❌ Data Engine Error: Could not load 'uidai_data.parquet'.")
+    finish_run(status='stopped')  # early exits are logged too
     st.stop()
 
 # --- 3. SIDEBAR FILTERS ---
@@ -29,29 +42,40 @@ age_options = {"Infants (0-5)": "age_0_5", "Youth (5-17)": "age_5_17", "Adults (
 age_label = st.sidebar.selectbox("Target Age Group:", list(age_options.keys()), key="main_age")
 age_filter = age_options[age_label]
 
-all_states = ["All India"] + sorted(df['state'].unique().tolist())
+all_states = ["All India"] + state_list
 selected_state = st.sidebar.selectbox("Select State:", all_states, key="main_state")
 
 # Timeline Logic
-filtered_df = df.copy()
-if 'date' in df.columns:
-    min_date = df['date'].min().date()
-    max_date = df['date'].max().date()
+date_filter = None
+if min_date is not None:
     date_range = st.sidebar.date_input("Timeline:", [min_date, max_date], key="main_date")
-    if isinstance(date_range, list) and len(date_range) == 2:
-        start_date, end_date = date_range
-        filtered_df = filtered_df[(filtered_df['date'].dt.date >= start_date) & 
-                                  (filtered_df['date'].dt.date <= end_date)]
+    if isinstance(date_range, (list, tuple)) and len(date_range) == 2:
+        date_filter = tuple(date_range)
+
+# A state is pushed down to the Parquet scan (only its partitions are read);
+# All India and the timeline are slices of the shared frames
+state_filter = None if selected_state == "All India" else selected_state
+with stage('load + filter: state + timeline') as record:
+    filtered_df = get_selection(state_filter, date_filter)
+    record['rows_out'] = len(filtered_df)
 
-if selected_state != "All India":
-    filtered_df = filtered_df[filtered_df['state'] == selected_state]
+if filtered_df.empty:
+    st.warning("⚠️ No records match this state and timeline. Please adjust your filters.")
+    finish_run(status='stopped')
+    st.stop()
+
+# Metrics, trend and rankings come from the pre-aggregated cube, not raw rows
+with stage('aggregate: rollup cube') as record:
+    cube_cells = slice_cube(get_rollup_cube(), state=state_filter, date_range=date_filter)
+    totals = cube_totals(cube_cells)
+    record['rows_out'] = len(cube_cells)
 
 # --- 4. TOP METRICS ---
 st.title(f"📊 Analytics Control Center: {selected_state}")
 m1, m2, m3 = st.columns(3)
-m1.metric("Total Infants", f"{int(filtered_df['age_0_5'].sum()):,}")
-m2.metric("Total Youth", f"{int(filtered_df['age_5_17'].sum()):,}")
-m3.metric("Total Adults", f"{int(filtered_df['age_18_greater'].sum()):,}")
+m1.metric("Total Infants", f"{totals.get('age_0_5', 0):,}")
+m2.metric("Total Youth", f"{totals.get('age_5_17', 0):,}")
+m3.metric("Total Adults", f"{totals.get('age_18_greater', 0):,}")
 
 st.divider()
 
@@ -125,101 +149,141 @@ with tab_map:
     with col_t2:
         mode_3d = st.toggle(" 3D Intelligence Mode", help="Towers represent local volume density.")
 
-    # 2. Data Prep
-    map_data = filtered_df.copy()
-    map_data['lat'] = pd.to_numeric(map_data['lat'], errors='coerce')
-    map_data['lon'] = pd.to_numeric(map_data['lon'], errors='coerce')
-    map_data['weight'] = pd.to_numeric(map_data[age_filter], errors='coerce').fillna(0)
-    map_data = map_data.dropna(subset=['lat', 'lon'])
-
-    # 3. Visualization Logic
-    if not map_data.empty:
-        view_state = pdk.ViewState(
-            latitude=map_data['lat'].median(),
-            longitude=map_data['lon'].median(),
-            zoom=5,
-            pitch=45 if mode_3d else 0,
-            bearing=0
-        )
-
-        if mode_3d:
+    # Choropleth needs the boundary file; density binning works without it
+    layer_options = ["Density"] + (["State Choropleth"] if get_state_boundaries() is not None else [])
+    map_layer = st.radio("Map Layer:", layer_options, horizontal=True, key="main_map_layer")
+
+    if map_layer == "State Choropleth":
+        # Polygon totals come pre-joined: pincodes were assigned to boundaries once per version
+        with stage('map payload: choropleth totals'):
+            region_totals = get_choropleth_totals(date_filter, age_filter)
+        if region_totals is None or region_totals.sum() == 0:
+            st.warning("⚠️ No geocoded records fall inside the state boundaries for this selection.")
+        else:
+            shapes = build_choropleth_features(get_state_boundaries(zoom=5), region_totals, selected=state_filter)
             layer = pdk.Layer(
-                "ColumnLayer",
-                data=map_data,
-                get_position='[lon, lat]',
-                get_elevation='weight',
-                elevation_scale=200, 
-                radius=3000,
-                get_fill_color='[weight * 2, 100, 255, 180]',
+                "GeoJsonLayer",
+                data=shapes,
+                get_fill_color='properties.fill_color',
+                get_line_color='properties.line_color',
+                get_line_width='properties.line_width',
+                line_width_units='pixels',
+                stroked=True,
+                filled=True,
                 pickable=True,
-                extruded=True,
             )
-            st.info("💡 **Insights:** Taller towers indicate high-pressure enrollment zones.")
-        else:
-            layer = pdk.Layer(
-                "HeatmapLayer",
-                data=map_data,
-                get_position='[lon, lat]',
-                get_weight='weight',
-                radius_pixels=30,
-                intensity=1,
-                threshold=0.05
+            st.pydeck_chart(pdk.Deck(
+                layers=[layer],
+                initial_view_state=pdk.ViewState(latitude=22.0, longitude=80.0, zoom=3.8),
+                map_style='dark',
+                tooltip={"text": "{region}: {value}"}
+            ), use_container_width=True)
+            st.caption(f"State totals from point-in-polygon on geocoded pincodes · Busiest: "
+                       f"{region_totals.idxmax()} ({int(region_totals.max()):,})")
+    else:
+        # 2. Data Prep: server-side hex binning, sized to the view zoom (payload = cells, not rows)
+        with stage('map payload: density bins', rows_in=len(filtered_df)) as record:
+            map_bins = get_map_bins(state_filter, date_filter, age_filter)
+            map_data = map_bins['cells']
+            record['rows_out'] = len(map_data)
+
+        # 3. Visualization Logic
+        if not map_data.empty:
+            view = map_bins['view']
+            view_state = pdk.ViewState(
+                latitude=view['latitude'],
+                longitude=view['longitude'],
+                zoom=view['zoom'],
+                pitch=45 if mode_3d else 0,
+                bearing=0
             )
 
-        # Render Map
-        st.pydeck_chart(pdk.Deck(
-            layers=[layer],
-            initial_view_state=view_state,
-            map_style='dark',
-            tooltip={"text": "Enrollment Count: {weight}"} if mode_3d else None
-        ), use_container_width=True) # Changed from width="stretch" for better stability
+            if mode_3d:
+                # One hexagonal tower per cell; colour and height scale with the busiest cell
+                max_weight = max(float(map_data['weight'].max()), 1.0)
+                tower_data = map_data.assign(heat=(255 * map_data['weight'] / max_weight).round())
+                layer = pdk.Layer(
+                    "ColumnLayer",
+                    data=tower_data,
+                    get_position='[lon, lat]',
+                    get_elevation='weight',
+                    elevation_scale=map_bins['radius_m'] * 40 / max_weight,
+                    radius=map_bins['radius_m'],
+                    disk_resolution=6,
+                    coverage=0.9,
+                    get_fill_color='[heat, 100, 255, 180]',
+                    pickable=True,
+                    extruded=True,
+                )
+                st.info("💡 **Insights:** Taller towers indicate high-pressure enrollment zones.")
+
+                # Render Map
+                st.pydeck_chart(pdk.Deck(
+                    layers=[layer],
+                    initial_view_state=view_state,
+                    map_style='dark',
+                    tooltip={"text": "Enrollment Count: {weight}"}
+                ), use_container_width=True) # Changed from width="stretch" for better stability
+            else:
+                # Pre-rendered density tiles: the browser streams PNGs, whatever the point count
+                with stage('map payload: heatmap tiles') as record:
+                    tile_layer = get_heatmap_tiles(state_filter, date_filter, age_filter)
+                    record['rows_out'] = tile_layer['tiles']
+                # OpenStreetMap: the CartoDB basemaps now need an API key
+                tile_map = create_base_map([view['latitude'], view['longitude']], int(view['zoom']),
+                                           tiles='OpenStreetMap')
+                add_heatmap_tiles(tile_map, tile_layer, base_path=st.get_option('server.baseUrlPath'))
+                st_folium(tile_map, width="100%", height=550, key="density_tiles", returned_objects=[])
+                if tile_layer['tiles']:
+                    st.caption(f"{tile_layer['tiles']:,} pre-rendered density tiles · "
+                               f"zoom {tile_layer['zooms'][0]}–{tile_layer['zooms'][-1]}")
 
-        # --- 4. INSIGHTS LEGEND (FIXED POSITION) ---
-        st.divider() # Visual separation
+            # --- 4. INSIGHTS LEGEND (FIXED POSITION) ---
+            st.divider() # Visual separation
         
-        legend_col1, legend_col2 = st.columns(2)
+            legend_col1, legend_col2 = st.columns(2)
         
-        with legend_col1:
-            if mode_3d:
-                st.markdown("""
-                ###  3D Tower Interpretation
-                - **Height:** Represents the **Volume** of enrollments at that exact location.
-                - **Color Peaks:** Brighter towers identify 'High-Pressure' zones or 'Super Centers'.
-                - **Admin Action:** Identify where infrastructure is most stressed and requires support.
-                - **Intensity :** Represents the concentration of operational centers in the area.
-                """)
-            else:
-                st.markdown("""
-                ###  Coverage Intelligence
-                - **Glow Intensity:** Represents the concentration of operational centers in the area.
-                - **Service Deserts:** Dark areas with no signal indicate gaps where citizens lack access.
-                - **Admin Action:** Target these 'blind spots' for mobile van deployment.
-                """)
+            with legend_col1:
+                if mode_3d:
+                    st.markdown("""
+                    ###  3D Tower Interpretation
+                    - **Height:** Represents the **Volume** of enrollments at that exact location.
+                    - **Color Peaks:** Brighter towers identify 'High-Pressure' zones or 'Super Centers'.
+                    - **Admin Action:** Identify where infrastructure is most stressed and requires support.
+                    - **Intensity :** Represents the concentration of operational centers in the area.
+                    """)
+                else:
+                    st.markdown("""
+                    ###  Coverage Intelligence
+                    - **Glow Intensity:** Represents the concentration of operational centers in the area.
+                    - **Service Deserts:** Dark areas with no signal indicate gaps where citizens lack access.
+                    - **Admin Action:** Target these 'blind spots' for mobile van deployment.
+                    """)
 
-        with legend_col2:
-            st.markdown(f"""
-            ###  View Analytics
-            - **Max Volume at Point:** `{int(map_data['weight'].max()):,}`
-            - **Median Activity:** `{int(map_data['weight'].median()):,}`
-            - **Operational Signals:** `{len(map_data):,}` points
-            """)
-            st.caption(f"Currently filtering for: {age_label}")
+            with legend_col2:
+                st.markdown(f"""
+                ###  View Analytics
+                - **Max Volume in a Cell:** `{int(map_data['weight'].max()):,}`
+                - **Median Activity per Cell:** `{int(map_data['weight'].median()):,}`
+                - **Operational Signals:** `{map_bins['points']:,}` points in `{len(map_data):,}` cells
+                """)
+                st.caption(f"Currently filtering for: {age_label}")
 
-    else:
-        st.warning("⚠️ No valid geographic data found for this selection. Please adjust your filters.")    
+        else:
+            st.warning("⚠️ No valid geographic data found for this selection. Please adjust your filters.")    
 
     with tab_analytics:
         # --- Market Pulse Chart ---
         if 'date' in filtered_df.columns:
             st.subheader("📈 Enrolment Velocity & Trends")
-        df_trend = filtered_df.groupby('date')[age_filter].sum().reset_index()
-        df_trend['7D_MA'] = df_trend[age_filter].rolling(window=7).mean()
+        with stage('chart: daily pulse', rows_in=len(cube_cells)):
+            df_trend = cube_daily_trend(cube_cells, age_filter)
         
-        fig_pulse = px.line(df_trend, x='date', y=[age_filter, '7D_MA'],
-                           title=f"Daily Pulse: {age_label}",
-                           labels={"value": "Enrolments", "variable": "Metric"},
-                           color_discrete_map={age_filter: "#5c5c5c", "7D_MA": "#00FFCC"},
-                           template="plotly_dark")
+            fig_pulse = px.line(df_trend, x='date', y=[age_filter, '7D_MA'],
+                               title=f"Daily Pulse: {age_label}",
+                               labels={"value": "Enrolments", "variable": "Metric"},
+                               color_discrete_map={age_filter: "#5c5c5c", "7D_MA": "#00FFCC"},
+                               template="plotly_dark")
         fig_pulse.update_layout(hovermode="x unified", legend=dict(orientation="h", yanchor="bottom", y=1.02))
         st.plotly_chart(fig_pulse, width="stretch")
     
@@ -228,10 +292,11 @@ with tab_map:
     # --- District Ranking Chart ---
     if 'district' in filtered_df.columns:
         st.subheader(f" Top 10 Districts: {age_label}")
-        top_10 = filtered_df.groupby('district')[age_filter].sum().nlargest(10).reset_index()
-        fig_rank = px.bar(top_10, x=age_filter, y='district', orientation='h',
-                         color=age_filter, color_continuous_scale='Viridis',
-                         template="plotly_dark")
+        with stage('chart: district ranking', rows_in=len(cube_cells)):
+            top_10 = cube_top_districts(cube_cells, age_filter)
+            fig_rank = px.bar(top_10, x=age_filter, y='district', orientation='h',
+                             color=age_filter, color_continuous_scale='Viridis',
+                             template="plotly_dark")
         fig_rank.update_layout(yaxis={'categoryorder':'total ascending'})
         st.plotly_chart(fig_rank, width="stretch")
 
@@ -242,5 +307,18 @@ with tab_raw_data:
 # --- 6. DIAGNOSTICS ---
 with st.expander(" System Diagnostics"):
     st.write(f"Total rows in view: {len(filtered_df)}")
+    geocode = filtered_df.attrs.get('geocode')
+    if geocode:
+        st.write(f"Geocoded pincode rows: {geocode['hits']:,} matched, {geocode['misses']:,} unmatched")
     st.write(f"Active Filtering Column: {age_filter}")
     st.code(f"Selected State: {selected_state}")
+    st.write(f"Aggregation backend: {query_backend()} (set UIDAI_QUERY_BACKEND=duckdb|pandas)")
+    st.caption("Shared engine frames held in server memory (one copy per dataset version and scope):")
+    st.dataframe(get_resident_report(), width="stretch", hide_index=True)
+    memory = filtered_df.attrs.get('memory')
+    if memory:
+        st.caption("Engine frame memory by column, as loaded vs the compact schema:")
+        st.dataframe(pd.DataFrame(memory), width="stretch", hide_index=True)
+    st.caption("Stage timings for this rerun (cached stages show as fast lookups; '(build)' rows ran this time):")
+    st.dataframe(stage_report(), width="stretch", hide_index=True)
+    finish_run()  # also appends to $UIDAI_STAGE_LOG as JSON lines when set
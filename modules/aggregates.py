@@ -0,0 +1,74 @@
+import pandas as pd
+import numpy as np
+
+AGE_COLUMNS = ['age_0_5', 'age_5_17', 'age_18_greater']
+CUBE_KEYS = ['state', 'district', 'date']
+
+
+def build_rollup_cube(df):
+    """
+    ROLLUP CUBE: state x district x date, one column per age group.
+    Built once per dataset version; every dashboard metric, trend and
+    ranking is then answered from these cells instead of raw rows.
+    """
+    keys = [k for k in CUBE_KEYS if k in df.columns]
+    ages = [c for c in AGE_COLUMNS if c in df.columns]
+    if df.empty or not keys or not ages:
+        return pd.DataFrame(columns=CUBE_KEYS + AGE_COLUMNS)
+
+    # dropna=False keeps undated rows so All-India totals stay exact
+    cube = df.groupby(keys, observed=True, dropna=False, sort=True)[ages].sum().reset_index()
+    for key in ('state', 'district'):
+        if key in cube.columns:
+            cube[key] = cube[key].astype('category')
+    for col in ages:
+        cube[col] = cube[col].astype('int64')
+    return cube
+
+
+def group_totals(df, keys, ages=AGE_COLUMNS):
+    """
+    Age-group totals per combination of keys (e.g. ('pincode',) or
+    ('district', 'date')). Null keys keep their own group, like SQL GROUP BY;
+    the engines drop them as they always have. Engines that sum per key
+    return the same results on these totals as on the raw rows.
+    """
+    keys = list(keys)
+    ages = [c for c in ages if c in df.columns]
+    if df.empty:
+        return pd.DataFrame(columns=keys + ages)
+    totals = df.groupby(keys, observed=True, dropna=False, sort=True)[ages].sum().reset_index()
+    for col in ages:
+        totals[col] = totals[col].astype('int64')
+    return totals
+
+
+def slice_cube(cube, state=None, date_range=None):
+    """Cells for one state (None = All India) and an inclusive date range."""
+    mask = np.ones(len(cube), dtype=bool)
+    if state is not None:
+        mask &= (cube['state'] == state).to_numpy()
+    if date_range is not None:
+        start = pd.Timestamp(date_range[0])
+        end = pd.Timestamp(date_range[1]) + pd.Timedelta(days=1)
+        mask &= ((cube['date'] >= start) & (cube['date'] < end)).to_numpy()
+    return cube[mask]
+
+
+def cube_totals(cells):
+    """Headline totals per age group."""
+    return {col: int(cells[col].sum()) for col in AGE_COLUMNS if col in cells.columns}
+
+
+def cube_daily_trend(cells, age_col, window=7):
+    """Daily totals plus the 7-day moving average used by the Pulse chart."""
+    trend = cells.groupby('date')[age_col].sum().reset_index()
+    trend['7D_MA'] = trend[age_col].rolling(window=window).mean()
+    return trend
+
+
+def cube_top_districts(cells, age_col, n=10):
+    """Largest districts by total volume for the ranking chart."""
+    ranked = cells.groupby('district', observed=True)[age_col].sum().nlargest(n).reset_index()
+    ranked['district'] = ranked['district'].astype(str)
+    return ranked
@@ -0,0 +1,50 @@
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+DEFAULT_TIMEOUT = 60.0
+
+
+def run_engines(engines, timeouts=None, max_workers=None, thread_initializer=None):
+    """
+    AUDIT ORCHESTRATOR: runs independent engines concurrently and yields
+    (name, status, result, seconds) as each one settles, fastest first.
+      engines  -> {name: zero-argument callable}
+      timeouts -> {name: seconds}; engines without one get DEFAULT_TIMEOUT
+      status   -> 'ok', 'error' (result is the exception) or 'timeout'
+    Threads share the cached frames without copying. A timed-out engine
+    cannot be killed; it is reported and left to finish in the background,
+    and its result is dropped. Engines must not touch Streamlit elements
+    (render on the caller's thread); cached builders they call need
+    show_spinner=False. thread_initializer runs in each worker first.
+    """
+    timeouts = timeouts or {}
+    pool = ThreadPoolExecutor(max_workers=max_workers or len(engines), thread_name_prefix='audit',
+                              initializer=thread_initializer)
+    start = time.perf_counter()
+    # Each engine runs in a copy of the caller's context (keeps instrumentation stages on this run)
+    futures = {pool.submit(contextvars.copy_context().run, fn): name for name, fn in engines.items()}
+    deadlines = {name: start + timeouts.get(name, DEFAULT_TIMEOUT) for name in engines}
+
+    try:
+        pending = set(futures)
+        while pending:
+            next_deadline = min(deadlines[futures[f]] for f in pending)
+            done, pending = wait(pending, timeout=max(next_deadline - time.perf_counter(), 0),
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures[future]
+                error = future.exception()
+                elapsed = time.perf_counter() - start
+                if error is None:
+                    yield name, 'ok', future.result(), elapsed
+                else:
+                    yield name, 'error', error, elapsed
+
+            now = time.perf_counter()
+            for future in [f for f in pending if deadlines[futures[f]] <= now]:
+                pending.discard(future)
+                future.cancel()
+                yield futures[future], 'timeout', None, now - start
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
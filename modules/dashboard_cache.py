@@ -0,0 +1,181 @@
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+import streamlit as st
+from modules.data_loader import get_geocode_index, get_dataset_extent
+from modules.data_processor import engine_frame_for, aggregate_for, track_resident
+from modules.dataset import dataset_version, find_dataset_path, pincode_keys
+from modules.aggregates import build_rollup_cube, slice_cube, CUBE_KEYS, AGE_COLUMNS
+from modules.query_backend import query_backend, duckdb_group_totals
+from modules.filter_index import build_filter_index, build_date_index, slice_rows, date_slice
+from modules.grid_bins import bin_frame
+from modules.tiles import heatmap_points, pyramid_zooms, build_tile_layer, load_layer
+from modules.spatial_index import build_polygon_index, assign_points
+from modules.map_utils import get_state_boundaries, BOUNDARY_FILE, STATE_FIELD
+from modules.instrumentation import instrument
+
+# Cached accessors of the dashboard (main_dashboard.py): rollup cube, selection, maps
+
+def get_rollup_cube():
+    """State x district x date rollup of the full dataset, shared per version."""
+    return _rollup_cube_for(dataset_version(), query_backend())
+
+@st.cache_resource(show_spinner="Building rollup cube...", max_entries=2)
+@instrument("rollup cube (build)")
+def _rollup_cube_for(version, backend):
+    if backend == 'duckdb':
+        cube = duckdb_group_totals(find_dataset_path(), CUBE_KEYS)
+        if cube is not None:
+            return cube
+    # Grouped from the one shared engine frame (no second Parquet scan)
+    return build_rollup_cube(engine_frame_for(version))
+
+def get_filter_index():
+    """(state, date) offset table over the full shared engine frame, per version."""
+    return _filter_index_for(dataset_version())
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+@instrument("filter index (build)")
+def _filter_index_for(version):
+    return build_filter_index(engine_frame_for(version))
+
+def _date_index_for(version):
+    """Date-order positions into the full shared frame (see build_date_index), built on first use."""
+    return _date_index_cached(version)
+
+@st.cache_resource(show_spinner="Indexing dates...", max_entries=2)
+@instrument("date index (build)")
+def _date_index_cached(version):
+    date_index = build_date_index(engine_frame_for(version))
+    track_resident(date_index['order'], version, ('date-index', None),
+                   nbytes=date_index['order'].nbytes + date_index['days'].nbytes)
+    return date_index
+
+def _narrowed(date_range):
+    """The date range, or None when it spans the whole dataset (the default timeline)."""
+    if date_range is None:
+        return None
+    _, min_date, max_date = get_dataset_extent()
+    if min_date is not None and date_range[0] <= min_date and date_range[1] >= max_date:
+        return None
+    return tuple(date_range)
+
+def get_selection(state, date_range):
+    """
+    Rows for one state (None = All India) and an inclusive date range.
+    A state session scans only that state's partitions (one shared cached
+    frame per state, see get_engine_data) and a window is a binary-search
+    slice of it. All India slices the full shared frame (see slice_rows).
+    """
+    return _selection_for(dataset_version(), state, date_range)
+
+def _selection_for(version, state, date_range):
+    date_range = _narrowed(date_range)
+    if state is not None:
+        return date_slice(engine_frame_for(version, None, (state,)), date_range)
+    return slice_rows(engine_frame_for(version), _filter_index_for(version), date_range=date_range,
+                      date_index=lambda: _date_index_for(version))
+
+def get_map_bins(state, date_range, age_col, shape='hex'):
+    """
+    Server-side hex/square binning of the current selection for the density
+    map, cached per (dataset version, filter, age group, grid shape).
+    The zoom, and so the cell size, is fitted to the selection's extent.
+    """
+    return _map_bins_for(dataset_version(), state, date_range, age_col, shape)
+
+@st.cache_data(show_spinner="Binning map cells...", max_entries=64)
+@instrument("map bins (build)")
+def _map_bins_for(version, state, date_range, age_col, shape):
+    rows = _selection_for(version, state, date_range)
+    return bin_frame(rows, age_col, shape=shape)
+
+def get_heatmap_tiles(state, date_range, age_col):
+    """
+    Pre-rendered density tile pyramid for the current selection (see
+    modules/tiles.py). Tiles live on disk per (dataset version, filter, age
+    group) and survive restarts; the map only streams the PNGs.
+    Returns the layer manifest (url, zooms, view, bounds, tiles).
+    """
+    version = dataset_version()
+    key = heatmap_key(version, state, date_range, age_col)
+    layer = load_layer(key)
+    if layer is None:
+        with st.spinner("Rendering heatmap tiles..."):
+            layer = _render_heatmap_tiles(version, key, state, date_range, age_col)
+    return layer
+
+def heatmap_key(version, state, date_range, age_col):
+    """Tile folder name of a pyramid: any new dataset version renders (and caches) a new one."""
+    return hashlib.sha1(repr((version, state, date_range, age_col)).encode()).hexdigest()[:16]
+
+@instrument("heatmap tiles (build)")
+def _render_heatmap_tiles(version, key, state, date_range, age_col):
+    rows = _selection_for(version, state, date_range)
+    # Same fitted view as the binned map
+    view = _map_bins_for(version, state, date_range, age_col, 'hex')['view']
+    lat, lon, weight = heatmap_points(rows, age_col)
+    return build_tile_layer(key, lat, lon, weight, pyramid_zooms(view['zoom']), view=view)
+
+def get_region_lookup(boundary_path=BOUNDARY_FILE, name_field=STATE_FIELD):
+    """
+    Pincode -> boundary polygon, from point-in-polygon on the geocode index
+    (STR-tree + ray casting). Computed once per dataset and boundary version.
+    Returns dict: pincode (sorted), region (feature id, -1 = outside), names.
+    """
+    if not os.path.exists(boundary_path):
+        return None
+    return _region_lookup_for(dataset_version(), boundary_path, os.path.getmtime(boundary_path), name_field)
+
+@st.cache_resource(show_spinner="Assigning pincodes to boundaries...", max_entries=4)
+@instrument("region lookup (build)")
+def _region_lookup_for(version, boundary_path, mtime, name_field):
+    index = get_geocode_index()
+    if index is None or len(index['pincode']) == 0:
+        return None
+    # Full-detail geometry for the exact tests; the map draws simplified copies
+    polygons = build_polygon_index(get_state_boundaries(zoom=99, file_path=boundary_path), name_field)
+    region = assign_points(polygons, index['lon'], index['lat'])
+    return {'pincode': index['pincode'], 'region': region, 'names': polygons['names']}
+
+def get_region_cube(boundary_path=BOUNDARY_FILE, name_field=STATE_FIELD):
+    """Polygon x date totals per age group, pre-joined through the pincode lookup."""
+    if not os.path.exists(boundary_path):
+        return None
+    return _region_cube_for(dataset_version(), boundary_path, os.path.getmtime(boundary_path), name_field)
+
+@st.cache_resource(show_spinner="Building region rollup...", max_entries=4)
+@instrument("region cube (build)")
+def _region_cube_for(version, boundary_path, mtime, name_field):
+    lookup = _region_lookup_for(version, boundary_path, mtime, name_field)
+    if lookup is None:
+        return None
+    # Pincode x date totals (the dashboard frame, or SQL), not raw rows
+    df = aggregate_for(version, ('pincode', 'date'), query_backend())
+    if df is None or df.empty:
+        return None
+
+    # Cell -> feature id via the sorted pincode table, then feature id -> name code
+    keys, valid = pincode_keys(df['pincode'])
+    table = lookup['pincode']
+    pos = np.minimum(np.searchsorted(table, keys), len(table) - 1)
+    feature = np.where(valid & (table[pos] == keys), lookup['region'][pos], -1)
+
+    names, name_code = np.unique(np.asarray(lookup['names'], dtype=str), return_inverse=True)
+    code = np.where(feature >= 0, name_code[np.maximum(feature, 0)], -1) if len(names) else np.full(len(feature), -1)
+
+    frame = pd.DataFrame({'region': pd.Categorical.from_codes(code, categories=names), 'date': df['date']})
+    for col in AGE_COLUMNS:
+        frame[col] = df[col].to_numpy()
+    cube = frame.groupby(['region', 'date'], observed=True, sort=True)[AGE_COLUMNS].sum().reset_index()
+    cube.attrs['unassigned_cells'] = int((code < 0).sum())
+    return cube
+
+def get_choropleth_totals(date_range, age_col, boundary_path=BOUNDARY_FILE, name_field=STATE_FIELD):
+    """Per-polygon totals for the date range, ready for build_choropleth_features."""
+    cube = get_region_cube(boundary_path, name_field)
+    if cube is None:
+        return None
+    cells = slice_cube(cube, date_range=date_range)
+    return cells.groupby('region', observed=True)[age_col].sum()
@@ -82,88 +82,97 @@ import pandas as pd
 import numpy as np
 import os
 import streamlit as st
-
-def get_smart_path(filename):
-    """Checks the root and data folders to find files regardless of script location."""
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(current_dir)
-    
-    paths = [
-        filename,                                     # Current Dir
-        os.path.join("data", filename),               # /data/ folder
-        os.path.join(project_root, filename),         # Root folder
-        os.path.join(project_root, "data", filename)  # Root/data/ folder
-    ]
-    for path in paths:
-        if os.path.exists(path): return path
-    return None
-
-@st.cache_data(show_spinner="Booting Data Engine...")
-def load_dataset():
+from modules.dataset import (
+    get_smart_path, find_dataset_path, scan_dataset, dataset_extent, dataset_version,
+    find_geocode_index, load_geocode_index, lookup_coordinates, GEOCODE_CSV
+)
+from modules.ingest import compile_geocode_index
+from modules.instrumentation import instrument, stage
+
+def get_geocode_index():
+    """
+    Sorted pincode -> lat/lon arrays. Uses pincode_index.npz from
+    convert_data.py; otherwise compiles pincode-mapping.csv once per process.
+    """
+    source = find_geocode_index() or get_smart_path(GEOCODE_CSV)
+    if not source:
+        return None
+    return _geocode_index_for(source, os.path.getmtime(source))
+
+@st.cache_resource(show_spinner=False)
+@instrument("geocode index (build)")
+def _geocode_index_for(source, mtime):
+    """One shared copy per source file version (mtime is part of the key)."""
+    if source.endswith('.npz'):
+        return load_geocode_index(source)
+    try:
+        return compile_geocode_index(source)
+    except Exception as e:
+        st.warning(f"⚠️ Map Loading Issue: {e}")
+        return None
+
+@instrument()
+def load_dataset(columns=None, states=None, date_range=None):
     """
     Safely loads UIDAI data and merges geospatial coordinates.
     Fixes the 'Mangled String' TypeError and CSV formatting issues.
+    columns / states / date_range are pushed down to the Parquet scanner,
+    so a single-state or single-quarter view only reads what it needs.
+    Not cached here: the shared copies live in data_processor (get_engine_data).
     """
     # --- 1. LOAD MAIN PARQUET FILE ---
-    parquet_path = get_smart_path("uidai_data.parquet")
+    # Prefer the partitioned dataset from 'convert_data.py --stream'
+    parquet_path = find_dataset_path()
     if not parquet_path:
         st.error("❌ 'uidai_data.parquet' not found. Please run 'convert_data.py' first.")
         return pd.DataFrame()
 
-    df = pd.read_parquet(parquet_path)
+    # Coordinates come from the mapping file, keyed by pincode
+    want_coords = columns is None or 'lat' in columns or 'lon' in columns
+    scan_columns = None
+    if columns is not None:
+        scan_columns = [c for c in columns if c not in ('lat', 'lon')]
+        if want_coords and 'pincode' not in scan_columns:
+            scan_columns.append('pincode')
+
+    with stage('parquet scan') as record:
+        df = scan_dataset(parquet_path, columns=scan_columns, states=states, date_range=date_range)
+        record['rows_out'] = len(df)
     # Clean headers (lowercase, no spaces)
     df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_')
 
-    # --- 2. LOAD & MERGE COORDINATES (The Anti-Crash Fix) ---
-    mapping_path = get_smart_path("pincode-mapping.csv")
-    
-    if mapping_path:
-        try:
-            # PROTECTION: We read as 'str' first. This prevents Pandas from 
-            # smushing rows together when it sees messy 'NA' or extra commas.
-            geo_df = pd.read_csv(
-                mapping_path, 
-                usecols=[0, 1, 2], 
-                dtype=str,               # Force string to avoid TypeError
-                na_values=['NA', 'nan'], 
-                on_bad_lines='skip',     # Skips rows that would cause a crash
-                engine='python'          # More robust for messy CSVs
-            )
-            
-            # Standardize names
-            geo_df.columns = geo_df.columns.str.strip().str.lower()
-            geo_df = geo_df.rename(columns={'latitude': 'lat', 'lattitude': 'lat', 'longitude': 'lon'})
-
-            # SAFE CONVERSION: Only convert to numbers now that file is in memory
-            # Any 'mangled' strings are turned into NaN (empty) instead of crashing
-            geo_df['lat'] = pd.to_numeric(geo_df['lat'], errors='coerce')
-            geo_df['lon'] = pd.to_numeric(geo_df['lon'], errors='coerce')
-            
-            # Remove rows where coordinates are missing/broken
-            geo_df = geo_df.dropna(subset=['lat', 'lon'])
-
-            # CLEAN PINCODES: Handle format differences (e.g., 504299.0 vs 504299)
-            df['pincode'] = df['pincode'].astype(str).str.split('.').str[0].str.strip()
-            geo_df['pincode'] = geo_df['pincode'].astype(str).str.split('.').str[0].str.strip()
-            
-            # Deduplicate mapping and Merge
-            geo_df = geo_df.drop_duplicates(subset=['pincode'])
-            df = pd.merge(df, geo_df[['pincode', 'lat', 'lon']], on='pincode', how='left')
-            
-        except Exception as e:
-            st.warning(f"⚠️ Map Loading Issue: {e}")
-    else:
-        st.info("💡 Note: Geospatial mapping file not found. Map features disabled.")
+    # --- 2. ATTACH COORDINATES (compiled pincode index) ---
+    if want_coords and 'pincode' in df.columns:
+        index = get_geocode_index()
+        if index is not None:
+            with stage('coordinate join', rows_in=len(df)):
+                lat, lon, hits, misses = lookup_coordinates(df['pincode'], index)
+            df['lat'], df['lon'] = lat, lon
+            df.attrs['geocode'] = {'hits': hits, 'misses': misses}
+        else:
+            st.info("💡 Note: Geospatial mapping file not found. Map features disabled.")
 
     # --- 3. FINAL DATA TYPE ENFORCEMENT ---
     # Convert Date
     if 'date' in df.columns:
         df['date'] = pd.to_datetime(df['date'], errors='coerce')
 
-    # Convert Age Columns to Clean Integers
+    # Convert Age Columns to Clean Integers (int32: per-row counts, see ENGINE_SCHEMA)
     age_cols = ['age_0_5', 'age_5_17', 'age_18_greater']
     for col in age_cols:
         if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype('int32')
+
+    # Pincode was only pulled in for the coordinate join
+    if columns is not None and 'pincode' not in columns:
+        df = df.drop(columns=['pincode'], errors='ignore')
 
     return df
+
+def get_dataset_extent():
+    """States and date bounds for the sidebar, without loading any rows."""
+    return _dataset_extent_for(dataset_version())
+
+@st.cache_data(show_spinner=False)
+def _dataset_extent_for(version):
+    return dataset_extent(find_dataset_path())
@@ -1,7 +1,24 @@
 import streamlit as st
 import pandas as pd
+import os
 import re
+import contextlib
+import threading
+import weakref
+import pyarrow as pa
+import pyarrow.compute as pc
+from collections import OrderedDict
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from modules.data_loader import load_dataset
+from modules.dataset import dataset_version, find_dataset_path, compact_frame, column_memory, memory_report
+from modules.aggregates import group_totals
+from modules.query_backend import query_backend, duckdb_group_totals
+from modules.filter_index import sort_for_filtering, build_filter_index, slice_rows
+from modules.instrumentation import instrument, stage
+
+# The shared engine frame and the totals every page reads. Page-specific
+# cached engines live next to their page: dashboard_cache, intelligence_cache,
+# prediction_cache.
 
 def clean_coordinate(coord):
     if pd.isna(coord) or coord == "": return 0.0
@@ -12,16 +29,186 @@ def clean_coordinate(coord):
     if any(char in str(coord).upper() for char in ['S', 'W']): val = -val
     return val
 
-@st.cache_data(ttl=3600)
-def get_engine_data():
-    df = load_dataset()
+COORD_PATTERN = r"(?P<value>[-+]?\d*\.\d+|\d+)"
+
+def _parse_coordinate_text(text):
+    """First number in each string, negated for S/W (Arrow regex kernels, no Python loop)."""
+    arr = pa.array(text, type=pa.string(), from_pandas=True)
+    value = pc.cast(pc.struct_field(pc.extract_regex(arr, COORD_PATTERN), [0]), pa.float64())
+    south_west = pc.match_substring_regex(arr, '[SsWw]')
+    value = pc.if_else(south_west, pc.negate(value), value)
+    return pd.Series(value.to_numpy(zero_copy_only=False), index=text.index, dtype='float64')
+
+@instrument()
+def clean_coordinates(series):
+    """
+    Vectorised clean_coordinate for a whole column (same results):
+    numbers pass through, text yields its first number (negated when it
+    mentions S/W), anything else becomes 0.0.
+    """
+    # Fast path: already numeric (e.g. coordinates from the geocode index)
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+        return series.astype('float64').fillna(0.0)
+
+    # Pure text column (the usual raw-CSV case)
+    if pd.api.types.is_string_dtype(series) and pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+        return _parse_coordinate_text(series).fillna(0.0)
+
+    # Mixed object column: numbers pass through, strings get parsed
+    text_mask = series.map(type) == str
+    result = pd.to_numeric(series.where(~text_mask), errors='coerce').astype('float64')
+    if text_mask.any():
+        result[text_mask] = _parse_coordinate_text(series[text_mask])
+    return result.fillna(0.0)
+
+@instrument()
+def build_engine_frame(columns=None, states=None, date_range=None):
+    """Loads and cleans the engine frame (uncached; see get_engine_data)."""
+    df = load_dataset(columns=columns, states=states, date_range=date_range)
     if df is None or df.empty:
         return pd.DataFrame()
     df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_')
     if 'date' in df.columns:
         df['date'] = pd.to_datetime(df['date'], errors='coerce')
     if 'lat' in df.columns: 
-        df['lat'] = df['lat'].apply(clean_coordinate)
+        df['lat'] = clean_coordinates(df['lat'])
     if 'lon' in df.columns: 
-        df['lon'] = df['lon'].apply(clean_coordinate)
+        df['lon'] = clean_coordinates(df['lon'])
+    # Compact schema (categoricals, uint32 pincode, int32 counts, float32 coordinates)
+    before = column_memory(df)
+    with stage('compact schema', rows_in=len(df)):
+        df = compact_frame(df)
+    df.attrs['memory'] = memory_report(before, column_memory(df))
+    # (state, date) order makes sidebar selections contiguous slices
+    with stage('sort for filtering', rows_in=len(df)):
+        return sort_for_filtering(df)
+
+# Resident engine frames: (version, scope) -> {'rows', 'bytes'}; entries drop out when evicted
+_RESIDENT = {}
+_RESIDENT_LOCK = threading.Lock()
+
+def track_resident(obj, version, scope, nbytes=None):
+    """Registers a cached frame (or index array) until it is garbage collected; returns its bytes."""
+    key = (version, scope)
+    if nbytes is None:
+        nbytes = int(obj.memory_usage(deep=True).sum())
+    with _RESIDENT_LOCK:
+        _RESIDENT[key] = {'rows': len(obj), 'bytes': nbytes}
+
+    def forget():
+        with _RESIDENT_LOCK:
+            _RESIDENT.pop(key, None)
+    weakref.finalize(obj, forget)
+    return nbytes
+
+ENGINE_CACHE_MB_ENV = 'UIDAI_ENGINE_CACHE_MB'  # memory budget for all cached engine frames
+DEFAULT_ENGINE_CACHE_MB = 2048
+
+# Cached engine frames: (version, columns, states) -> (frame, bytes), least recently used first
+_FRAMES = OrderedDict()
+_FRAMES_LOCK = threading.Lock()
+_BUILD_LOCKS = {}
+
+def _engine_cache_bytes():
+    return float(os.environ.get(ENGINE_CACHE_MB_ENV, DEFAULT_ENGINE_CACHE_MB)) * 1e6
+
+def _trim_frames(keep):
+    """Drops frames of other dataset versions, then least recently used ones over the budget (never keep)."""
+    for key in [key for key in _FRAMES if key[0] != keep[0]]:
+        del _FRAMES[key]
+    budget = _engine_cache_bytes()
+    total = sum(nbytes for _, nbytes in _FRAMES.values())
+    for key in list(_FRAMES):
+        if total <= budget:
+            break
+        if key != keep:
+            total -= _FRAMES.pop(key)[1]
+
+@instrument("engine frame (build)")
+def _build_frame(version, columns, states):
+    spinner = st.spinner("Booting Data Engine...") if get_script_run_ctx(suppress_warning=True) \
+        else contextlib.nullcontext()  # audit worker threads show no elements
+    with spinner:
+        df = build_engine_frame(columns=columns, states=states)
+    return df, track_resident(df, version, (columns, states))
+
+def engine_frame_for(version, columns=None, states=None):
+    """
+    One process-wide copy per (dataset version, columns, states), shared by
+    every session and page. Together the cached frames stay within
+    $UIDAI_ENGINE_CACHE_MB (least recently used go first; the frame being
+    returned always stays). Date windows are slices, never cached copies.
+    """
+    key = (version, columns, states)
+    with _FRAMES_LOCK:
+        if key in _FRAMES:
+            _FRAMES.move_to_end(key)
+            return _FRAMES[key][0]
+        build_lock = _BUILD_LOCKS.setdefault(key, threading.Lock())
+    with build_lock:  # concurrent sessions wait for one build
+        try:
+            with _FRAMES_LOCK:
+                if key in _FRAMES:
+                    _FRAMES.move_to_end(key)
+                    return _FRAMES[key][0]
+            df, nbytes = _build_frame(version, columns, states)
+            with _FRAMES_LOCK:
+                _FRAMES[key] = (df, nbytes)
+                _trim_frames(keep=key)
+        finally:
+            # Also after a failed build (bad scan, out of memory): the next call retries
+            with _FRAMES_LOCK:
+                _BUILD_LOCKS.pop(key, None)
     return df
+
+def get_engine_data(columns=None, states=None, date_range=None):
+    """
+    Cleaned engine frame. columns / states are pushed down to the Parquet
+    scan (see load_dataset); pass tuples so cache keys are stable. A
+    date_range is sliced from the cached (state, date)-sorted frame, so
+    windows are never cached as copies of their own. The frame is shared, not copied: treat it as
+    read-only and .copy() before adding or overwriting columns.
+    """
+    df = engine_frame_for(dataset_version(), columns, states)
+    if date_range is None:
+        return df
+    return slice_rows(df, build_filter_index(df), date_range=date_range)
+
+def get_resident_report():
+    """Memory held by cached engine frames, one row per dataset version and scope."""
+    with _RESIDENT_LOCK:
+        entries = list(_RESIDENT.items())
+    rows = [
+        {'version': version, 'scope': _describe_scope(scope), 'rows': info['rows'],
+         'resident_mb': round(info['bytes'] / 1e6, 1)}
+        for (version, scope), info in entries
+    ]
+    return pd.DataFrame(rows, columns=['version', 'scope', 'rows', 'resident_mb'])
+
+def _describe_scope(scope):
+    columns, states = scope
+    parts = [
+        'date index (row order)' if columns == 'date-index' else
+        'all columns' if columns is None else f"{len(columns)} columns",
+        'all states' if states is None else ', '.join(states),
+    ]
+    return ' | '.join(parts)
+
+def get_aggregate(keys):
+    """
+    Age-group totals per keys (e.g. ('pincode',), ('district', 'date')),
+    cached per dataset version. The query backend ($UIDAI_QUERY_BACKEND)
+    decides who computes them: 'pandas' groups the one shared engine frame
+    (only the key and count columns are touched, nothing is copied),
+    'duckdb' runs SQL over the Parquet files without materialising the rows.
+    """
+    return aggregate_for(dataset_version(), tuple(keys), query_backend())
+
+@st.cache_resource(show_spinner="Aggregating...", max_entries=12)
+@instrument("aggregate (build)")
+def aggregate_for(version, keys, backend):
+    if backend == 'duckdb':
+        totals = duckdb_group_totals(find_dataset_path(), keys)
+        if totals is not None:
+            return totals
+    return group_totals(engine_frame_for(version), keys)
@@ -0,0 +1,361 @@
+import os
+import json
+import time
+import datetime
+import hashlib
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+DATASET_DIR = "uidai_dataset"          # partitioned output of 'convert_data.py --stream'
+LEGACY_PARQUET = "uidai_data.parquet"  # single-file output of 'convert_data.py'
+GEOCODE_INDEX = "pincode_index.npz"    # compiled pincode-mapping.csv (see modules/ingest.py)
+GEOCODE_CSV = "pincode-mapping.csv"
+MANIFEST_FILE = "_manifest.json"       # rewritten by every ingest run (see modules/ingest.py)
+VERSION_TTL = 2.0                      # seconds a computed dataset_version is reused
+PINCODE_RANGE = (0, 999999)            # valid pincodes after flooring, inclusive; anything else is null
+
+
+def get_smart_path(filename):
+    """Checks the root and data folders to find files regardless of script location."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(current_dir)
+
+    paths = [
+        filename,                                     # Current Dir
+        os.path.join("data", filename),               # /data/ folder
+        os.path.join(project_root, filename),         # Root folder
+        os.path.join(project_root, "data", filename)  # Root/data/ folder
+    ]
+    for path in paths:
+        if os.path.exists(path): return path
+    return None
+
+
+def find_dataset_path():
+    """Prefers the partitioned dataset and falls back to the single Parquet file."""
+    return get_smart_path(DATASET_DIR) or get_smart_path(LEGACY_PARQUET)
+
+
+_VERSIONS = {}  # path -> (expires, version)
+
+
+def dataset_version(path=None):
+    """
+    Cheap fingerprint of everything the engine frame is built from
+    (Parquet files + geocode index/CSV), no reads. Any ingest, append or
+    mapping change yields a new version. Reused for VERSION_TTL seconds,
+    since every cached accessor asks for it on each rerun.
+    """
+    path = path or find_dataset_path()
+    now = time.monotonic()
+    cached = _VERSIONS.get(path)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    version = _fingerprint(path)
+    _VERSIONS[path] = (now + VERSION_TTL, version)
+    return version
+
+
+def _fingerprint(path):
+    """
+    A partitioned dataset written by ingest is fingerprinted by its
+    manifest (saved after every run, compaction included) and its top
+    directory; only datasets without a manifest fall back to a stat() of
+    every file.
+    """
+    digest = hashlib.sha1()
+    files = []
+    if path and os.path.isdir(path):
+        manifest = os.path.join(path, MANIFEST_FILE)
+        if os.path.exists(manifest):
+            files = [path, manifest]
+        else:
+            files = sorted(
+                os.path.join(root, name)
+                for root, _, names in os.walk(path) for name in names
+            )
+    elif path:
+        files = [path]
+    files += [p for p in (get_smart_path(GEOCODE_INDEX), get_smart_path(GEOCODE_CSV)) if p]
+    for file_path in files:
+        stat = os.stat(file_path)
+        digest.update(f"{file_path}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:12]
+
+
+def open_dataset(path):
+    """Opens a Parquet file or a Hive-partitioned directory as an Arrow dataset."""
+    if os.path.isdir(path):
+        partitioning = ds.HivePartitioning.discover(infer_dictionary=True)
+        return ds.dataset(path, format='parquet', partitioning=partitioning)
+    return ds.dataset(path, format='parquet')
+
+
+def _date_scalar(field_type, value):
+    """Builds a filter literal matching the on-disk date type (date32 or timestamp)."""
+    if pa.types.is_date(field_type):
+        return pa.scalar(pd.Timestamp(value).date(), type=field_type)
+    return pa.scalar(pd.Timestamp(value), type=field_type)
+
+
+def build_filter(dataset, states=None, date_range=None):
+    """
+    Translates a state list and an inclusive (start, end) date range (either
+    end may be None = open) into an Arrow expression. Partition keys (state, month) prune whole directories;
+    the date bounds are checked against row-group statistics.
+    Returns (expression or None, date_range still to apply in pandas).
+    """
+    names = dataset.schema.names
+    expr = None
+    pending_dates = None
+
+    def both(a, b):
+        return b if a is None else a & b
+
+    if states is not None and 'state' in names:
+        expr = both(expr, ds.field('state').isin(list(states)))
+
+    if date_range is not None:
+        start, end = date_range
+        date_type = dataset.schema.field('date').type if 'date' in names else None
+        if date_type is not None and (pa.types.is_date(date_type) or pa.types.is_timestamp(date_type)):
+            if start is not None:
+                expr = both(expr, ds.field('date') >= _date_scalar(date_type, start))
+            if end is not None and pa.types.is_timestamp(date_type):
+                # Inclusive end day for timestamp columns
+                expr = both(expr, ds.field('date') < _date_scalar(date_type, pd.Timestamp(end) + pd.Timedelta(days=1)))
+            elif end is not None:
+                expr = both(expr, ds.field('date') <= _date_scalar(date_type, end))
+            if 'month' in names and start is not None:
+                expr = both(expr, ds.field('month') >= pd.Timestamp(start).strftime('%Y-%m'))
+            if 'month' in names and end is not None:
+                expr = both(expr, ds.field('month') <= pd.Timestamp(end).strftime('%Y-%m'))
+        else:
+            # Dates stored as text: nothing to push down, filter after loading
+            pending_dates = (start, end)
+
+    return expr, pending_dates
+
+
+def scan_dataset(path=None, columns=None, states=None, date_range=None):
+    """
+    Reads only the requested columns/rows of the UIDAI dataset.
+    columns: fact-table columns to return (None = all except 'month').
+    states: iterable of state names (None = all states).
+    date_range: inclusive (start, end) dates, either may be None (None = full history).
+    """
+    path = path or find_dataset_path()
+    if not path:
+        return pd.DataFrame()
+
+    dataset = open_dataset(path)
+    names = dataset.schema.names
+    if columns is None:
+        columns = [c for c in names if c != 'month']
+    else:
+        columns = [c for c in columns if c in names]
+
+    expr, pending_dates = build_filter(dataset, states, date_range)
+    read_columns = columns + (['date'] if pending_dates and 'date' not in columns else [])
+    table = dataset.to_table(columns=read_columns, filter=expr)
+    df = table.to_pandas()
+
+    if pending_dates:
+        dates = pd.to_datetime(df['date'], errors='coerce')
+        start, end = pending_dates
+        keep = dates.notna()
+        if start is not None:
+            keep &= dates >= pd.Timestamp(start)
+        if end is not None:
+            keep &= dates < pd.Timestamp(end) + pd.Timedelta(days=1)
+        df = df[keep][columns]
+
+    return df
+
+
+def dataset_row_count(path=None, dated=False):
+    """
+    Rows in the dataset: the ingest manifest's per-file counts (record_ingest
+    keeps them), or the Parquet footers when there is no manifest.
+    dated: only rows with a date, i.e. what a date-filtered scan can return
+    (manifest rows minus undated rows, or a scan of the date column when
+    the manifest predates undated counts).
+    """
+    path = path or find_dataset_path()
+    if not path:
+        return 0
+    manifest = os.path.join(path, MANIFEST_FILE)
+    if os.path.isdir(path) and os.path.exists(manifest):
+        with open(manifest, 'r', encoding='utf-8') as f:
+            entries = list(json.load(f)['files'].values())
+        if not dated:
+            return sum(entry['rows'] for entry in entries)
+        if all('undated' in entry for entry in entries):
+            return sum(entry['rows'] - entry['undated'] for entry in entries)
+    if dated:
+        return open_dataset(path).count_rows(filter=ds.field('date').is_valid())
+    return open_dataset(path).count_rows()
+
+
+def dataset_extent(path=None):
+    """
+    Cheap metadata for sidebars: sorted state list and (min, max) date.
+    Dates come from row-group statistics; only the state column is read.
+    """
+    path = path or find_dataset_path()
+    if not path:
+        return [], None, None
+
+    dataset = open_dataset(path)
+    states = []
+    if 'state' in dataset.schema.names:
+        state_col = dataset.to_table(columns=['state'])['state'].unique()
+        if pa.types.is_dictionary(state_col.type):
+            state_col = state_col.dictionary_decode()
+        states = sorted(str(s) for s in state_col.to_pylist() if s is not None)
+
+    lows, highs = [], []
+    for fragment in dataset.get_fragments():
+        fragment.ensure_complete_metadata()
+        for row_group in fragment.row_groups:
+            stats = (row_group.statistics or {}).get('date')
+            if not stats:
+                lows, highs = None, None
+                break
+            lows.append(stats['min'])
+            highs.append(stats['max'])
+        if lows is None:
+            break
+
+    if lows is None:
+        # No usable statistics (e.g. text dates): read the one column instead
+        dates = pd.to_datetime(dataset.to_table(columns=['date'])['date'].to_pandas(), errors='coerce')
+        return states, _as_date(dates.min()), _as_date(dates.max())
+    if not lows:
+        return states, None, None
+    return states, _as_date(min(lows)), _as_date(max(highs))
+
+
+def _as_date(value):
+    """Normalises Timestamp/datetime/date/NaT to a datetime.date (or None)."""
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+def find_geocode_index():
+    """Returns the compiled index path, unless it is missing or older than the CSV."""
+    index_path = get_smart_path(GEOCODE_INDEX)
+    csv_path = get_smart_path(GEOCODE_CSV)
+    if index_path and csv_path and os.path.getmtime(index_path) < os.path.getmtime(csv_path):
+        return None
+    return index_path
+
+
+def load_geocode_index(path):
+    """Loads the sorted uint32 pincode / float32 lat-lon arrays."""
+    with np.load(path) as data:
+        return {key: data[key] for key in ('pincode', 'lat', 'lon')}
+
+
+def pincode_keys(pincodes):
+    """
+    Converts a pincode column of any dtype (int, float, '504299.0' text)
+    to uint32 keys: floored, and valid inside PINCODE_RANGE (the rule
+    ingest and the geocode index apply too). Returns (keys, valid mask).
+    """
+    low, high = PINCODE_RANGE
+    if isinstance(pincodes.dtype, pd.UInt32Dtype):
+        # Already compact (engine frame): no parsing needed
+        keys = pincodes.fillna(0).to_numpy(dtype=np.uint32)
+        return keys, pincodes.notna().to_numpy() & (keys >= low) & (keys <= high)
+    if pincodes.dtype == object or pd.api.types.is_string_dtype(pincodes):
+        pincodes = pincodes.astype(str).str.strip()
+    values = np.floor(pd.to_numeric(pincodes, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan))
+    valid = np.isfinite(values) & (values >= low) & (values <= high)
+    keys = np.zeros(len(values), dtype=np.uint32)
+    keys[valid] = values[valid].astype(np.uint32)
+    return keys, valid
+
+
+def lookup_coordinates(pincodes, index):
+    """
+    Vectorised join: binary-searches every pincode in the sorted index.
+    Returns (lat, lon, hits, misses); misses get NaN coordinates.
+    """
+    keys, valid = pincode_keys(pincodes)
+    table = index['pincode']
+    lat = np.full(len(keys), np.nan, dtype=np.float32)
+    lon = np.full(len(keys), np.nan, dtype=np.float32)
+    if len(table) == 0:
+        return lat, lon, 0, len(keys)
+
+    pos = np.searchsorted(table, keys)
+    np.minimum(pos, len(table) - 1, out=pos)
+    hit = valid & (table[pos] == keys)
+    lat[hit] = index['lat'][pos[hit]]
+    lon[hit] = index['lon'][pos[hit]]
+
+    hits = int(hit.sum())
+    return lat, lon, hits, len(keys) - hits
+
+
+# Compact in-memory schema of the engine frame (see compact_frame)
+ENGINE_SCHEMA = {
+    'date': 'datetime64[s]',     # day resolution
+    'state': 'category',
+    'district': 'category',
+    'pincode': 'UInt32',         # nullable: unparseable pincodes stay missing
+    'age_0_5': 'int32',
+    'age_5_17': 'int32',
+    'age_18_greater': 'int32',
+    'lat': 'float32',
+    'lon': 'float32',
+}
+
+
+def compact_frame(df):
+    """
+    Casts the engine frame to ENGINE_SCHEMA in place (columns it lacks are
+    skipped) and returns it. Counts are per-row, so int32 is ample; totals
+    are summed by pandas/NumPy reductions, which accumulate in int64.
+    """
+    for col, dtype in ENGINE_SCHEMA.items():
+        if col not in df.columns or str(df[col].dtype) == dtype:
+            continue
+        if col == 'pincode':
+            keys, valid = pincode_keys(df[col])
+            df[col] = pd.arrays.IntegerArray(keys, ~valid)
+        elif col == 'date':
+            df[col] = pd.to_datetime(df[col], errors='coerce').dt.normalize().astype(dtype)
+        elif dtype == 'int32':
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(dtype)
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def column_memory(df):
+    """{column: (dtype, bytes)} with string contents counted (deep)."""
+    usage = df.memory_usage(deep=True, index=False)
+    return {col: (str(df[col].dtype), int(usage[col])) for col in df.columns}
+
+
+def memory_report(before, after):
+    """Per-column dtype and MB before/after compaction (column_memory snapshots), plus a total row."""
+    rows = [
+        {'column': col, 'dtype_before': before[col][0], 'mb_before': round(before[col][1] / 1e6, 2),
+         'dtype_after': after[col][0], 'mb_after': round(after[col][1] / 1e6, 2)}
+        for col in after if col in before
+    ]
+    rows.append({'column': 'TOTAL', 'dtype_before': '', 'dtype_after': '',
+                 'mb_before': round(sum(b for _, b in before.values()) / 1e6, 2),
+                 'mb_after': round(sum(b for _, b in after.values()) / 1e6, 2)})
+    return rows
@@ -0,0 +1,258 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from modules.dataset import pincode_keys, scan_dataset
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATE_DIR = os.path.join(PROJECT_ROOT, '.cache', 'early_warning')
+DEFAULT_WINDOW = 14
+ALERT_COLUMNS = ['date', 'pincode', 'rolling_avg', 'rolling_std', 'rolling_z']
+
+
+def new_state(window=DEFAULT_WINDOW):
+    """Empty detector: per-pincode ring buffer plus sliding Welford mean / M2."""
+    return {
+        'window': int(window),
+        'pincode': np.array([], dtype=np.uint32),
+        'buffer': np.zeros((0, window), dtype=np.float64),
+        'head': np.array([], dtype=np.int64),
+        'count': np.array([], dtype=np.int64),
+        'mean': np.array([], dtype=np.float64),
+        'm2': np.array([], dtype=np.float64),
+        'watermark': np.datetime64('NaT', 'ns'),
+        'rows_seen': 0,
+        'dataset_rows': 0,
+        # Rows dated on the watermark day (see _day_rows), to tell same-day appends from rows already fed
+        'day_pincode': np.array([], dtype=np.int64),
+        'day_value': np.array([], dtype=np.float64),
+    }
+
+
+def _state_paths(age_col, state_dir):
+    return (os.path.join(state_dir, f"{age_col}.npz"),
+            os.path.join(state_dir, f"{age_col}_alerts.parquet"))
+
+
+def load_state(age_col, window=DEFAULT_WINDOW, state_dir=STATE_DIR):
+    """Detector state and alert log from disk; a fresh state if missing, older, or built with another window."""
+    state_path, alerts_path = _state_paths(age_col, state_dir)
+    if not os.path.exists(state_path):
+        return new_state(window), pd.DataFrame(columns=ALERT_COLUMNS)
+
+    with np.load(state_path) as data:
+        state = {key: data[key] for key in data.files}
+    if any(key not in state for key in new_state(window)) or int(state['window']) != window:
+        return new_state(window), pd.DataFrame(columns=ALERT_COLUMNS)
+    state['window'] = int(state['window'])
+    state['rows_seen'] = int(state['rows_seen'])
+    state['dataset_rows'] = int(state['dataset_rows'])
+    state['watermark'] = state['watermark'][()]
+
+    alerts = pd.read_parquet(alerts_path) if os.path.exists(alerts_path) else pd.DataFrame(columns=ALERT_COLUMNS)
+    return state, alerts
+
+
+def save_state(state, alerts, age_col, state_dir=STATE_DIR):
+    """Writes state and alert log atomically (temp file + rename)."""
+    os.makedirs(state_dir, exist_ok=True)
+    state_path, alerts_path = _state_paths(age_col, state_dir)
+
+    tmp_path = state_path + '.tmp.npz'
+    np.savez(tmp_path, **state)
+    os.replace(tmp_path, state_path)
+
+    tmp_path = alerts_path + '.tmp'
+    alerts.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, alerts_path)
+
+
+def _add_pincodes(state, keys):
+    """Grows the state arrays for pincodes seen for the first time (kept sorted)."""
+    new_keys = np.setdiff1d(keys, state['pincode'])
+    if len(new_keys) == 0:
+        return state
+
+    merged = np.union1d(state['pincode'], new_keys)
+    old_slots = np.searchsorted(merged, state['pincode'])
+    grown = dict(state, pincode=merged)
+    for name, fill in (('head', 0), ('count', 0), ('mean', 0.0), ('m2', 0.0)):
+        column = np.full(len(merged), fill, dtype=state[name].dtype)
+        column[old_slots] = state[name]
+        grown[name] = column
+    buffer = np.zeros((len(merged), state['window']), dtype=np.float64)
+    buffer[old_slots] = state['buffer']
+    grown['buffer'] = buffer
+    return grown
+
+
+def update_detector(state, rows, age_col, threshold=3.0):
+    """
+    Feeds new rows (date, pincode, age_col) through the detector.
+    Rows are taken in (pincode, date) order and processed in rounds: round
+    r handles the r-th new row of every pincode at once, so the cost is
+    O(new rows) plus one short vector step per round. Each row is scored
+    against the window that includes it (same as the batch rolling z-score).
+    Rows with a missing pincode or count are skipped.
+    Returns (state, alerts for these rows).
+    """
+    window = state['window']
+    keys, valid = pincode_keys(rows['pincode'])
+    values = pd.to_numeric(rows[age_col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    valid &= np.isfinite(values)
+    if not valid.any():
+        return state, pd.DataFrame(columns=ALERT_COLUMNS + [age_col])
+
+    batch = pd.DataFrame({'date': rows['date'].to_numpy()[valid], 'pincode': keys[valid], 'value': values[valid]})
+    batch = batch.sort_values(['pincode', 'date'], ignore_index=True)
+    keys = batch['pincode'].to_numpy()
+    values = batch['value'].to_numpy()
+
+    state = _add_pincodes(state, np.unique(keys))
+    slots = np.searchsorted(state['pincode'], keys)
+
+    # Groups (one per pincode) ordered longest first, so round r is a prefix
+    starts = np.r_[0, np.flatnonzero(keys[1:] != keys[:-1]) + 1]
+    lengths = np.diff(np.r_[starts, len(keys)])
+    by_length = np.argsort(-lengths, kind='stable')
+    starts, lengths = starts[by_length], lengths[by_length]
+
+    buffer, head, count = state['buffer'], state['head'], state['count']
+    mean, m2 = state['mean'], state['m2']
+    row_mean = np.empty(len(keys))
+    row_std = np.empty(len(keys))
+
+    for r in range(int(lengths[0])):
+        active = int(np.searchsorted(-lengths, -r, side='left'))
+        idx = starts[:active] + r
+        p, x = slots[idx], values[idx]
+
+        n, full = count[p], count[p] >= window
+        old = buffer[p, head[p]]
+        buffer[p, head[p]] = x
+        head[p] = (head[p] + 1) % window
+
+        # Welford: add a value, or replace the oldest once the window is full
+        m = mean[p]
+        n_new = np.where(full, n, n + 1)
+        delta = np.where(full, x - old, x - m)
+        m_new = m + delta / n_new
+        m2[p] = np.maximum(m2[p] + np.where(full, delta * (x - m_new + old - m), delta * (x - m_new)), 0.0)
+        mean[p], count[p] = m_new, n_new
+
+        row_mean[idx] = m_new
+        with np.errstate(invalid='ignore', divide='ignore'):
+            row_std[idx] = np.where(n_new > 1, np.sqrt(m2[p] / (n_new - 1)), np.nan)
+
+    # Re-derive touched pincodes exactly from their buffers so float drift never accumulates
+    touched = np.unique(slots)
+    filled = np.arange(window) < count[touched, None]
+    sums = np.where(filled, buffer[touched], 0.0).sum(axis=1)
+    mean[touched] = sums / np.maximum(count[touched], 1)
+    m2[touched] = np.where(filled, (buffer[touched] - mean[touched, None]) ** 2, 0.0).sum(axis=1)
+
+    z = (values - row_mean) / (row_std + 1e-6)
+    flagged = z > threshold
+    alerts = pd.DataFrame({
+        'date': batch['date'].to_numpy()[flagged],
+        'pincode': keys[flagged],
+        age_col: values[flagged],
+        'rolling_avg': row_mean[flagged],
+        'rolling_std': row_std[flagged],
+        'rolling_z': z[flagged],
+    })
+
+    state = dict(state, rows_seen=state['rows_seen'] + len(keys))
+    return state, alerts
+
+
+def scan_rows_since(path, age_col):
+    """
+    read_rows for refresh_early_warning over a Parquet dataset: rows dated
+    on or after a watermark day come from a date-filtered scan, so only the
+    months from it on are read.
+    """
+    def read_rows(since):
+        rows = scan_dataset(path, columns=['date', 'pincode', age_col],
+                            date_range=None if since is None else (pd.Timestamp(since).date(), None))
+        if age_col in rows.columns:
+            # Missing counts are 0, as in the engine frame (see load_dataset)
+            rows[age_col] = pd.to_numeric(rows[age_col], errors='coerce').fillna(0)
+        return rows
+    return read_rows
+
+
+def _day_rows(rows, age_col):
+    """Row identities for matching: pincode key (-1 = missing) and count (NaN = missing)."""
+    keys, valid = pincode_keys(rows['pincode'])
+    values = pd.to_numeric(rows[age_col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.where(valid, keys.astype(np.int64), -1), values
+
+
+def _unseen(seen_keys, seen_values, keys, values):
+    """
+    Mask of the rows not among the seen ones, as multisets: the k-th copy
+    of a row is new when fewer than k copies were seen.
+    None when a seen row is gone (history was rewritten).
+    """
+    seen = pd.DataFrame({'pincode': seen_keys, 'value': seen_values})
+    now = pd.DataFrame({'pincode': keys, 'value': values})
+    for frame in (seen, now):
+        frame['copy'] = frame.groupby(['pincode', 'value'], dropna=False).cumcount()
+    matched = (now.merge(seen, on=['pincode', 'value', 'copy'], how='left', indicator=True)['_merge'] == 'both').to_numpy()
+    return ~matched if matched.sum() == len(seen) else None
+
+
+def refresh_early_warning(read_rows, dataset_rows, age_col, window=DEFAULT_WINDOW, state_dir=STATE_DIR):
+    """
+    EARLY WARNING SYSTEM (streaming): loads the persisted detector, feeds it
+    only the rows it has not seen, saves it and returns the full alert log
+    (newest first).
+    read_rows(since) returns the rows (date, pincode, age_col) dated on or
+    after the day `since` (None = every row), e.g. scan_rows_since;
+    dataset_rows is the dataset's count of dated rows, the only rows a scan
+    returns (see dataset_row_count). The state counts the rows fed so far
+    and keeps the watermark day's rows, so an append (later days, or more
+    rows on the watermark day) is fed as an increment; any other change
+    (rows rewritten, dropped, or dated before the watermark) rebuilds the
+    detector from scratch.
+    """
+    state, alerts = load_state(age_col, window, state_dir)
+    rows, rebuilt = None, False
+    if not pd.isna(state['watermark']):
+        rows = read_rows(state['watermark'])
+        dates = pd.to_datetime(rows['date'], errors='coerce').to_numpy(dtype='datetime64[ns]')
+        same_day = dates == state['watermark']
+        unseen = _unseen(state['day_pincode'], state['day_value'], *_day_rows(rows[same_day], age_col))
+        if unseen is None or state['dataset_rows'] + len(rows) - len(state['day_pincode']) != dataset_rows:
+            state, alerts, rows, rebuilt = new_state(window), pd.DataFrame(columns=ALERT_COLUMNS), None, True
+    if rows is None:
+        rows = read_rows(None)
+    if rows.empty or 'date' not in rows.columns or 'pincode' not in rows.columns:
+        rows = pd.DataFrame(columns=['date', 'pincode', age_col])
+
+    dates = pd.to_datetime(rows['date'], errors='coerce').to_numpy(dtype='datetime64[ns]')
+    if pd.isna(state['watermark']):
+        fresh = ~np.isnat(dates)
+    else:
+        fresh = dates > state['watermark']
+        fresh[np.flatnonzero(same_day)[unseen]] = True
+    if fresh.any() or rebuilt:
+        if fresh.any():
+            batch = pd.DataFrame({'date': dates[fresh], 'pincode': rows['pincode'].to_numpy()[fresh],
+                                  age_col: rows[age_col].to_numpy()[fresh]})
+            state, new_alerts = update_detector(state, batch, age_col)
+            if not new_alerts.empty:
+                alerts = new_alerts if alerts.empty else pd.concat([alerts, new_alerts], ignore_index=True)
+
+            # Every dated row read is now fed; the newest day's rows are kept to match the next read against
+            watermark = dates[~np.isnat(dates)].max()
+            day_pincode, day_value = _day_rows(rows[dates == watermark], age_col)
+            state = dict(state, watermark=watermark, dataset_rows=state['dataset_rows'] + int(fresh.sum()),
+                         day_pincode=day_pincode, day_value=day_value)
+        save_state(state, alerts, age_col, state_dir)
+
+    if alerts.empty:
+        return pd.DataFrame(columns=ALERT_COLUMNS + [age_col])
+    return alerts.sort_values(by='date', ascending=False, kind='stable', ignore_index=True)
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+
+def sort_for_filtering(df):
+    """Orders rows by (state, date) so every state/timeline selection is contiguous."""
+    if df.empty or 'state' not in df.columns or 'date' not in df.columns:
+        return df
+    return df.sort_values(['state', 'date'], kind='stable', ignore_index=True)
+
+
+def build_filter_index(df):
+    """
+    FILTER INDEX: offset table over a frame sorted by (state, date).
+      states -> {state: (start_row, end_row)}
+      dates  -> the date column as a NumPy array (sorted within each state)
+    Built once per dataset version; selections become binary searches.
+    """
+    if df.empty or 'state' not in df.columns:
+        return {'states': {}, 'dates': np.array([], dtype='datetime64[ns]')}
+
+    state = df['state']
+    codes = state.cat.codes.to_numpy() if isinstance(state.dtype, pd.CategoricalDtype) \
+        else pd.factorize(state)[0]
+    starts = np.r_[0, np.flatnonzero(codes[1:] != codes[:-1]) + 1]
+    ends = np.r_[starts[1:], len(df)]
+    names = state.iloc[starts].astype(str).tolist()
+
+    return {
+        'states': {name: (int(a), int(b)) for name, a, b in zip(names, starts, ends)},
+        'dates': df['date'].to_numpy(),
+    }
+
+
+def _date_bounds(dates, start, end, lo, hi):
+    """Row range [a, b) of an inclusive day range inside rows lo..hi."""
+    window = dates[lo:hi]
+    first = np.datetime64(pd.Timestamp(start).date(), 'D')
+    after = np.datetime64(pd.Timestamp(end).date(), 'D') + np.timedelta64(1, 'D')
+    a = lo + int(np.searchsorted(window, first.astype(window.dtype), side='left'))
+    b = lo + int(np.searchsorted(window, after.astype(window.dtype), side='left'))
+    return a, b
+
+
+def date_slice(df, date_range):
+    """Rows of a date-sorted frame (e.g. one state's) inside an inclusive date range: a slice."""
+    if date_range is None or df.empty:
+        return df
+    a, b = _date_bounds(df['date'].to_numpy(), date_range[0], date_range[1], 0, len(df))
+    return df.iloc[a:b]
+
+
+def build_date_index(df):
+    """
+    DATE INDEX: row positions of the frame in date order (stable argsort)
+    and the dates in that order, as day numbers. An All-India date window
+    becomes one binary search plus a gather of just the rows it selects;
+    the frame itself is not copied (about 8 bytes per row).
+    """
+    if df.empty or 'date' not in df.columns:
+        return {'order': np.array([], dtype=np.int64), 'days': np.array([], dtype='datetime64[D]')}
+    days = df['date'].to_numpy().astype('datetime64[D]')
+    order = np.argsort(days, kind='stable')
+    order = order.astype(np.int32) if len(order) < np.iinfo(np.int32).max else order
+    return {'order': order, 'days': days[order]}
+
+
+def slice_rows(df, index, state=None, date_range=None, date_index=None):
+    """
+    Rows for one state (None = All India) and an inclusive date range.
+    A state or the full timeline is a positional slice of the sorted frame,
+    never a copy. An All-India window that leaves rows out is gathered
+    through date_index (a callable returning build_date_index output, so
+    it is only built when needed), or else by stitching the per-state
+    slices; either way only the selected rows are copied, in date order
+    with the index.
+    """
+    if state is not None:
+        if state not in index['states']:
+            return df.iloc[0:0]
+        lo, hi = index['states'][state]
+        if date_range is None:
+            return df.iloc[lo:hi]
+        a, b = _date_bounds(index['dates'], date_range[0], date_range[1], lo, hi)
+        return df.iloc[a:b]
+
+    if date_range is None:
+        return df
+
+    spans = list(index['states'].values())
+    bounds = [_date_bounds(index['dates'], date_range[0], date_range[1], lo, hi) for lo, hi in spans]
+    if bounds == spans:
+        return df  # the window covers every row (the default full timeline)
+
+    if date_index is not None:
+        by_date = date_index()
+        a, b = _date_bounds(by_date['days'], date_range[0], date_range[1], 0, len(by_date['days']))
+        return df.take(by_date['order'][a:b])
+
+    pieces = [df.iloc[a:b] for a, b in bounds if b > a]
+    if not pieces:
+        return df.iloc[0:0]
+    if len(pieces) == 1:
+        return pieces[0]
+    return pd.concat(pieces)
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+METERS_PER_DEGREE = 111_320.0
+EARTH_MPP_ZOOM0 = 156_543.03  # Web Mercator metres per pixel at zoom 0 (equator)
+SQRT3 = np.sqrt(3.0)
+
+
+def zoom_for_extent(lat_min, lat_max, lon_min, lon_max, width_px=1000, height_px=550):
+    """Web Mercator zoom that fits a lat/lon box in the map viewport."""
+    lon_span = max(lon_max - lon_min, 0.05)
+    lat_span = max(lat_max - lat_min, 0.05)
+    zoom_x = np.log2(360.0 * width_px / (256.0 * lon_span))
+    zoom_y = np.log2(180.0 * height_px / (256.0 * lat_span))
+    return float(np.clip(min(zoom_x, zoom_y), 3.0, 12.0))
+
+
+def cell_radius_for_zoom(zoom, latitude=22.0, cell_px=14):
+    """Cell radius in metres so one cell spans ~cell_px screen pixels at this zoom."""
+    metres_per_pixel = EARTH_MPP_ZOOM0 * np.cos(np.radians(latitude)) / (2.0 ** zoom)
+    return float(cell_px * metres_per_pixel)
+
+
+def bin_points(lat, lon, weight, radius_m, shape='hex', ref_lat=22.0):
+    """
+    GRID ENGINE: Aggregates point weights into flat-top hexagons (or squares)
+    of the given radius. Positions are projected to a local metric plane
+    (equirectangular around ref_lat), binned with integer cell keys and
+    summed with bincount, so cost is O(points) and output size is O(cells).
+    Returns DataFrame: lon, lat, weight, points.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    weight = np.asarray(weight, dtype=np.float64)
+    if len(lat) == 0:
+        return pd.DataFrame({'lon': [], 'lat': [], 'weight': [], 'points': []})
+
+    kx = METERS_PER_DEGREE * np.cos(np.radians(ref_lat))
+    x = lon * kx
+    y = lat * METERS_PER_DEGREE
+
+    if shape == 'hex':
+        # Axial coordinates for flat-top hexagons, then cube rounding
+        qf = (2.0 / 3.0 * x) / radius_m
+        rf = (-1.0 / 3.0 * x + SQRT3 / 3.0 * y) / radius_m
+        sf = -qf - rf
+        q, r, s = np.rint(qf), np.rint(rf), np.rint(sf)
+        dq, dr, ds = np.abs(q - qf), np.abs(r - rf), np.abs(s - sf)
+        fix_q = (dq > dr) & (dq > ds)
+        fix_r = ~fix_q & (dr > ds)
+        q = np.where(fix_q, -r - s, q)
+        r = np.where(fix_r, -q - s, r)
+        cx = radius_m * 1.5 * q
+        cy = radius_m * SQRT3 * (r + q / 2.0)
+    else:
+        side = radius_m * 2.0
+        q = np.floor(x / side)
+        r = np.floor(y / side)
+        cx = (q + 0.5) * side
+        cy = (r + 0.5) * side
+
+    keys = q.astype(np.int64) * 2_000_003 + r.astype(np.int64)
+    unique_keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+    return pd.DataFrame({
+        'lon': cx[first] / kx,
+        'lat': cy[first] / METERS_PER_DEGREE,
+        'weight': np.bincount(inverse, weights=weight, minlength=len(unique_keys)),
+        'points': np.bincount(inverse, minlength=len(unique_keys)),
+    })
+
+
+def bin_frame(df, age_col, zoom=None, shape='hex', cell_px=14):
+    """
+    Bins a filtered engine frame for the density map. Rows without a
+    geocode (NaN or the 0,0 placeholder) are left out. When zoom is None
+    the view is fitted to the points (1st-99th percentile box) and the
+    cell size follows from that zoom.
+    Returns dict: cells, radius_m, points, view (latitude, longitude, zoom).
+    """
+    lat = pd.to_numeric(df['lat'], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    lon = pd.to_numeric(df['lon'], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    weight = pd.to_numeric(df[age_col], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+    valid = np.isfinite(lat) & np.isfinite(lon) & ~((lat == 0) & (lon == 0))
+    lat, lon, weight = lat[valid], lon[valid], weight[valid]
+
+    if len(lat) == 0:
+        view = {'latitude': 22.0, 'longitude': 78.0, 'zoom': 4.0 if zoom is None else zoom}
+    else:
+        lat_lo, lat_hi = np.percentile(lat, [1, 99])
+        lon_lo, lon_hi = np.percentile(lon, [1, 99])
+        view = {
+            'latitude': float(np.median(lat)),
+            'longitude': float(np.median(lon)),
+            'zoom': zoom_for_extent(lat_lo, lat_hi, lon_lo, lon_hi) if zoom is None else zoom,
+        }
+
+    radius_m = cell_radius_for_zoom(view['zoom'], view['latitude'], cell_px)
+    cells = bin_points(lat, lon, weight, radius_m, shape=shape, ref_lat=view['latitude'])
+    return {'cells': cells, 'radius_m': radius_m, 'points': int(len(lat)), 'view': view}
@@ -0,0 +1,550 @@
+import glob
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from modules.dataset import PINCODE_RANGE
+
+# Raw UIDAI drops have 7 columns: 20-03-2025,Assam,Marigaon,782104,20,58,10
+COLUMN_NAMES = ['date', 'state', 'district', 'pincode', 'age_0_5', 'age_5_17', 'age_18_greater']
+AGE_COLUMNS = ['age_0_5', 'age_5_17', 'age_18_greater']
+
+# Hive layout: uidai_dataset/state=Assam/month=2025-03/part-....parquet
+PARTITION_SCHEMA = pa.schema([
+    ('state', pa.string()),
+    ('month', pa.string()),
+])
+
+# Compact on-disk types for everything that is not a partition key
+FILE_SCHEMA = pa.schema([
+    ('date', pa.date32()),
+    ('district', pa.dictionary(pa.int32(), pa.string())),
+    ('pincode', pa.uint32()),
+    ('age_0_5', pa.int32()),
+    ('age_5_17', pa.int32()),
+    ('age_18_greater', pa.int32()),
+])
+
+UNKNOWN_MONTH = 'unknown'
+MANIFEST_NAME = '_manifest.json'  # leading '_' keeps it out of dataset discovery
+DIGEST_WINDOW = 64 * 1024  # bytes hashed at each end of the ingested prefix
+DEFAULT_CHUNKSIZE = 500_000
+ROW_GROUP_SIZE = 128_000
+MAX_ROWS_PER_FILE = 1_000_000  # compaction target: one file per partition for most drops
+COMPACT_MIN_FILES = 8  # ingest merges a partition once it holds this many part files
+
+
+def expand_inputs(input_pattern):
+    """Resolves a CSV path or glob of CSV shards into a sorted file list."""
+    if os.path.isfile(input_pattern):
+        return [input_pattern]
+    return sorted(glob.glob(input_pattern))
+
+
+class _ByteRange(io.RawIOBase):
+    """Read-only view of bytes [start, end) of an open file."""
+
+    def __init__(self, f, start, end):
+        self._f = f
+        self._remaining = None if end is None else max(end - start, 0)
+        f.seek(start)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = len(buffer) if self._remaining is None else min(len(buffer), self._remaining)
+        data = self._f.read(size)
+        buffer[:len(data)] = data
+        if self._remaining is not None:
+            self._remaining -= len(data)
+        return len(data)
+
+
+def iter_csv_chunks(path, chunksize=DEFAULT_CHUNKSIZE, offset=0, end=None):
+    """
+    Streams a raw UIDAI CSV in bounded-size chunks of raw strings.
+    offset/end: byte range to read; a non-zero offset resumes an appended
+    file without parsing the header or any row before it.
+    """
+    with open(path, 'rb') as f:
+        reader = pd.read_csv(
+            io.BufferedReader(_ByteRange(f, offset, end)),
+            names=COLUMN_NAMES,
+            header=None if offset else 0,
+            dtype=str,
+            chunksize=chunksize,
+        )
+        yield from reader
+
+
+def clean_chunk(chunk):
+    """
+    Applies the convert_data.py rules to one chunk and returns a compact
+    Arrow table (date32, uint32 pincode, int32 counts, dictionary district).
+    """
+    # Force Date format so the Trend Chart works
+    dates = pd.to_datetime(chunk['date'], dayfirst=True, errors='coerce')
+
+    # Clean up text
+    state = chunk['state'].astype(str).str.strip()
+    district = chunk['district'].astype(str).str.strip()
+
+    # Handle format differences (e.g., 504299.0 vs 504299); garbage becomes null.
+    # Floored and range-checked like compile_geocode_index and dataset.pincode_keys
+    pincode = np.floor(pd.to_numeric(chunk['pincode'], errors='coerce'))
+    pincode = pincode.where(pincode.between(*PINCODE_RANGE))
+
+    columns = {
+        'date': pa.array(dates.dt.date, type=pa.date32(), from_pandas=True),
+        'district': pa.array(district, type=pa.string()).dictionary_encode(),
+        'pincode': pa.array(pincode, type=pa.uint32(), from_pandas=True),
+    }
+    for col in AGE_COLUMNS:
+        counts = pd.to_numeric(chunk[col], errors='coerce').fillna(0)
+        columns[col] = pa.array(counts.astype('int32'), type=pa.int32())
+    columns['state'] = pa.array(state, type=pa.string())
+    # Unparseable dates still need a partition; null keys break dictionary unification
+    columns['month'] = pa.array(dates.dt.strftime('%Y-%m').fillna(UNKNOWN_MONTH), type=pa.string())
+
+    return pa.table(columns, schema=pa.schema(list(FILE_SCHEMA) + list(PARTITION_SCHEMA)))
+
+
+PARQUET_OPTIONS = dict(compression='zstd', write_statistics=True)
+
+
+def write_partitioned(table, output_dir, basename):
+    """Appends a cleaned table to the Hive-partitioned dataset."""
+    ds.write_dataset(
+        table,
+        output_dir,
+        format='parquet',
+        partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'),
+        basename_template=f"{basename}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+        file_options=ds.ParquetFileFormat().make_write_options(**PARQUET_OPTIONS),
+        max_rows_per_group=ROW_GROUP_SIZE,
+        min_rows_per_group=min(ROW_GROUP_SIZE, max(table.num_rows, 1)),
+    )
+
+
+def convert_chunk(chunk, output_dir, basename, after_date=None):
+    """
+    Worker task: clean one raw chunk, write it, return its summary.
+    after_date: optional ISO date; rows on or before it are dropped.
+    """
+    table = clean_chunk(chunk)
+    if after_date is not None:
+        cutoff = pa.scalar(pd.Timestamp(after_date).date(), type=pa.date32())
+        table = table.filter(pc.greater(table['date'], cutoff))
+    if table.num_rows:
+        write_partitioned(table, output_dir, basename)
+    extent = pc.min_max(table['date'])
+    return {
+        'rows': table.num_rows,
+        'undated': table['date'].null_count,
+        'min_date': None if not extent['min'].is_valid else extent['min'].as_py().isoformat(),
+        'max_date': None if not extent['max'].is_valid else extent['max'].as_py().isoformat(),
+    }
+
+
+def new_batch_id():
+    """Unique, sortable prefix so part files from different runs never collide."""
+    return time.strftime('%Y%m%dT%H%M%S') + f"{time.time_ns() % 1_000_000:06d}"
+
+
+def stream_convert(input_files, output_dir, chunksize=DEFAULT_CHUNKSIZE, workers=None,
+                   batch_id='0', offsets=None, ends=None, after_date=None, min_files=COMPACT_MIN_FILES):
+    """
+    STREAMING INGEST: Reads CSV shards chunk by chunk and writes a
+    Hive-partitioned Parquet dataset. At most 2 chunks per worker are in
+    flight, so peak memory depends on chunksize, not on input size.
+    offsets/ends: optional {path: byte offset} to resume appended files
+    and to stop at a known size.
+    min_files: part files a partition needs before it is compacted (2 =
+    every partition with more than one; increments keep the default).
+    Returns one summary dict per input file.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    offsets, ends = offsets or {}, ends or {}
+    summaries = {path: {'rows': 0, 'undated': 0, 'min_date': None, 'max_date': None} for path in input_files}
+
+    def record(path, result):
+        summary = summaries[path]
+        summary['rows'] += result['rows']
+        summary['undated'] += result['undated']
+        for key, pick in (('min_date', min), ('max_date', max)):
+            if result[key] is not None:
+                summary[key] = result[key] if summary[key] is None else pick(summary[key], result[key])
+
+    def jobs():
+        for file_no, path in enumerate(input_files):
+            for chunk_no, chunk in enumerate(iter_csv_chunks(path, chunksize, offsets.get(path, 0), ends.get(path))):
+                yield path, chunk, f"part-{batch_id}-{file_no}-{chunk_no}"
+
+    if workers <= 1:
+        for path, chunk, basename in jobs():
+            record(path, convert_chunk(chunk, output_dir, basename, after_date))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = {}
+            for path, chunk, basename in jobs():
+                pending[pool.submit(convert_chunk, chunk, output_dir, basename, after_date)] = path
+                if len(pending) >= workers * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(pending.pop(future), future.result())
+            for future in list(pending):
+                record(pending.pop(future), future.result())
+
+    # Chunks leave small files in every partition they touch: merge the
+    # partitions that have piled up enough of them (not every increment)
+    compact_dataset(output_dir, batch_id=batch_id, workers=workers, min_files=min_files)
+    return summaries
+
+
+# --- COMPACTION ---
+
+def _part_files(partition_dir):
+    return sorted(name for name in os.listdir(partition_dir)
+                  if name.endswith('.parquet') and not name.startswith(('.', '_')))
+
+
+def _merge_runs(files, max_rows_per_file):
+    """
+    Groups small files (name, rows, first date) into runs of at most
+    max_rows_per_file rows, in date order so each merged file covers a
+    narrow date range.
+    """
+    runs, run, rows = [], [], 0
+    for name, num_rows, _ in sorted(files, key=lambda f: (f[2] is None, f[2] or 0, f[0])):
+        if run and rows + num_rows > max_rows_per_file:
+            runs.append(run)
+            run, rows = [], 0
+        run.append(name)
+        rows += num_rows
+    if run:
+        runs.append(run)
+    return runs
+
+
+def _first_date(metadata):
+    """Smallest 'date' in a file's row-group statistics (None if absent)."""
+    column = metadata.schema.names.index('date') if 'date' in metadata.schema.names else None
+    lows = []
+    for i in range(metadata.num_row_groups):
+        stats = metadata.row_group(i).column(column).statistics if column is not None else None
+        if stats is None or not stats.has_min_max:
+            return None
+        lows.append(stats.min)
+    return min(lows) if lows else None
+
+
+def recover_swaps(parent_dir):
+    """
+    Finishes or rolls back partition swaps a crash interrupted in
+    parent_dir: a retired copy is restored when its partition is missing,
+    else deleted, and half-written staging folders are dropped.
+    """
+    for leftover in os.listdir(parent_dir):
+        path = os.path.join(parent_dir, leftover)
+        if leftover.startswith('.') and '.old-' in leftover:
+            partition_dir = os.path.join(parent_dir, leftover[1:].rsplit('.old-', 1)[0])
+            if os.path.isdir(partition_dir):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.rename(path, partition_dir)
+        elif leftover.startswith('.') and '.compact-' in leftover:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def compact_partition(partition_dir, batch_id='0', max_rows_per_file=MAX_ROWS_PER_FILE):
+    """
+    Rewrites one state/month partition's small part files as a few large
+    ones (sorted by date, full row groups, so date statistics prune well).
+    Files already at max_rows_per_file are left alone. Small files are
+    merged in runs of at most max_rows_per_file rows, so memory is bounded
+    by one output file, not by the partition.
+    The new file set is staged in a hidden sibling folder (large files
+    hard-linked) and swapped in by renaming folders: readers see the old
+    files or the new ones (for the instant between the two renames,
+    neither), never both. recover_swaps cleans up after a crash.
+    Returns (files before, files after).
+    """
+    names = _part_files(partition_dir)
+    metadata = {n: pq.read_metadata(os.path.join(partition_dir, n)) for n in names}
+    small = [(n, metadata[n].num_rows, _first_date(metadata[n])) for n in names
+             if metadata[n].num_rows < max_rows_per_file]
+    runs = [run for run in _merge_runs(small, max_rows_per_file) if len(run) > 1]
+    if not runs:
+        return len(names), len(names)
+
+    parent, name = os.path.split(partition_dir.rstrip(os.sep))
+    stage_dir = os.path.join(parent, f".{name}.compact-{batch_id}")
+    old_dir = os.path.join(parent, f".{name}.old-{batch_id}")
+    shutil.rmtree(stage_dir, ignore_errors=True)
+    os.makedirs(stage_dir)
+
+    merged = {n for run in runs for n in run}
+    for keep in os.listdir(partition_dir):
+        if keep not in merged:
+            os.link(os.path.join(partition_dir, keep), os.path.join(stage_dir, keep))
+    for i, run in enumerate(runs):
+        batches = ds.dataset([os.path.join(partition_dir, n) for n in run], schema=FILE_SCHEMA,
+                             format='parquet').to_batches()
+        table = pa.Table.from_batches(batches, schema=FILE_SCHEMA)
+        table = table.sort_by([('date', 'ascending'), ('pincode', 'ascending')])
+        pq.write_table(table, os.path.join(stage_dir, f"part-{batch_id}-c{i}.parquet"),
+                       row_group_size=ROW_GROUP_SIZE, **PARQUET_OPTIONS)
+        del table, batches
+
+    os.rename(partition_dir, old_dir)
+    os.rename(stage_dir, partition_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return len(names), len(names) - len(merged) + len(runs)
+
+
+def _compact_partitions(partition_dirs, batch_id, max_rows_per_file):
+    return [compact_partition(d, batch_id, max_rows_per_file) for d in partition_dirs]
+
+
+def compact_dataset(output_dir, batch_id='0', workers=None, max_rows_per_file=MAX_ROWS_PER_FILE,
+                    min_files=2):
+    """
+    COMPACTION PASS: merges the small part files of every partition holding
+    at least min_files part files, so a partition keeps a bounded handful
+    of files however many chunks and increments wrote to it. Ingest passes
+    COMPACT_MIN_FILES: an increment appends a file per partition and only
+    every so many increments pay for a merge. Other partitions are only
+    listed.
+    Returns (files before, files after) over the partitions it rewrote.
+    """
+    partitions = []
+    for root, dirs, names in os.walk(output_dir):
+        if any(d.startswith('.') for d in dirs):
+            recover_swaps(root)
+            dirs[:] = [d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d))]
+        dirs[:] = [d for d in dirs if not d.startswith(('.', '_'))]
+        # Leaf partitions only (ingest never writes files next to sub-folders)
+        if not dirs and sum(n.endswith('.parquet') and not n.startswith(('.', '_'))
+                            for n in names) >= max(min_files, 2):
+            partitions.append(root)
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    if workers <= 1 or len(partitions) < 2:
+        results = _compact_partitions(partitions, batch_id, max_rows_per_file)
+    else:
+        # A few partitions per task: most are tiny, so per-task overhead would dominate
+        batches = [partitions[i::workers * 4] for i in range(workers * 4)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = [r for batch in pool.map(_compact_partitions, batches,
+                                               [batch_id] * len(batches), [max_rows_per_file] * len(batches))
+                       for r in batch]
+    return sum(before for before, _ in results), sum(after for _, after in results)
+
+
+# --- INCREMENTAL INGEST (WATERMARK MANIFEST) ---
+
+def load_manifest(output_dir):
+    """Reads the ingest manifest, or an empty one for a fresh dataset."""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {'watermark': None, 'files': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(output_dir, manifest):
+    """Atomically rewrites the manifest so a crash never leaves it half-written."""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def complete_lines_end(path, start, end):
+    """
+    Offset just past the last newline in bytes [start, end), or start when
+    there is none. A row still being written (or missing its newline) is
+    left for the next run instead of being ingested truncated.
+    """
+    with open(path, 'rb') as f:
+        pos = end
+        while pos > start:
+            size = min(DIGEST_WINDOW, pos - start)
+            f.seek(pos - size)
+            cut = f.read(size).rfind(b'\n')
+            if cut >= 0:
+                return pos - size + cut + 1
+            pos -= size
+    return start
+
+
+def prefix_digest(path, offset):
+    """sha1 of the first and last DIGEST_WINDOW bytes before offset (the ingested prefix)."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        digest.update(f.read(min(DIGEST_WINDOW, offset)))
+        tail = max(offset - DIGEST_WINDOW, DIGEST_WINDOW)
+        if tail < offset:
+            f.seek(tail)
+            digest.update(f.read(offset - tail))
+    return digest.hexdigest()
+
+
+def _is_append(path, entry, offset):
+    """The ingested prefix is unchanged and the new bytes start on a row boundary."""
+    if entry.get('digest') is not None and prefix_digest(path, offset) != entry['digest']:
+        return False
+    if offset == 0:
+        return True
+    with open(path, 'rb') as f:
+        f.seek(offset - 1)
+        around = f.read(2)
+    # Past a newline, or a file that ended without one and was appended starting with one
+    return around[:1] == b'\n' or around[1:] in (b'\n', b'\r')
+
+
+def plan_increment(input_files, manifest):
+    """
+    Compares input files against the manifest.
+    Returns (offsets, skipped, rewritten):
+      offsets   -> {path: byte offset} for new files (0) and grown files
+                   (just past the last complete row already ingested)
+      skipped   -> files already fully ingested
+      rewritten -> files that shrank or whose ingested bytes changed (need a rebuild)
+    """
+    offsets, skipped, rewritten = {}, [], []
+    for path in input_files:
+        stat = os.stat(path)
+        entry = manifest['files'].get(os.path.abspath(path))
+        if entry is None:
+            offsets[path] = 0
+            continue
+        done = entry.get('offset', entry['size'])  # manifests before 'offset' consumed whole files
+        if stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime_ns']:
+            skipped.append(path)
+        elif stat.st_size >= done and _is_append(path, entry, done):
+            if stat.st_size > done:
+                offsets[path] = done
+            else:
+                skipped.append(path)  # touched, not changed
+        else:
+            rewritten.append(path)
+    return offsets, skipped, rewritten
+
+
+def record_ingest(manifest, input_files, summaries, batch_id, stats, ends=None):
+    """
+    Folds one run's per-file summaries into the manifest and watermark.
+    ends: {path: byte offset read up to} (default: the whole file as stat'ed).
+    """
+    ends = ends or {}
+    for path in input_files:
+        key = os.path.abspath(path)
+        summary = summaries[path]
+        entry = manifest['files'].get(key, {'rows': 0, 'undated': 0, 'min_date': None, 'max_date': None,
+                                            'batches': []})
+        entry['rows'] += summary['rows']
+        if 'undated' in entry:  # entries from older manifests have no undated count (see dataset_row_count)
+            entry['undated'] += summary['undated']
+        entry['size'] = stats[path].st_size
+        entry['mtime_ns'] = stats[path].st_mtime_ns
+        entry['offset'] = ends.get(path, stats[path].st_size)
+        entry['digest'] = prefix_digest(path, entry['offset'])
+        entry['batches'].append(batch_id)
+        for field, pick in (('min_date', min), ('max_date', max)):
+            values = [v for v in (entry[field], summary[field]) if v is not None]
+            entry[field] = pick(values) if values else None
+        manifest['files'][key] = entry
+
+    ends = [e['max_date'] for e in manifest['files'].values() if e['max_date']]
+    manifest['watermark'] = max(ends) if ends else None
+    return manifest
+
+
+def incremental_convert(input_files, output_dir, chunksize=DEFAULT_CHUNKSIZE, workers=None,
+                        after_watermark=False):
+    """
+    INCREMENTAL INGEST: Only parses files (or appended tails of files) that
+    the manifest has not seen, and writes them as new part files.
+    after_watermark: also drop rows dated on/before the current watermark
+    (for publishers that re-send cumulative files under new names).
+    Returns (summaries, skipped, rewritten).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    offsets, skipped, rewritten = plan_increment(input_files, manifest)
+
+    # Read only complete rows of the size seen now: bytes appended mid-run,
+    # and a last row still being written, are picked up next time
+    stats = {path: os.stat(path) for path in offsets}
+    ends = {path: complete_lines_end(path, offset, stats[path].st_size) for path, offset in offsets.items()}
+    todo = [path for path in offsets if ends[path] > offsets[path]]
+    skipped += [path for path in offsets if ends[path] <= offsets[path]]
+    if not todo:
+        return {}, skipped, rewritten
+
+    batch_id = new_batch_id()
+    summaries = stream_convert(
+        todo, output_dir, chunksize=chunksize, workers=workers, batch_id=batch_id,
+        offsets=offsets, ends=ends,
+        after_date=manifest['watermark'] if after_watermark else None,
+    )
+    save_manifest(output_dir, record_ingest(manifest, todo, summaries, batch_id, stats, ends))
+    return summaries, skipped, rewritten
+
+
+# --- PINCODE GEOCODE INDEX ---
+
+def compile_geocode_index(mapping_path):
+    """
+    Parses pincode-mapping.csv once into sorted arrays:
+    pincode (uint32, unique, ascending), lat/lon (float32).
+    Same rules as the old loader: bad rows skipped, unparseable coordinates
+    dropped, first occurrence of a duplicated pincode wins.
+    """
+    geo_df = pd.read_csv(
+        mapping_path,
+        usecols=[0, 1, 2],
+        dtype=str,
+        na_values=['NA', 'nan'],
+        on_bad_lines='skip',
+        engine='python'
+    )
+    geo_df.columns = geo_df.columns.str.strip().str.lower()
+    geo_df = geo_df.rename(columns={'latitude': 'lat', 'lattitude': 'lat', 'longitude': 'lon'})
+
+    lat = pd.to_numeric(geo_df['lat'], errors='coerce')
+    lon = pd.to_numeric(geo_df['lon'], errors='coerce')
+    # 504299.0 and 504299 are the same pincode
+    pincode = np.floor(pd.to_numeric(geo_df['pincode'].str.strip(), errors='coerce'))
+
+    valid = lat.notna() & lon.notna() & pincode.between(*PINCODE_RANGE)
+    table = pd.DataFrame({'pincode': pincode[valid].astype('uint32'), 'lat': lat[valid], 'lon': lon[valid]})
+    table = table.drop_duplicates(subset=['pincode']).sort_values('pincode')
+
+    return {
+        'pincode': table['pincode'].to_numpy(dtype=np.uint32),
+        'lat': table['lat'].to_numpy(dtype=np.float32),
+        'lon': table['lon'].to_numpy(dtype=np.float32),
+    }
+
+
+def save_geocode_index(index, output_path):
+    """Persists the compiled index as an uncompressed .npz (~12 bytes per pincode)."""
+    tmp_path = output_path + '.tmp.npz'
+    np.savez(tmp_path, **index)
+    os.replace(tmp_path, output_path)
@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import datetime
+import functools
+import contextlib
+import contextvars
+import itertools
+import threading
+import tracemalloc
+import uuid
+
+import numpy as np
+import pandas as pd
+
+STAGE_LOG_ENV = 'UIDAI_STAGE_LOG'  # set to a file path to append every run as JSON lines
+TRACE_MEMORY_ENV = 'UIDAI_TRACE_MEMORY'  # '1' turns on allocation tracing (tracemalloc, ~2x slower builds)
+STAGE_COLUMNS = ['stage', 'seconds', 'rows_in', 'rows_out', 'rss_delta_mb', 'alloc_peak_mb', 'alloc_net_mb', 'depth']
+
+# Records of the current rerun; each Streamlit session runs in its own thread/context
+_RUN = contextvars.ContextVar('instrumentation_run', default=None)
+# Open stages, outermost first (their depth is their position)
+_OPEN = contextvars.ContextVar('instrumentation_open', default=())
+# Traced stages open in any thread: tracemalloc's peak is one process-wide
+# counter, so a stage resetting it first hands the peak so far to all of them
+_TRACED = {}
+_TRACED_LOCK = threading.Lock()
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else None
+
+
+def trace_memory():
+    """
+    Starts tracemalloc when $UIDAI_TRACE_MEMORY is '1'; True when
+    allocations are being traced (Python objects and NumPy/pandas buffers).
+    Off by default: tracing every allocation slows cold builds about 2x.
+    """
+    if not tracemalloc.is_tracing() and os.environ.get(TRACE_MEMORY_ENV) == '1':
+        tracemalloc.start()
+    return tracemalloc.is_tracing()
+
+
+def rss_bytes():
+    """Resident set size of the process (Linux /proc, no tracing cost); None where unavailable."""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError, TypeError):
+        return None
+
+
+def count_rows(obj):
+    """Row count of a stage input/output: frames, arrays, GeoJSON features, a tuple's first item; else None."""
+    if isinstance(obj, (pd.DataFrame, pd.Series, np.ndarray, list)):
+        return len(obj)
+    if isinstance(obj, tuple) and obj:
+        return count_rows(obj[0])
+    if isinstance(obj, dict) and isinstance(obj.get('features'), list):
+        return len(obj['features'])  # GeoJSON FeatureCollection
+    return None
+
+
+def start_run(page):
+    """Begins a new run (one per script rerun); stages recorded from here on belong to it."""
+    trace_memory()
+    run = {'run_id': uuid.uuid4().hex[:12], 'page': page,
+           'started': datetime.datetime.now().isoformat(timespec='seconds'), 'stages': [],
+           'seq': itertools.count()}
+    _RUN.set(run)
+    _OPEN.set(())
+    return run
+
+
+def _raise_peak(peak):
+    for record in _TRACED.values():
+        record['_peak'] = max(record['_peak'], peak)
+
+
+@contextlib.contextmanager
+def stage(name, rows_in=None):
+    """
+    Times a block and records it on the current run (no-op bookkeeping when
+    no run is active). Yields the record: set record['rows_out'] inside.
+    Memory, every run: rss_delta_mb is the change in process RSS over the
+    stage (None off Linux). With $UIDAI_TRACE_MEMORY, tracemalloc adds
+    alloc_peak_mb, the most allocated at once above the stage's starting
+    point, and alloc_net_mb, what it still holds at the end.
+    Both are process-wide: stages running at the same time in other
+    threads (audit engines, concurrent sessions) count in each other's
+    numbers. Resetting the peak never loses another open stage's peak.
+    """
+    run = _RUN.get()
+    parents = _OPEN.get()
+    # seq: start order (records are appended as stages finish, parents after children)
+    record = {'stage': name, 'rows_in': rows_in, 'rows_out': None, 'depth': len(parents),
+              'seq': next(run['seq']) if run is not None else 0,
+              'rss_delta_mb': None, 'alloc_peak_mb': None, 'alloc_net_mb': None}
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        with _TRACED_LOCK:
+            # Open stages (any thread) keep the peak reached so far; this one starts its own
+            current, peak = tracemalloc.get_traced_memory()
+            _raise_peak(peak)
+            tracemalloc.reset_peak()
+            record['_base'] = record['_peak'] = current
+            _TRACED[id(record)] = record
+    token = _OPEN.set(parents + (record,))
+    rss_start = rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        rss_end = rss_bytes()
+        if rss_start is not None and rss_end is not None:
+            record['rss_delta_mb'] = (rss_end - rss_start) / 1e6
+        _OPEN.reset(token)
+        if tracing:
+            with _TRACED_LOCK:
+                if tracemalloc.is_tracing():
+                    current, peak = tracemalloc.get_traced_memory()
+                    _raise_peak(peak)
+                    record['alloc_peak_mb'] = (record['_peak'] - record['_base']) / 1e6
+                    record['alloc_net_mb'] = (current - record['_base']) / 1e6
+                _TRACED.pop(id(record), None)
+        record.pop('_peak', None)
+        record.pop('_base', None)
+        if run is not None and 'status' not in run:  # late stages of abandoned threads are dropped
+            run['stages'].append(record)
+
+
+def instrument(name=None):
+    """
+    Decorator form of stage(): rows_in is the first DataFrame/Series argument,
+    rows_out the length of the result. Functions behind a Streamlit cache
+    only show up when they actually run (a cache miss).
+    """
+    def decorate(fn):
+        label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            frames = [a for a in (*args, *kwargs.values()) if isinstance(a, (pd.DataFrame, pd.Series))]
+            with stage(label, rows_in=len(frames[0]) if frames else None) as record:
+                result = fn(*args, **kwargs)
+                record['rows_out'] = count_rows(result)
+            return result
+        return wrapper
+    return decorate
+
+
+def stage_report(run=None):
+    """Current run's stages in start order, nested ones indented under their parent."""
+    run = run or _RUN.get()
+    if not run or not run['stages']:
+        return pd.DataFrame(columns=STAGE_COLUMNS)
+    report = pd.DataFrame(run['stages']).sort_values('seq', kind='stable', ignore_index=True)
+    report['stage'] = [('  ' * d + '↳ ' if d else '') + s for s, d in zip(report['stage'], report['depth'])]
+    report['seconds'] = report['seconds'].round(3)
+    report[['rows_in', 'rows_out']] = report[['rows_in', 'rows_out']].astype('Int64')
+    for column in ('rss_delta_mb', 'alloc_peak_mb', 'alloc_net_mb'):
+        report[column] = report[column].astype('float64').round(1)
+    return report[STAGE_COLUMNS]
+
+
+def finish_run(log_path=None, status='ok'):
+    """
+    Ends the current run and, when log_path or $UIDAI_STAGE_LOG is set,
+    appends one JSON line per stage for offline regression hunting.
+    status: recorded on every line ('stopped' for early exits, which are
+    logged even without stages).
+    Returns the run.
+    """
+    run = _RUN.get()
+    if run is None:
+        return None
+    run['status'] = status
+    log_path = log_path or os.environ.get(STAGE_LOG_ENV)
+    records = run['stages']
+    if not records and status != 'ok':
+        records = [{'stage': None}]  # a stopped rerun is logged even when it ran no stage
+    if not log_path or not records:
+        return run
+    os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+    with open(log_path, 'a', encoding='utf-8') as f:
+        for record in records:
+            line = {'run_id': run['run_id'], 'page': run['page'], 'started': run['started'], 'status': status,
+                    **{k: v for k, v in record.items() if k != 'seq'}}
+            f.write(json.dumps(line, default=str) + '\n')
+    return run
@@ -1,25 +1,63 @@
 
+import os
+import joblib
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import IsolationForest
 from statsmodels.tsa.seasonal import STL
+from modules.instrumentation import instrument
 
-def detect_anomalies(df, age_col, contamination=0.05):
+@instrument()
+def score_anomalies(df, age_col):
+    """
+    Trains the Isolation Forest once and keeps its raw scores
+    (score_samples: lower = more isolated). Contamination plays no part in
+    training; it only places the cut, see detect_anomalies.
+    Returns dict: profile (pincode totals), scores, model.
+    """
+    profile = df.groupby('pincode')[[age_col]].sum().reset_index()
+    model = IsolationForest(random_state=42)
+    model.fit(profile[[age_col]])
+    return {'profile': profile, 'scores': model.score_samples(profile[[age_col]]), 'model': model}
+
+@instrument()
+def load_or_score_anomalies(df, age_col, cache_path):
+    """score_anomalies persisted with joblib, so a restart skips retraining."""
+    if os.path.exists(cache_path):
+        try:
+            return joblib.load(cache_path)
+        except Exception:
+            pass  # Unreadable cache: retrain and overwrite it
+    scored = score_anomalies(df, age_col)
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    tmp_path = cache_path + '.tmp'
+    joblib.dump(scored, tmp_path)
+    os.replace(tmp_path, cache_path)
+    return scored
+
+@instrument()
+def detect_anomalies(df, age_col, contamination=0.05, scored=None):
     """
     ML ENGINE: Isolation Forest
     Finds 'Structural Outliers' by identifying Pincodes with 
     mathematically unique enrollment patterns.
+    scored: cached score_anomalies output; contamination is then just a
+    quantile cut on the stored scores (same threshold sklearn sets as offset_).
     """
     if df.empty: return pd.DataFrame()
+    if scored is None:
+        scored = score_anomalies(df, age_col)
     
-    profile = df.groupby('pincode')[[age_col]].sum().reset_index()
-    model = IsolationForest(contamination=contamination, random_state=42)
+    profile = scored['profile'].copy()
+    scores = scored['scores']
+    offset = np.percentile(scores, 100.0 * contamination)
     
-    profile['anomaly_score'] = model.fit_predict(profile[[age_col]])
-    profile['risk_factor'] = model.decision_function(profile[[age_col]])
+    profile['anomaly_score'] = np.where(scores < offset, -1, 1)
+    profile['risk_factor'] = scores - offset
     
     return profile[profile['anomaly_score'] == -1].sort_values(by=age_col, ascending=False)
 
+@instrument()
 def z_score_audit(df, age_col):
     """
     STATISTICAL ENGINE: 3-Sigma Rule
@@ -34,6 +72,42 @@ def z_score_audit(df, age_col):
     stats['z_score'] = (stats[age_col] - mean_val) / std_val
     return stats[stats['z_score'] > 3].sort_values(by='z_score', ascending=False)
 
+def _grouped_rolling_stats(values, group_start, window):
+    """
+    ROLLING KERNEL: trailing-window mean and sample std (ddof=1) for every
+    row of group-contiguous arrays, in one O(n) pass over cumulative sums.
+    group_start[i] is the first row of row i's group. Matches pandas
+    rolling(window, min_periods=1): NaNs are skipped, std is NaN below
+    2 values. Integer inputs are summed exactly in int64.
+    """
+    n = len(values)
+    rows = np.arange(n)
+    lo = np.maximum(group_start, rows - window + 1)
+
+    valid = ~np.isnan(values) if values.dtype.kind == 'f' else np.ones(n, dtype=bool)
+    if values.dtype.kind in 'iub':
+        v = values.astype(np.int64)
+        shift = 0.0
+    else:
+        # Centre floats first so the sum-of-squares difference keeps precision
+        shift = float(np.nanmean(values)) if valid.any() else 0.0
+        v = np.where(valid, values - shift, 0.0)
+
+    def window_sum(x):
+        c = np.concatenate(([0], np.cumsum(x)))
+        return c[rows + 1] - c[lo]
+
+    count = window_sum(valid.astype(np.int64))
+    total = window_sum(v)
+    squares = window_sum(v * v)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(count > 0, total / count + shift, np.nan)
+        spread = (count * squares - total * total).astype(np.float64)
+        var = np.where(count > 1, np.maximum(spread, 0.0) / (count * (count - 1.0)), np.nan)
+    return mean, np.sqrt(var)
+
+@instrument()
 def get_rolling_anomalies(df, age_col, window=14):
     """
     EARLY WARNING SYSTEM: Rolling Baseline
@@ -42,20 +116,37 @@ def get_rolling_anomalies(df, age_col, window=14):
     """
     if df.empty: return pd.DataFrame()
     
-    # Sort for time-series consistency
-    df_sorted = df.sort_values(['pincode', 'date'])
-    
+    # Sort for time-series consistency (row order only; columns are not copied)
+    order = df[['pincode', 'date']].reset_index(drop=True).sort_values(['pincode', 'date']).index.to_numpy()
+    codes = pd.factorize(df['pincode'])[0][order]
+    has_pincode = codes >= 0
+
+    # Group boundaries in the sorted order; rows without a pincode form no group
+    same = np.zeros(len(order), dtype=bool)
+    same[1:] = (codes[1:] == codes[:-1]) & has_pincode[1:]
+    group_start = np.maximum.accumulate(np.where(same, 0, np.arange(len(order))))
+
     # Calculate adaptive baseline
-    group = df_sorted.groupby('pincode')[age_col]
-    df_sorted['rolling_avg'] = group.transform(lambda x: x.rolling(window=window, min_periods=1).mean())
-    df_sorted['rolling_std'] = group.transform(lambda x: x.rolling(window=window, min_periods=1).std())
+    values = df[age_col].to_numpy()
+    if values.dtype.kind not in 'iubf':
+        values = pd.to_numeric(df[age_col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    values = values[order]
+    rolling_avg, rolling_std = _grouped_rolling_stats(values, group_start, window)
+    rolling_avg[~has_pincode] = np.nan
+    rolling_std[~has_pincode] = np.nan
     
     # Adaptive Z-Score (Today vs Recent History)
-    df_sorted['rolling_z'] = (df_sorted[age_col] - df_sorted['rolling_avg']) / (df_sorted['rolling_std'] + 1e-6)
+    rolling_z = (values - rolling_avg) / (rolling_std + 1e-6)
     
     # Return only the most recent significant spikes
-    return df_sorted[df_sorted['rolling_z'] > 3].sort_values(by='date', ascending=False)
+    flagged = rolling_z > 3
+    spikes = df.iloc[order[flagged]].copy()
+    spikes['rolling_avg'] = rolling_avg[flagged]
+    spikes['rolling_std'] = rolling_std[flagged]
+    spikes['rolling_z'] = rolling_z[flagged]
+    return spikes.sort_values(by='date', ascending=False)
 
+@instrument()
 def decompose_signals(df, age_col):
     """
     SIGNAL FILTER: STL Decomposition
@@ -70,3 +161,92 @@ def decompose_signals(df, age_col):
         
     # period=7 captures the weekly "heartbeat" of the centers
     return STL(daily, period=7).fit()
+
+@instrument()
+def decompose_signals_batch(df, age_col, by='district', period=7, last_days=None):
+    """
+    BATCH SIGNAL FILTER: classical additive decomposition for every series
+    (one per district or pincode) at once over a dense series x day array.
+      trend    -> centred moving average over `period` days (NaN at the edges)
+      seasonal -> mean detrended value per weekday, centred to sum to zero
+      resid    -> observed - trend - seasonal ('Unexplained Surges')
+    Days without rows count as 0, like decompose_signals. last_days keeps
+    only the most recent days, which bounds memory for pincode-level runs.
+    decompose_signals (statsmodels STL, system-wide) stays the reference.
+    Returns dict of wide float32 DataFrames (series x date): observed,
+    trend, seasonal, resid; None when there is too little history.
+    """
+    if df.empty or by not in df.columns or 'date' not in df.columns:
+        return None
+
+    dates = pd.to_datetime(df['date'], errors='coerce').dt.normalize()
+    valid = (dates.notna() & df[by].notna()).to_numpy()
+    if last_days is not None and valid.any():
+        valid = valid & (dates >= dates[valid].max() - pd.Timedelta(days=last_days - 1)).to_numpy()
+    if not valid.any():
+        return None
+
+    series_codes, series = pd.factorize(df[by][valid], sort=True)
+    day_values = dates[valid]
+    first_day = day_values.min()
+    day_codes = ((day_values - first_day).dt.days).to_numpy()
+    n_series, n_days = len(series), int(day_codes.max()) + 1
+    if n_days < 2 * period:  # Same minimum history as decompose_signals
+        return None
+
+    weights = pd.to_numeric(df[age_col][valid], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+    cell = series_codes.astype(np.int64) * n_days + day_codes
+    observed = np.bincount(cell, weights=weights, minlength=n_series * n_days).reshape(n_series, n_days)
+
+    # Centred moving average via cumulative sums (even periods use the 2 x MA form)
+    csum = np.concatenate([np.zeros((n_series, 1)), np.cumsum(observed, axis=1)], axis=1)
+    trend = np.full_like(observed, np.nan)
+    half = period // 2
+    if period % 2:
+        trend[:, half:n_days - half] = (csum[:, period:] - csum[:, :-period]) / period
+    else:
+        ma = (csum[:, period:] - csum[:, :-period]) / period
+        trend[:, half:n_days - half] = (ma[:, :-1] + ma[:, 1:]) / 2
+
+    # Weekday profile of the detrended signal, centred
+    detrended = observed - trend
+    phase = (np.arange(n_days) + first_day.dayofweek) % period
+    profile = np.stack([np.nanmean(detrended[:, phase == k], axis=1) for k in range(period)], axis=1)
+    profile -= profile.mean(axis=1, keepdims=True)
+    seasonal = profile[:, phase]
+
+    index = pd.Index(np.asarray(series), name=by)
+    columns = pd.date_range(first_day, periods=n_days, freq='D')
+
+    def frame(values):
+        return pd.DataFrame(values.astype(np.float32), index=index, columns=columns)
+
+    return {
+        'observed': frame(observed),
+        'trend': frame(trend),
+        'seasonal': frame(seasonal),
+        'resid': frame(observed - trend - seasonal),
+    }
+
+@instrument()
+def surge_table(decomposition, n=10, recent_days=14):
+    """
+    Series with the largest recent unexplained surge: peak residual in the
+    last `recent_days` with a trend, in units of that series' residual std.
+    """
+    if decomposition is None:
+        return pd.DataFrame()
+
+    resid = decomposition['resid']
+    scale = resid.std(axis=1, skipna=True).replace(0, np.nan)
+    recent = resid.dropna(axis=1, how='all').iloc[:, -recent_days:]
+    if recent.empty:
+        return pd.DataFrame()
+
+    peak_day = recent.idxmax(axis=1)
+    table = pd.DataFrame({
+        'peak_date': peak_day,
+        'peak_resid': recent.max(axis=1),
+        'surge_sigma': recent.max(axis=1) / scale,
+    }).dropna(subset=['surge_sigma'])
+    return table.sort_values('surge_sigma', ascending=False).head(n).reset_index()
@@ -0,0 +1,71 @@
+import os
+import contextlib
+import pandas as pd
+import streamlit as st
+from modules.data_processor import aggregate_for
+from modules.dataset import dataset_version, find_dataset_path, dataset_row_count
+from modules.query_backend import query_backend
+from modules.early_warning import refresh_early_warning, scan_rows_since, ALERT_COLUMNS
+from modules.intelligence import load_or_score_anomalies, decompose_signals_batch
+from modules.instrumentation import instrument
+
+# Cached accessors of the audit page (pages/1_intelligence.py); they run in
+# the audit worker threads, so none of them shows a spinner
+
+def get_early_warning_alerts(age_col):
+    """
+    Current spike alert set from the persisted streaming detector. A new
+    dataset version is checked against the ingest manifest's row count and
+    only the rows after the detector's watermark are scanned and fed to it.
+    """
+    return _early_warning_for(dataset_version(), age_col)
+
+@st.cache_data(show_spinner=False, max_entries=8)  # runs in audit worker threads
+@instrument("early warning refresh (build)")
+def _early_warning_for(version, age_col):
+    path = find_dataset_path()
+    if not path:
+        return pd.DataFrame(columns=ALERT_COLUMNS + [age_col])
+    return refresh_early_warning(scan_rows_since(path, age_col), dataset_row_count(path, dated=True), age_col)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ANOMALY_CACHE_DIR = os.path.join(PROJECT_ROOT, '.cache', 'isolation_forest')
+
+def get_anomaly_scores(age_col):
+    """
+    Trained Isolation Forest and raw pincode scores per (dataset version,
+    age group): held in memory, and on disk via joblib so a restart skips
+    training. Pass to detect_anomalies(scored=...); the contamination slider
+    then only moves the cut.
+    """
+    return _anomaly_scores_for(dataset_version(), age_col)
+
+@st.cache_resource(show_spinner=False, max_entries=6)  # runs in audit worker threads
+@instrument("anomaly scores (build)")
+def _anomaly_scores_for(version, age_col):
+    df = aggregate_for(version, ('pincode',), query_backend())
+    if df.empty:
+        return None
+    cache_path = os.path.join(ANOMALY_CACHE_DIR, f"{version}-{age_col}.joblib")
+    scored = load_or_score_anomalies(df, age_col, cache_path)
+
+    # Models for older dataset versions are never read again (another
+    # session or process may be pruning the same files)
+    for name in os.listdir(ANOMALY_CACHE_DIR):
+        if name.endswith(f"-{age_col}.joblib") and name != os.path.basename(cache_path):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(ANOMALY_CACHE_DIR, name))
+    return scored
+
+# Pincode-level decompositions keep a recent window so the dense array stays small
+DECOMPOSITION_DAYS = {'district': None, 'pincode': 180}
+
+def get_signal_decomposition(age_col, by='district'):
+    """Trend / weekday / residual split for every district or pincode, per dataset version."""
+    return _signal_decomposition_for(dataset_version(), age_col, by)
+
+@st.cache_resource(show_spinner=False, max_entries=6)  # runs in audit worker threads
+@instrument("signal decomposition (build)")
+def _signal_decomposition_for(version, age_col, by):
+    df = aggregate_for(version, (by, 'date'), query_backend())
+    return decompose_signals_batch(df, age_col, by=by, last_days=DECOMPOSITION_DAYS.get(by))
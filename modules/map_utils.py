@@ -92,52 +92,189 @@
 
 import folium
 import pandas as pd
+import numpy as np
 import os
 import json
 import re
+import functools
 from folium.plugins import HeatMap
+from modules.instrumentation import instrument
+from modules.tiles import tile_url
 
-def create_base_map(center, zoom):
+def create_base_map(center, zoom, tiles='CartoDB Positron'):
     """Initializes the Folium map with a clean UI."""
     return folium.Map(
         location=center, 
         zoom_start=zoom, 
-        tiles='CartoDB Positron',
+        tiles=tiles,
         control_scale=True
     )
 
-def add_state_boundaries(m, selected_state):
+# --- BOUNDARY GEOMETRY STORE ---
+BOUNDARY_FILE = os.path.join("data", "india_states.json")
+STATE_FIELD = 'ST_NM'
+# (minimum zoom, Douglas-Peucker tolerance in degrees); 0.0 = full detail
+BOUNDARY_LEVELS = [(9, 0.0), (7, 0.002), (5, 0.01), (0, 0.03)]
+BASE_BOUNDARY_STYLE = {'fillColor': 'transparent', 'color': '#808080', 'weight': 0.5, 'fillOpacity': 0}
+SELECTED_BOUNDARY_STYLE = {'fillColor': '#22c55e', 'color': 'blue', 'weight': 3, 'fillOpacity': 0.2}
+
+def simplify_line(points, tolerance):
     """
-    Loads local GeoJSON and highlights the selected state.
-    Standard key used: 'ST_NM'
+    Douglas-Peucker on an (n, 2) coordinate array, iterative with NumPy
+    distance kernels. Closed rings never drop below 4 points.
     """
-    file_path = os.path.join("data", "india_states.json")
-    
-    if not os.path.exists(file_path):
-        return
+    points = np.asarray(points, dtype=float)
+    n = len(points)
+    if tolerance <= 0 or n <= 4:
+        return points
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = points[start], points[end]
+        inner = points[start + 1:end]
+        dx, dy = b - a
+        length = np.hypot(dx, dy)
+        if length == 0:
+            # Closed ring: the anchor segment is a single point
+            dist = np.hypot(inner[:, 0] - a[0], inner[:, 1] - a[1])
+        else:
+            dist = np.abs(dx * (inner[:, 1] - a[1]) - dy * (inner[:, 0] - a[0])) / length
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            split = start + 1 + i
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    if keep.sum() < 4 and np.array_equal(points[0], points[-1]):
+        # Ring smaller than the tolerance: keep a minimal valid ring
+        keep[np.linspace(0, n - 1, 4).astype(int)] = True
+    return points[keep]
+
+def _simplify_geometry(geometry, tolerance):
+    """Simplifies every ring of a (Multi)Polygon or (Multi)LineString."""
+    depth = {'LineString': 0, 'Polygon': 1, 'MultiLineString': 1, 'MultiPolygon': 2}.get(geometry['type'])
+    if depth is None:
+        return geometry
+
+    def walk(coords, level):
+        if level == 0:
+            return simplify_line(coords, tolerance).round(5).tolist()
+        return [walk(part, level - 1) for part in coords]
 
+    return {'type': geometry['type'], 'coordinates': walk(geometry['coordinates'], depth)}
+
+@functools.lru_cache(maxsize=2)
+def _boundary_store(file_path, mtime):
+    """
+    Parses the boundary file once per process (and file version) and
+    precomputes one FeatureCollection per tolerance, with the base style
+    baked into each feature so folium needs no per-feature style callback.
+    """
     with open(file_path, 'r', encoding='utf-8') as f:
         geo_data = json.load(f)
 
+    levels = {}
+    for _, tolerance in BOUNDARY_LEVELS:
+        features = []
+        for feature in geo_data.get('features', []):
+            geometry = feature.get('geometry')
+            features.append({
+                'type': 'Feature',
+                'properties': {**(feature.get('properties') or {}), 'style': BASE_BOUNDARY_STYLE},
+                'geometry': _simplify_geometry(geometry, tolerance) if geometry else None,
+            })
+        levels[tolerance] = {'type': 'FeatureCollection', 'features': features}
+    return levels
+
+@instrument()
+def get_state_boundaries(zoom=5, file_path=BOUNDARY_FILE):
+    """Cached boundaries at the detail level for this zoom (None if the file is missing)."""
+    if not os.path.exists(file_path):
+        return None
+    levels = _boundary_store(file_path, os.path.getmtime(file_path))
+    tolerance = next(tol for min_zoom, tol in BOUNDARY_LEVELS if zoom >= min_zoom)
+    return levels[tolerance]
+
+@instrument()
+def add_state_boundaries(m, selected_state, zoom=None):
+    """
+    Loads local GeoJSON and highlights the selected state.
+    Standard key used: 'ST_NM'
+    Outlines come from the cached store at the map's zoom; the selected
+    state is drawn as a separate one-feature highlight layer.
+    """
+    zoom = m.options.get('zoom', 5) if zoom is None else zoom
+    geo_data = get_state_boundaries(zoom)
+    if geo_data is None:
+        return
+
     # Key for the local GeoJSON file
-    state_field = 'ST_NM' 
+    state_field = STATE_FIELD
 
     folium.GeoJson(
         geo_data,
         name="State Boundaries",
-        style_function=lambda x: {
-            'fillColor': '#22c55e' if x['properties'].get(state_field) == selected_state else 'transparent',
-            'color': 'blue' if x['properties'].get(state_field) == selected_state else '#808080',
-            'weight': 3 if x['properties'].get(state_field) == selected_state else 0.5,
-            'fillOpacity': 0.2 if x['properties'].get(state_field) == selected_state else 0
-        },
         tooltip=folium.GeoJsonTooltip(
-            fields=[state_field], 
-            aliases=['State:'], 
+            fields=[state_field],
+            aliases=['State:'],
             localize=True
         )
     ).add_to(m)
 
+    selected = [
+        {**feature, 'properties': {**feature['properties'], 'style': SELECTED_BOUNDARY_STYLE}}
+        for feature in geo_data['features']
+        if feature['properties'].get(state_field) == selected_state
+    ]
+    if selected:
+        folium.GeoJson(
+            {'type': 'FeatureCollection', 'features': selected},
+            name="Selected State",
+        ).add_to(m)
+
+# Low -> high volume colour ramp for choropleths (RGB stops)
+CHOROPLETH_RAMP = np.array([[30, 33, 48], [59, 82, 139], [33, 145, 140], [94, 201, 98], [253, 231, 37]])
+
+@instrument()
+def build_choropleth_features(geo_data, totals, name_field=STATE_FIELD, selected=None):
+    """
+    Joins pre-aggregated totals (Series indexed by polygon name) onto the
+    boundary features. Colours are computed here, so the map layer only
+    reads properties.fill_color / line_color / line_width.
+    """
+    names = [str(f['properties'].get(name_field, '')) for f in geo_data['features']]
+    values = totals.reindex(names).fillna(0).to_numpy(dtype=np.float64)
+    top = max(float(values.max()) if len(values) else 0.0, 1.0)
+
+    # Square-root scale keeps smaller regions distinguishable
+    position = np.sqrt(values / top) * (len(CHOROPLETH_RAMP) - 1)
+    colors = np.stack([
+        np.interp(position, np.arange(len(CHOROPLETH_RAMP)), CHOROPLETH_RAMP[:, band]) for band in range(3)
+    ], axis=1).round().astype(int)
+
+    features = []
+    for feature, name, value, color in zip(geo_data['features'], names, values, colors.tolist()):
+        is_selected = name == selected
+        features.append({
+            'type': 'Feature',
+            'geometry': feature['geometry'],
+            'properties': {
+                'region': name,
+                'value': int(value),
+                'fill_color': color + [200 if value > 0 else 60],
+                'line_color': [0, 153, 255] if is_selected else [128, 128, 128],
+                'line_width': 3 if is_selected else 1,
+            },
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+@instrument()
 def add_heatmap(m, data, age_col):
     """
     Creates a density heatmap based on the selected age group.
@@ -158,13 +295,99 @@ def add_heatmap(m, data, age_col):
             gradient={0.4: 'blue', 0.65: 'lime', 1: 'red'}
         ).add_to(m)
 
-def add_signals(m, data, age_column):
+@instrument()
+def add_heatmap_tiles(m, layer, opacity=0.85, base_path=""):
+    """
+    Density overlay from pre-rendered tiles (modules/tiles.py): the browser
+    fetches small PNGs instead of computing the heatmap from every point.
+    Outside the rendered zooms Leaflet rescales the nearest level.
+    base_path: server.baseUrlPath when the app is served under a prefix.
+    """
+    if not layer or not layer.get('tiles'):
+        return
+    folium.TileLayer(
+        tiles=tile_url(layer['key'], base_path),
+        attr='UIDAI enrollment density',
+        name='Density',
+        overlay=True,
+        control=False,
+        opacity=opacity,
+        min_native_zoom=layer['zooms'][0],
+        max_native_zoom=layer['zooms'][-1],
+        max_zoom=18,
+    ).add_to(m)
+
+@instrument()
+def build_signal_features(data, age_column):
+    """
+    Vectorised version of the add_signals marker rules as one GeoJSON
+    FeatureCollection: rows without coordinates/count (or lat == 0) are
+    dropped, radius = max(sqrt(count) / 5, 3), popups keep the district.
+    """
+    lat = pd.to_numeric(data['lat'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    lon = pd.to_numeric(data['lon'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    count = pd.to_numeric(data[age_column], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    valid = ~np.isnan(lat) & ~np.isnan(lon) & ~np.isnan(count) & (lat != 0)
+
+    lat, lon, count = lat[valid], lon[valid], count[valid]
+    radius = np.maximum(np.where(count > 0, np.sqrt(np.clip(count, 0, None)) / 5, 2), 3).round(1)
+    if 'district' in data.columns:
+        district = data['district'].astype(str).to_numpy()[valid]
+    else:
+        district = np.full(len(lat), 'N/A', dtype=object)
+
+    features = [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [x, y]},
+            'properties': {'district': d, 'count': c, 'style': {'radius': r}},
+        }
+        for x, y, d, c, r in zip(
+            lon.round(5).tolist(), lat.round(5).tolist(), district.tolist(),
+            count.astype(np.int64).tolist(), radius.tolist()
+        )
+    ]
+    return {'type': 'FeatureCollection', 'features': features}
+
+@instrument()
+def add_signal_layer(m, data, age_column):
+    """
+    Bulk path for add_signals: a single GeoJson layer of CircleMarkers.
+    Shared styling lives on the marker template; only the radius is per
+    feature, and one popup template serves every point.
+    """
+    if 'lat' not in data.columns or 'lon' not in data.columns:
+        return
+
+    collection = build_signal_features(data, age_column)
+    if not collection['features']:
+        return
+
+    folium.GeoJson(
+        collection,
+        name="Signals",
+        marker=folium.CircleMarker(color='#ef4444', fill=True, fill_opacity=0.6),
+        popup=folium.GeoJsonPopup(
+            fields=['district', 'count'],
+            aliases=['District:', 'Count:'],
+            max_width=200,
+        ),
+    ).add_to(m)
+
+@instrument()
+def add_signals(m, data, age_column, bulk=True):
     """
     Adds individual CircleMarkers with robust coordinate parsing.
+    bulk=True (default) emits one GeoJSON layer via add_signal_layer;
+    bulk=False keeps the original one-marker-per-row loop.
     """
     if 'lat' not in data.columns or 'lon' not in data.columns:
         return 
 
+    if bulk:
+        add_signal_layer(m, data, age_column)
+        return
+
     for _, row in data.iterrows():
         try:
             # Ensure values are floats
@@ -35,7 +35,9 @@ import pandas as pd
 import numpy as np
 from sklearn.linear_model import LinearRegression
 import datetime
+from modules.instrumentation import instrument
 
+@instrument()
 def predict_traffic(df, days_to_predict=7):
     """
     Predicts future daily transaction volume based on past history.
@@ -46,9 +48,9 @@ def predict_traffic(df, days_to_predict=7):
         return pd.DataFrame()
 
     # 1. Prepare Data
-    # Ensure date is datetime type
-    df['date'] = pd.to_datetime(df['date'])
-    daily_counts = df.groupby('date').size().reset_index(name='Counts')
+    # Ensure date is datetime type (a local series: df may be the shared engine frame)
+    dates = pd.to_datetime(df['date'])
+    daily_counts = df.groupby(dates).size().reset_index(name='Counts')
     
     # Create Ordinal Dates for Regression (Math friendly)
     daily_counts['Date_Ordinal'] = daily_counts['date'].map(datetime.datetime.toordinal)
@@ -73,52 +75,78 @@ def predict_traffic(df, days_to_predict=7):
         'Predicted_Traffic': predictions.astype(int)
     })
 
-def predict_saturation_date(df, age_col, target_population, boost_factor=1.0):
+@instrument()
+def fit_saturation_model(df, age_col):
     """
-    Predicts the exact date a district will hit 100% saturation.
-    boost_factor: Multiplier for 'What-If' scenarios (e.g., 1.5x speed).
+    Fits the burn-up regression once. Everything a what-if needs is kept:
+    base velocity, the peak cumulative total, the enrolled total, the last
+    reporting date and the daily trend (with 'cumulative') for the chart.
+    Returns None when there is nothing to fit.
     """
     if df.empty or 'date' not in df.columns:
-        return None, 0
+        return None
 
     # 1. Prepare Time-Series Data
     # Group by date to get daily progress
     daily = df.groupby('date')[age_col].sum().reset_index()
+    if daily.empty:
+        return None
     # Calculate Cumulative Sum (The "Burn-Up" Curve)
     daily['cumulative'] = daily[age_col].cumsum()
     
     # Convert dates to "Day Numbers" starting from 0 for Linear Regression
-    daily['day_num'] = (daily['date'] - daily['date'].min()).dt.days
+    day_num = (daily['date'] - daily['date'].min()).dt.days
     
     # 2. Train Model
-    X = daily[['day_num']]
-    y = daily['cumulative']
-    
     model = LinearRegression()
-    model.fit(X, y)
+    model.fit(day_num.to_frame('day_num'), daily['cumulative'])
     
+    return {
+        'velocity': float(model.coef_[0]),  # Enrollments per day
+        'current_total': daily['cumulative'].max(),
+        'enrolled': daily[age_col].sum(),
+        'last_date': daily['date'].max(),
+        'trend': daily,
+    }
+
+@instrument()
+def evaluate_saturation(model, target_population, boost_factor=1.0):
+    """
+    O(1) what-if on a fitted model: the boost only scales the slope.
+    Same return values as predict_saturation_date.
+    """
+    if model is None:
+        return None, 0
+
     # 3. Calculate Velocity (Slope of the line)
-    base_velocity = model.coef_[0] # Enrollments per day
-    adjusted_velocity = base_velocity * boost_factor
+    adjusted_velocity = model['velocity'] * boost_factor
     
     if adjusted_velocity <= 0:
         return "Stalled", 0
     
     # 4. Predict Future Intersection
-    current_total = daily['cumulative'].max()
-    remaining = target_population - current_total
+    remaining = target_population - model['current_total']
     
     if remaining <= 0:
         return "Already Saturated", adjusted_velocity
         
     days_needed = remaining / adjusted_velocity
-    last_date = daily['date'].max()
     
     # Add the predicted days to the last known date
-    completion_date = last_date + datetime.timedelta(days=int(days_needed))
+    completion_date = model['last_date'] + datetime.timedelta(days=int(days_needed))
     
     return completion_date.date(), adjusted_velocity
 
+@instrument()
+def predict_saturation_date(df, age_col, target_population, boost_factor=1.0):
+    """
+    Predicts the exact date a district will hit 100% saturation.
+    boost_factor: Multiplier for 'What-If' scenarios (e.g., 1.5x speed).
+    For repeated what-ifs, fit once with fit_saturation_model instead.
+    """
+    return evaluate_saturation(fit_saturation_model(df, age_col), target_population, boost_factor)
+
+@instrument()
 def get_burn_trend(df, age_col):
     """
     Returns the daily trend for visualization (Burn-Up Chart).
@@ -129,3 +157,97 @@ def get_burn_trend(df, age_col):
         
     trend = df.groupby('date')[age_col].sum().reset_index()
     return trend
+
+@instrument()
+def forecast_all_districts(df, age_cols=('age_0_5', 'age_5_17', 'age_18_greater'),
+                           target_ratio=1.3, targets=None, boost_factor=1.0):
+    """
+    BATCH FORECAST: predict_saturation_date for every district and age group
+    in one pass. Daily totals are pivoted to a district x day matrix and the
+    OLS slope of each cumulative curve is solved in closed form over the days
+    that district actually reported (same fit as the per-district model).
+    targets: optional {(district, age_col): population}; otherwise
+    target_ratio x enrolled total (the page default).
+    Returns DataFrame: district, age_group, current_total, velocity, target,
+    days_needed, last_date, completion_date, status.
+    """
+    columns = ['district', 'age_group', 'current_total', 'velocity', 'target',
+               'days_needed', 'last_date', 'completion_date', 'status']
+    age_cols = [c for c in age_cols if c in df.columns]
+    if df.empty or 'date' not in df.columns or 'district' not in df.columns or not age_cols:
+        return pd.DataFrame(columns=columns)
+
+    dates = pd.to_datetime(df['date'], errors='coerce')
+    valid = (dates.notna() & df['district'].notna()).to_numpy()
+    district_codes, districts = pd.factorize(df['district'][valid], sort=True)
+    districts = np.asarray(districts, dtype=object)
+    day_values = dates[valid].dt.normalize().to_numpy()
+    day_codes, days = pd.factorize(day_values, sort=True)
+    n_districts, n_days = len(districts), len(days)
+    if n_districts == 0:
+        return pd.DataFrame(columns=columns)
+
+    # Flat (district, day) cell ids -> dense matrices via bincount
+    cell = district_codes.astype(np.int64) * n_days + day_codes
+    observed = (np.bincount(cell, minlength=n_districts * n_days) > 0).reshape(n_districts, n_days)
+    n = observed.sum(axis=1)
+
+    # Day numbers on a shared axis (slopes do not depend on each district's origin)
+    x = ((days - days[0]) / np.timedelta64(1, 'D')).astype(np.float64)
+    xm = np.where(observed, x, 0.0)
+    mean_x = xm.sum(axis=1) / n
+    dx = np.where(observed, x - mean_x[:, None], 0.0)
+    sxx = (dx ** 2).sum(axis=1)
+
+    last_index = n_days - 1 - np.argmax(observed[:, ::-1], axis=1)
+    last_date = days[last_index]
+
+    frames = []
+    for age_col in age_cols:
+        weights = pd.to_numeric(df[age_col][valid], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+        daily = np.bincount(cell, weights=weights, minlength=n_districts * n_days).reshape(n_districts, n_days)
+        cumulative = np.cumsum(daily, axis=1)
+
+        mean_y = np.where(observed, cumulative, 0.0).sum(axis=1) / n
+        sxy = (dx * np.where(observed, cumulative - mean_y[:, None], 0.0)).sum(axis=1)
+        # One reporting day (or a flat axis) has no slope: same as a stalled fit
+        base_velocity = np.divide(sxy, sxx, out=np.zeros(n_districts), where=sxx > 0)
+        velocity = base_velocity * boost_factor
+
+        # Same definitions as the single-district path: progress is the peak of
+        # the burn-up curve, the default target scales the enrolled total
+        current_total = np.where(observed, cumulative, -np.inf).max(axis=1)
+        default_target = cumulative[:, -1] * target_ratio
+        if targets is None:
+            target = default_target
+        else:
+            target = np.array([targets.get((d, age_col), t) for d, t in zip(districts, default_target)],
+                              dtype=np.float64)
+        remaining = target - current_total
+
+        stalled = velocity <= 0
+        saturated = ~stalled & (remaining <= 0)
+        on_track = ~stalled & ~saturated
+        days_needed = np.full(n_districts, np.inf)
+        days_needed[saturated] = 0.0
+        days_needed[on_track] = remaining[on_track] / velocity[on_track]
+
+        # Stalled districts, and dates past the datetime64 range, stay NaT
+        in_range = on_track & (days_needed < 100_000)
+        offset = np.where(in_range, np.floor(np.where(in_range, days_needed, 0)), 0).astype('int64')
+        completion = pd.DatetimeIndex(last_date) + pd.to_timedelta(offset, unit='D')
+        completion = completion.where(in_range | saturated)
+
+        frames.append(pd.DataFrame({
+            'district': districts,
+            'age_group': age_col,
+            'current_total': current_total.astype(np.int64),
+            'velocity': velocity,
+            'target': target,
+            'days_needed': days_needed,
+            'last_date': last_date,
+            'completion_date': completion,
+            'status': np.select([stalled, saturated], ['Stalled', 'Already Saturated'], 'On Track'),
+        }))
+
+    return pd.concat(frames, ignore_index=True)[columns]
@@ -0,0 +1,32 @@
+import streamlit as st
+from modules.data_processor import aggregate_for
+from modules.dataset import dataset_version
+from modules.query_backend import query_backend
+from modules.prediction import forecast_all_districts, fit_saturation_model
+from modules.instrumentation import instrument
+
+# Cached accessors of the forecasting page (pages/2_predictions.py)
+
+def get_district_forecasts():
+    """Batch saturation forecasts for every district and age group, once per dataset version."""
+    return _district_forecasts_for(dataset_version())
+
+@st.cache_data(show_spinner="Forecasting all districts...", max_entries=2)
+@instrument("district forecasts (build)")
+def _district_forecasts_for(version):
+    # Daily district totals give the same fit as the raw rows
+    return forecast_all_districts(aggregate_for(version, ('district', 'date'), query_backend()))
+
+def get_saturation_model(district, age_col):
+    """
+    Fitted burn-up model for one district and age group, memoised per
+    dataset version; evaluate what-ifs with prediction.evaluate_saturation.
+    The model is shared by every session, not copied: treat it as read-only.
+    """
+    return _saturation_model_for(dataset_version(), district, age_col)
+
+@st.cache_resource(show_spinner=False, max_entries=512)
+@instrument("saturation model (build)")
+def _saturation_model_for(version, district, age_col):
+    daily = aggregate_for(version, ('district', 'date'), query_backend())
+    return fit_saturation_model(daily[daily['district'] == district], age_col)
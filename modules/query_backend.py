@@ -0,0 +1,68 @@
+import os
+
+from modules.aggregates import AGE_COLUMNS
+from modules.dataset import compact_frame
+
+BACKEND_ENV = 'UIDAI_QUERY_BACKEND'  # 'pandas' (default) or 'duckdb'
+BACKENDS = ('pandas', 'duckdb')
+GROUP_KEYS = ('state', 'district', 'pincode', 'date')
+
+
+def _duckdb():
+    """DuckDB is optional: imported on first use, None when not installed."""
+    try:
+        import duckdb
+    except ImportError:
+        return None
+    return duckdb
+
+
+def duckdb_available():
+    return _duckdb() is not None
+
+
+def query_backend():
+    """
+    Backend for the dashboard aggregations, from $UIDAI_QUERY_BACKEND.
+    Falls back to pandas for unknown values or when DuckDB is missing.
+    """
+    backend = os.environ.get(BACKEND_ENV, 'pandas').strip().lower()
+    if backend == 'duckdb' and duckdb_available():
+        return 'duckdb'
+    return 'pandas'
+
+
+def _parquet_source(path):
+    """read_parquet() call for the partitioned dataset; None for anything else."""
+    if not path or not os.path.isdir(path):
+        return None  # Legacy single-file Parquet may hold text dates: the pandas path cleans those
+    pattern = os.path.join(path, '**', '*.parquet').replace("'", "''")
+    return f"read_parquet('{pattern}', hive_partitioning = true)"
+
+
+def duckdb_group_totals(path, keys, age_cols=AGE_COLUMNS):
+    """
+    SQL version of aggregates.group_totals, run by embedded DuckDB straight
+    over the Parquet dataset (multi-threaded, spills to disk when needed;
+    only the key and count columns are read). Result has the same columns,
+    dtypes and rows as the pandas path. Returns None when the dataset
+    is not the partitioned layout from 'convert_data.py --stream'.
+    """
+    duckdb = _duckdb()
+    source = _parquet_source(path)
+    if duckdb is None or source is None:
+        return None
+
+    keys = [k for k in keys if k in GROUP_KEYS]
+    key_list = ', '.join(keys)
+    sums = ', '.join(f"COALESCE(SUM({col}), 0)::BIGINT AS {col}" for col in age_cols)
+    sql = f"SELECT {key_list}, {sums} FROM {source} GROUP BY {key_list}"
+
+    with duckdb.connect() as con:
+        cube = con.execute(sql).df()
+
+    # Same key types as the engine frame, sorted by key with nulls last like the groupby
+    cube = compact_frame(cube).sort_values(keys, na_position='last', kind='stable', ignore_index=True)
+    for col in age_cols:
+        cube[col] = cube[col].astype('int64')
+    return cube
@@ -0,0 +1,158 @@
+import os
+import re
+import json
+import time
+import datetime
+import warnings
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+import pyarrow as pa
+
+from modules.dataset import scan_dataset, dataset_extent, compact_frame, find_dataset_path
+from modules.aggregates import AGE_COLUMNS, build_rollup_cube, group_totals, cube_totals, cube_top_districts
+from modules.intelligence import detect_anomalies, z_score_audit, get_rolling_anomalies
+from modules.prediction import forecast_all_districts
+
+REPORT_COLUMNS = ['date', 'state', 'district', 'pincode'] + AGE_COLUMNS
+REPORT_FORMATS = ('parquet', 'csv', 'json')
+REPORT_TABLES = ('top_districts', 'anomalies', 'z_outliers', 'rolling_spikes', 'forecasts')
+
+
+def state_slug(state):
+    """Folder name for a state: 'Jammu & Kashmir' -> 'jammu_kashmir'."""
+    return re.sub(r'[^a-z0-9]+', '_', str(state).lower()).strip('_') or 'unknown'
+
+
+def _per_age_group(fn, age_cols):
+    """Runs an engine once per age group; stacks the results with the count column renamed 'count'."""
+    frames = []
+    for col in age_cols:
+        result = fn(col)
+        if result is None or result.empty:
+            continue
+        result = result.rename(columns={col: 'count'}).drop(columns=[c for c in age_cols if c != col], errors='ignore')
+        result.insert(0, 'age_group', col)
+        frames.append(result)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['age_group', 'count'])
+
+
+def write_table(df, base_path, formats):
+    """Writes one table as base_path.<ext> for every requested format."""
+    df = df.reset_index(drop=True)
+    if 'pincode' in df.columns:
+        df['pincode'] = df['pincode'].astype('Int64')  # UInt32 is not valid in every CSV/JSON consumer
+    for fmt in formats:
+        if fmt == 'parquet':
+            df.to_parquet(base_path + '.parquet', index=False)
+        elif fmt == 'csv':
+            df.to_csv(base_path + '.csv', index=False)
+        elif fmt == 'json':
+            df.to_json(base_path + '.json', orient='records', date_format='iso', indent=2)
+
+
+def build_state_report(state, out_dir, path=None, formats=REPORT_FORMATS, age_cols=AGE_COLUMNS, top_n=10):
+    """
+    STATE PACK: the numbers the dashboard pages show for one state, written
+    to out_dir/<state_slug>/ without Streamlit. Loads only that state's
+    partition, so each call is independent (one per worker process).
+    Returns a summary dict (status, rows, totals, table sizes, seconds).
+    """
+    start = time.perf_counter()
+    summary = {'state': state, 'slug': state_slug(state), 'status': 'ok', 'rows': 0}
+    try:
+        # 1. Load the state's rows (partition pruning) in the engine schema
+        df = compact_frame(scan_dataset(path, columns=REPORT_COLUMNS, states=[state]))
+        summary['rows'] = len(df)
+        if df.empty:
+            summary.update({'status': 'empty', 'seconds': round(time.perf_counter() - start, 3)})
+            return summary
+        age_cols = [c for c in age_cols if c in df.columns]
+
+        # 2. Headline metrics and rankings (same rollup cube as the dashboard)
+        cube = build_rollup_cube(df)
+        summary.update({
+            'totals': cube_totals(cube),
+            'districts': int(df['district'].nunique()),
+            'pincodes': int(df['pincode'].nunique()),
+            'first_date': str(df['date'].min().date()),
+            'last_date': str(df['date'].max().date()),
+        })
+        top = _per_age_group(lambda col: cube_top_districts(cube, col, n=top_n), age_cols)
+        top.insert(1, 'rank', top.groupby('age_group').cumcount() + 1)
+
+        # 3. Audit layers (the Intelligence page): pincode outliers and spikes
+        pincodes = group_totals(df, ('pincode',), age_cols)
+        anomalies = _per_age_group(lambda col: detect_anomalies(pincodes, col), age_cols)
+        z_outliers = _per_age_group(lambda col: z_score_audit(pincodes, col), age_cols)
+        spikes = _per_age_group(lambda col: get_rolling_anomalies(df, col), age_cols)
+
+        # 4. Saturation forecasts (the Predictions page) for every district
+        forecasts = forecast_all_districts(group_totals(df, ('district', 'date'), age_cols), age_cols)
+
+        # 5. Write the pack
+        state_dir = os.path.join(out_dir, summary['slug'])
+        os.makedirs(state_dir, exist_ok=True)
+        tables = dict(zip(REPORT_TABLES, (top, anomalies, z_outliers, spikes, forecasts)))
+        for name, table in tables.items():
+            write_table(table, os.path.join(state_dir, name), formats)
+        summary['tables'] = {name: len(table) for name, table in tables.items()}
+        with open(os.path.join(state_dir, 'metrics.json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    except Exception as e:  # one bad state must not sink the whole night's batch
+        summary.update({'status': 'error', 'error': f"{type(e).__name__}: {e}"})
+    summary['seconds'] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+def _init_worker():
+    # One state per core: keep Arrow's scan threads from oversubscribing the box
+    pa.set_cpu_count(1)
+    pa.set_io_thread_count(1)
+    warnings.filterwarnings('ignore', category=UserWarning)  # sklearn feature-name notices
+
+
+def run_batch(out_dir, path=None, states=None, formats=REPORT_FORMATS, workers=None, **options):
+    """
+    BATCH REPORTS: build_state_report for every state (default: all states
+    in the dataset), fanned out across a process pool. Yields each state's
+    summary as it finishes.
+    """
+    path = path or find_dataset_path()
+    if states is None:
+        states = dataset_extent(path)[0]
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    os.makedirs(out_dir, exist_ok=True)
+
+    if workers <= 1:
+        for state in states:
+            yield build_state_report(state, out_dir, path, formats, **options)
+        return
+
+    # Spawned, not forked: the parent has already started Arrow's thread pool
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(workers, len(states) or 1), mp_context=context,
+                             initializer=_init_worker) as pool:
+        futures = [pool.submit(build_state_report, state, out_dir, path, formats, **options) for state in states]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def write_batch_summary(out_dir, summaries, seconds, workers):
+    """Run-level summary.json: per-state results plus throughput."""
+    ok = [s for s in summaries if s['status'] == 'ok']
+    report = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'workers': workers,
+        'seconds': round(seconds, 3),
+        'states': len(summaries),
+        'states_ok': len(ok),
+        'rows': sum(s['rows'] for s in summaries),
+        'states_per_second': round(len(summaries) / seconds, 3) if seconds else None,
+        'results': sorted(summaries, key=lambda s: s['state']),
+    }
+    path = os.path.join(out_dir, 'summary.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return report
@@ -0,0 +1,145 @@
+import numpy as np
+
+NODE_SIZE = 16
+
+
+def _feature_polygons(geometry):
+    """Splits a GeoJSON geometry into polygons, each a list of (n, 2) rings."""
+    if not geometry:
+        return []
+    if geometry['type'] == 'Polygon':
+        parts = [geometry['coordinates']]
+    elif geometry['type'] == 'MultiPolygon':
+        parts = geometry['coordinates']
+    else:
+        return []
+    return [[np.asarray(ring, dtype=np.float64)[:, :2] for ring in part if len(ring) >= 3] for part in parts]
+
+
+def _str_pack(boxes, node_size):
+    """
+    Sort-Tile-Recursive grouping: boxes are sorted into vertical slices by
+    x centre, each slice by y centre, then cut into runs of node_size.
+    Returns a list of index arrays, one per parent node.
+    """
+    n = len(boxes)
+    node_count = int(np.ceil(n / node_size))
+    slice_count = int(np.ceil(np.sqrt(node_count)))
+    per_slice = slice_count * node_size
+
+    cx = (boxes[:, 0] + boxes[:, 2]) / 2
+    cy = (boxes[:, 1] + boxes[:, 3]) / 2
+    by_x = np.argsort(cx, kind='stable')
+
+    groups = []
+    for s in range(0, n, per_slice):
+        members = by_x[s:s + per_slice]
+        members = members[np.argsort(cy[members], kind='stable')]
+        groups.extend(members[i:i + node_size] for i in range(0, len(members), node_size))
+    return groups
+
+
+def build_polygon_index(geo_data, name_field='ST_NM', node_size=NODE_SIZE):
+    """
+    SPATIAL INDEX: STR-tree over polygon bounding boxes for any GeoJSON
+    FeatureCollection. Multipolygons are indexed part by part; each part
+    remembers the feature it belongs to.
+    Returns dict: names (per feature), polygons, feature_of, levels (root first).
+    """
+    features = geo_data.get('features', [])
+    names = [str((f.get('properties') or {}).get(name_field, '')) for f in features]
+
+    polygons, feature_of = [], []
+    for fid, feature in enumerate(features):
+        for rings in _feature_polygons(feature.get('geometry')):
+            if rings:
+                polygons.append(rings)
+                feature_of.append(fid)
+
+    if not polygons:
+        return {'names': names, 'polygons': [], 'feature_of': np.array([], dtype=np.int64), 'levels': []}
+
+    boxes = np.array([
+        [rings[0][:, 0].min(), rings[0][:, 1].min(), rings[0][:, 0].max(), rings[0][:, 1].max()]
+        for rings in polygons
+    ])
+
+    # Bottom-up STR packing; children[node] indexes the level below that node
+    levels = [{'boxes': boxes, 'children': None}]
+    while len(boxes) > 1:
+        groups = _str_pack(boxes, node_size)
+        boxes = np.array([
+            [boxes[g, 0].min(), boxes[g, 1].min(), boxes[g, 2].max(), boxes[g, 3].max()] for g in groups
+        ])
+        levels.append({'boxes': boxes, 'children': groups})
+    if levels[-1]['children'] is None:
+        # A single polygon still gets a root node above it
+        levels.append({'boxes': boxes, 'children': [np.array([0])]})
+
+    return {
+        'names': names,
+        'polygons': polygons,
+        'feature_of': np.asarray(feature_of, dtype=np.int64),
+        'levels': levels[::-1],
+    }
+
+
+def points_in_rings(x, y, rings, max_cells=1 << 20):
+    """
+    Even-odd ray casting against every ring of a polygon at once, so holes
+    cancel out. Vectorised over points x edges in bounded-size chunks.
+    """
+    inside = np.zeros(len(x), dtype=bool)
+    for ring in rings:
+        if not np.array_equal(ring[0], ring[-1]):
+            ring = np.vstack([ring, ring[:1]])
+        x1, y1 = ring[:-1, 0], ring[:-1, 1]
+        x2, y2 = ring[1:, 0], ring[1:, 1]
+        step = max(1, max_cells // len(x1))
+        for s in range(0, len(x), step):
+            px = x[s:s + step, None]
+            py = y[s:s + step, None]
+            spans = (y1 > py) != (y2 > py)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cross_x = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+            crossings = np.count_nonzero(spans & (px < cross_x), axis=1)
+            inside[s:s + step] ^= (crossings % 2).astype(bool)
+    return inside
+
+
+def assign_points(index, lon, lat):
+    """
+    Feature id containing each point (-1 = outside every polygon).
+    Points descend the tree in bulk: each node passes on only the candidates
+    inside its bounding box, and exact ray casting runs on leaf candidates.
+    """
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    result = np.full(len(lon), -1, dtype=np.int64)
+    if not index['levels'] or len(lon) == 0:
+        return result
+
+    valid = np.flatnonzero(np.isfinite(lon) & np.isfinite(lat))
+    frontier = [(0, valid)]  # (node id at the current level, candidate point ids)
+
+    levels = index['levels']
+    for parent, level in zip(levels[:-1], levels[1:]):
+        boxes = level['boxes']
+        next_frontier = []
+        for node, candidates in frontier:
+            px, py = lon[candidates], lat[candidates]
+            for child in parent['children'][node]:
+                x0, y0, x1, y1 = boxes[child]
+                hit = candidates[(px >= x0) & (px <= x1) & (py >= y0) & (py <= y1)]
+                if len(hit):
+                    next_frontier.append((child, hit))
+        frontier = next_frontier
+
+    # Bottom level: nodes are polygons; the first containing polygon wins
+    for poly, candidates in frontier:
+        candidates = candidates[result[candidates] < 0]
+        if len(candidates) == 0:
+            continue
+        inside = points_in_rings(lon[candidates], lat[candidates], index['polygons'][poly])
+        result[candidates[inside]] = index['feature_of'][poly]
+    return result
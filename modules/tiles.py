@@ -0,0 +1,263 @@
+import os
+import json
+import time
+import shutil
+import struct
+import zlib
+import threading
+
+import numpy as np
+import pandas as pd
+
+TILE_SIZE = 256
+# Streamlit serves <app folder>/static/ at <server root>/app/static/ (enableStaticServing in .streamlit/config.toml)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TILE_ROOT = os.path.join(PROJECT_ROOT, "static", "tiles")
+TILE_URL_ROOT = "app/static/tiles"
+LAYER_FILE = "layer.json"
+TILE_CACHE_MB_ENV = 'UIDAI_TILE_CACHE_MB'  # disk budget for all cached pyramids
+DEFAULT_CACHE_MB = 256
+EVICT_GRACE_SECONDS = 900  # layers shown this recently stay (their map may still be fetching tiles)
+# Same look as map_utils.add_heatmap (Leaflet.heat): radius 20px, blur 15px
+HEAT_GRADIENT = [(0.0, (0, 0, 255)), (0.4, (0, 0, 255)), (0.65, (0, 255, 0)), (1.0, (255, 0, 0))]
+HEAT_SIGMA_PX = 10.0
+MIN_OPACITY = 0.3
+HEAT_LEVELS = 64  # colour steps; fewer distinct pixels keep the PNGs small
+
+
+def lonlat_to_pixels(lat, lon, zoom):
+    """Web Mercator global pixel coordinates at a zoom (x right, y down)."""
+    scale = TILE_SIZE * 2.0 ** zoom
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -85.0511, 85.0511)
+    x = (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0 * scale
+    sin_lat = np.sin(np.radians(lat))
+    y = (0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * np.pi)) * scale
+    return x, y
+
+
+def encode_png(pixels, palette=None):
+    """
+    PNG bytes with zlib and struct only (no filtering). pixels: (h, w, 4)
+    uint8 RGBA, or (h, w) uint8 palette indices with palette an (n, 4) RGBA
+    table; a palette image is a quarter of the data to compress.
+    """
+    height, width = pixels.shape[:2]
+    row = pixels.reshape(height, -1)
+    raw = np.zeros((height, row.shape[1] + 1), dtype=np.uint8)  # filter byte 0 in front of every row
+    raw[:, 1:] = row
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    color_type = 6 if palette is None else 3
+    png = b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0))
+    if palette is not None:
+        palette = np.asarray(palette, dtype=np.uint8)
+        png += chunk(b'PLTE', palette[:, :3].tobytes()) + chunk(b'tRNS', palette[:, 3].tobytes())
+    return png + chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)) + chunk(b'IEND', b'')
+
+
+def heat_colors(level):
+    """Intensity in [0, 1] -> RGBA on the heatmap gradient; zero stays transparent."""
+    stops = np.array([s for s, _ in HEAT_GRADIENT])
+    colors = np.array([c for _, c in HEAT_GRADIENT], dtype=np.float64)
+    rgba = np.empty(np.shape(level) + (4,), dtype=np.uint8)
+    for channel in range(3):
+        rgba[..., channel] = np.interp(level, stops, colors[:, channel]).round()
+    alpha = np.where(np.asarray(level) > 0.02, MIN_OPACITY + (1 - MIN_OPACITY) * np.asarray(level), 0.0)
+    rgba[..., 3] = (255 * alpha).round()
+    return rgba
+
+
+# One palette entry per colour step (tiles are written as indexed PNGs)
+HEAT_PALETTE = heat_colors(np.arange(HEAT_LEVELS + 1) / HEAT_LEVELS)
+
+
+def _blur_matrix(sigma, pad):
+    """Gaussian weights from the padded splat grid onto the tile's pixels (one axis)."""
+    out = np.arange(TILE_SIZE)[:, None] + pad
+    src = np.arange(TILE_SIZE + 2 * pad)[None, :]
+    return np.exp(-0.5 * ((src - out) / sigma) ** 2)
+
+
+def heatmap_points(df, age_col):
+    """Geocoded rows of a selection merged per location: (lat, lon, weight) arrays."""
+    lat = pd.to_numeric(df['lat'], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    lon = pd.to_numeric(df['lon'], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    weight = pd.to_numeric(df[age_col], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+    valid = np.isfinite(lat) & np.isfinite(lon) & ~((lat == 0) & (lon == 0)) & (weight > 0)
+    if not valid.any():
+        return np.empty(0), np.empty(0), np.empty(0)
+    # Every row of a pincode shares its coordinates: one point per location
+    coords, inverse = np.unique(np.column_stack([lat[valid], lon[valid]]), axis=0, return_inverse=True)
+    return coords[:, 0], coords[:, 1], np.bincount(inverse.ravel(), weights=weight[valid])
+
+
+def render_zoom(lat, lon, weight, zoom, out_dir, sigma=HEAT_SIGMA_PX):
+    """
+    TILE ENGINE: kernel density for one zoom level. Point weights are
+    splatted onto each tile's pixel grid (plus a 3-sigma margin) with
+    bincount and blurred by two small matrix products, so cost follows the
+    number of occupied tiles, not the number of rows. Intensity is
+    log-scaled against the heaviest pixel of the zoom, which keeps
+    neighbouring tiles seamless. Only tiles with visible heat are written.
+    Returns (tiles written, bytes written).
+    """
+    pad = int(np.ceil(3 * sigma))
+    px, py = lonlat_to_pixels(lat, lon, zoom)
+    ix, iy = np.floor(px).astype(np.int64), np.floor(py).astype(np.int64)
+
+    # Peak = the heaviest single pixel (its kernel centre weighs 1)
+    side = TILE_SIZE * 2 ** zoom
+    _, pixel_of = np.unique(iy * side + ix, return_inverse=True)
+    peak = np.log1p(np.bincount(pixel_of.ravel(), weights=weight).max())
+
+    # (tile, point) pairs for every tile a point's kernel reaches (up to 4)
+    pairs_tile, pairs_point = [], []
+    n_tiles = 2 ** zoom
+    for dx in (-pad, pad):
+        for dy in (-pad, pad):
+            tx = np.clip((ix + dx) // TILE_SIZE, 0, n_tiles - 1)
+            ty = np.clip((iy + dy) // TILE_SIZE, 0, n_tiles - 1)
+            pairs_tile.append(tx * n_tiles + ty)
+            pairs_point.append(np.arange(len(ix)))
+    pairs = np.unique(np.column_stack([np.concatenate(pairs_tile), np.concatenate(pairs_point)]), axis=0)
+    tiles, starts = np.unique(pairs[:, 0], return_index=True)
+    ends = np.append(starts[1:], len(pairs))
+
+    blur = _blur_matrix(sigma, pad)
+    grid_side = TILE_SIZE + 2 * pad
+    written, size = 0, 0
+    for tile, start, end in zip(tiles, starts, ends):
+        members = pairs[start:end, 1]
+        tx, ty = divmod(int(tile), n_tiles)
+        local_x = ix[members] - tx * TILE_SIZE + pad
+        local_y = iy[members] - ty * TILE_SIZE + pad
+        inside = (local_x >= 0) & (local_x < grid_side) & (local_y >= 0) & (local_y < grid_side)
+        grid = np.bincount(local_y[inside] * grid_side + local_x[inside], weights=weight[members][inside],
+                           minlength=grid_side * grid_side).reshape(grid_side, grid_side)
+        density = blur @ grid @ blur.T
+        level = np.clip(np.log1p(density) / peak, 0.0, 1.0) if peak > 0 else np.zeros_like(density)
+        steps = np.rint(level * HEAT_LEVELS).astype(np.uint8)
+        if not HEAT_PALETTE[steps.max(), 3]:
+            continue  # nothing visible
+
+        png = encode_png(steps, HEAT_PALETTE)
+        tile_dir = os.path.join(out_dir, str(zoom), str(tx))
+        os.makedirs(tile_dir, exist_ok=True)
+        with open(os.path.join(tile_dir, f"{ty}.png"), 'wb') as f:
+            f.write(png)
+        written += 1
+        size += len(png)
+    return written, size
+
+
+def pyramid_zooms(view_zoom, below=1, above=2):
+    """Zoom levels to pre-render around the fitted view; Leaflet rescales outside them."""
+    base = int(np.floor(view_zoom))
+    return list(range(max(base - below, 3), min(base + above, 14) + 1))
+
+
+def load_layer(key, root=TILE_ROOT):
+    """
+    Manifest of a finished pyramid (touched, so eviction sees it as recent);
+    None if absent, including when eviction removes it mid-read.
+    """
+    path = os.path.join(root, key, LAYER_FILE)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            layer = json.load(f)
+        os.utime(path)
+    except (OSError, ValueError):
+        return None
+    return layer
+
+
+def tile_url(key, base_path=""):
+    """
+    Leaflet URL template of a pyramid, absolute from the server root: the map
+    runs inside a component iframe (/component/...), where a relative URL
+    would miss app/static. base_path: Streamlit's server.baseUrlPath.
+    """
+    base = "/".join(part for part in str(base_path or "").split("/") if part)
+    return f"/{base + '/' if base else ''}{TILE_URL_ROOT}/{key}/{{z}}/{{x}}/{{y}}.png"
+
+
+def build_tile_layer(key, lat, lon, weight, zooms, view=None, root=TILE_ROOT, max_mb=None):
+    """
+    Renders a heatmap pyramid into root/<key>/{z}/{x}/{y}.png (written to
+    a temp folder, then moved into place so a half-built layer is never
+    served) and trims the cache to its size budget.
+    Returns the layer manifest: key, zooms, view, bounds, tiles, bytes
+    (the URL depends on the server, see tile_url).
+    """
+    layer = load_layer(key, root)
+    if layer is not None:
+        return layer
+
+    tmp_dir = os.path.join(root, f".{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    tiles, size = 0, 0
+    if len(lat):
+        for zoom in zooms:
+            written, bytes_written = render_zoom(lat, lon, weight, zoom, tmp_dir)
+            tiles, size = tiles + written, size + bytes_written
+
+    layer = {
+        'key': key,
+        'zooms': list(zooms),
+        'view': view,
+        'bounds': [[float(lat.min()), float(lon.min())], [float(lat.max()), float(lon.max())]] if len(lat) else None,
+        'points': int(len(lat)),
+        'tiles': tiles,
+        'bytes': size,
+        'created': time.time(),
+    }
+    with open(os.path.join(tmp_dir, LAYER_FILE), 'w', encoding='utf-8') as f:
+        json.dump(layer, f)
+    try:
+        os.replace(tmp_dir, os.path.join(root, key))
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)  # another session finished the same layer first
+
+    evict_tiles(root, max_mb, keep=key)
+    return layer
+
+
+def evict_tiles(root=TILE_ROOT, max_mb=None, keep=None, grace=EVICT_GRACE_SECONDS):
+    """
+    Size-bounded cache: drops the least recently used pyramids (whole
+    layers, by manifest mtime) until the total fits max_mb
+    (default $UIDAI_TILE_CACHE_MB or DEFAULT_CACHE_MB). Layers loaded
+    within the last `grace` seconds are never dropped, so a map another
+    session is showing keeps its tiles; the cache may overshoot meanwhile.
+    Returns removed keys.
+    """
+    if max_mb is None:
+        max_mb = float(os.environ.get(TILE_CACHE_MB_ENV, DEFAULT_CACHE_MB))
+    if not os.path.isdir(root):
+        return []
+
+    layers = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name, LAYER_FILE)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                size = json.load(f)['bytes'] + os.path.getsize(path)  # tiles + manifest
+            layers.append((os.path.getmtime(path), name, size))
+        except (OSError, ValueError, KeyError):
+            continue
+
+    total = sum(size for _, _, size in layers)
+    removed = []
+    recent = time.time() - grace
+    for touched, name, size in sorted(layers):
+        if total <= max_mb * 1e6 or touched >= recent:
+            break  # oldest first: everything after this was used within the grace window
+        if name == keep:
+            continue
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        total -= size
+        removed.append(name)
+    return removed
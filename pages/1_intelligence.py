@@ -1,19 +1,26 @@
 
 import streamlit as st
 import plotly.express as px
-from modules.data_processor import get_engine_data
+from modules.data_processor import get_aggregate
+from modules.intelligence_cache import get_early_warning_alerts, get_anomaly_scores, get_signal_decomposition
 # Added new function imports here
 from modules.intelligence import (
     detect_anomalies, 
     z_score_audit, 
-    get_rolling_anomalies, 
-    decompose_signals
+    decompose_signals,
+    surge_table
 )
+from modules.audit import run_engines
+from modules.instrumentation import start_run, finish_run, stage_report
 
 st.set_page_config(layout="wide")
 st.title("🕵️ Operational Intelligence & Audit")
+start_run('intelligence')
 
-df = get_engine_data()
+# Pincode and daily totals from the query backend (pandas groupby or DuckDB SQL); the
+# engines sum per pincode / per day, so totals give the same results as raw rows
+pincode_totals = get_aggregate(('pincode',))
+daily_totals = get_aggregate(('date',))
 
 # 1. Sidebar Controls
 st.sidebar.header("Audit Configuration")
@@ -21,25 +28,12 @@ age_options = {"Infants (0-5)": "age_0_5", "Youth (5-17)": "age_5_17", "Adults (
 target_label = st.sidebar.selectbox("Audit Demographic:", list(age_options.keys()), key="intel_age")
 age_col = age_options[target_label]
 sensitivity = st.sidebar.slider("AI Sensitivity (Contamination):", 0.01, 0.10, 0.05)
+surge_level = st.sidebar.radio("Surge Radar Level:", ["District", "Pincode"], horizontal=True, key="intel_surge_level")
 
-# 2. Run Engines (The 4-Layer Audit)
-anomalies = detect_anomalies(df, age_col, contamination=sensitivity)
-z_outliers = z_score_audit(df, age_col)
-rolling_spikes = get_rolling_anomalies(df, age_col)
-stl_result = decompose_signals(df, age_col)
-
+# 2. Page Layout: every panel gets a placeholder up front, filled as its engines finish
 # 3. EXECUTIVE SUMMARY
 st.subheader(" Critical Operational Alerts")
-top_3 = anomalies.head(3)
-if not top_3.empty:
-    cols = st.columns(3)
-    for i, (idx, row) in enumerate(top_3.iterrows()):
-        with cols[i]:
-            st.error(f"**Pincode {int(row['pincode'])}**")
-            st.metric("Total Volume", f"{int(row[age_col]):,}")
-            st.caption("AI Priority: High Risk (Isolated Pattern)")
-else:
-    st.success("✅ No critical anomalies detected.")
+summary_slot = st.empty()
 
 st.divider()
 
@@ -48,48 +42,138 @@ col_left, col_right = st.columns([2, 1])
 
 with col_left:
     st.subheader(" Risk Intensity Matrix")
-    plot_df = anomalies.merge(z_outliers[['pincode', 'z_score']], on='pincode', how='left').fillna(0)
-    fig = px.scatter(
-        plot_df, x=age_col, y="z_score", size=age_col, color="z_score",
-        hover_name="pincode", color_continuous_scale="Reds", template="plotly_dark"
-    )
-    st.plotly_chart(fig, width="stretch") # Updated to 2026 standard
+    matrix_slot = st.empty()
 
 with col_right:
     st.subheader(" System-Wide Noise")
-    
-    # 1. Check if the STL engine successfully ran
-    if stl_result is not None:
-        # 2. Extract and clean the residual (noise) data
-        resid_data = stl_result.resid.dropna()
+    noise_slot = st.empty()
+
+# 5. NEW: Early Warning System (Rolling Baseline)
+spikes_slot = st.empty()
+
+# 6. LOCAL SURGE RADAR (per-series decomposition)
+surges_slot = st.empty()
+
+# 7. DETAILED DATA TABLE
+log_slot = st.empty()
+
+for slot in (summary_slot, matrix_slot, noise_slot, spikes_slot, surges_slot, log_slot):
+    slot.info("⏳ Audit engine running...")
+
+def render_summary(anomalies):
+    with summary_slot.container():
+        top_3 = anomalies.head(3)
+        if not top_3.empty:
+            cols = st.columns(3)
+            for i, (idx, row) in enumerate(top_3.iterrows()):
+                with cols[i]:
+                    st.error(f"**Pincode {int(row['pincode'])}**")
+                    st.metric("Total Volume", f"{int(row[age_col]):,}")
+                    st.caption("AI Priority: High Risk (Isolated Pattern)")
+        else:
+            st.success("✅ No critical anomalies detected.")
+
+def render_matrix(anomalies, z_outliers):
+    with matrix_slot.container():
+        plot_df = anomalies.merge(z_outliers[['pincode', 'z_score']], on='pincode', how='left').fillna(0)
+        fig = px.scatter(
+            plot_df, x=age_col, y="z_score", size=age_col, color="z_score",
+            hover_name="pincode", color_continuous_scale="Reds", template="plotly_dark"
+        )
+        st.plotly_chart(fig, width="stretch") # Updated to 2026 standard
+
+def render_noise(stl_result):
+    with noise_slot.container():
+        # 1. Check if the STL engine successfully ran
+        if stl_result is not None:
+            # 2. Extract and clean the residual (noise) data
+            resid_data = stl_result.resid.dropna()
+            
+            # 3. Check if we actually have numbers to plot
+            if not resid_data.empty:
+                st.line_chart(resid_data, width="stretch")
+                st.caption(" These peaks represent 'Unexplained Surges' that don't follow normal weekly rhythms.")
+            else:
+                st.info("The noise signal is perfectly flat (no deviation detected).")
         
-        # 3. Check if we actually have numbers to plot
-        if not resid_data.empty:
-            st.line_chart(resid_data, width="stretch")
-            st.caption(" These peaks represent 'Unexplained Surges' that don't follow normal weekly rhythms.")
+        # 4. Handle cases with low historical data
         else:
-            st.info("The noise signal is perfectly flat (no deviation detected).")
-    
-    # 4. Handle cases with low historical data
-    else:
-        st.info("Insufficient historical data for Noise Decomposition.")
-        st.caption("Note: We need at least 14 days of data to isolate seasonal patterns from noise.")
+            st.info("Insufficient historical data for Noise Decomposition.")
+            st.caption("Note: We need at least 14 days of data to isolate seasonal patterns from noise.")
 
-# 5. NEW: Early Warning System (Rolling Baseline)
-with st.expander(" Sudden Activity Spikes (Last 14 Days)"):
-    if not rolling_spikes.empty:
-        st.warning(f"Detected {len(rolling_spikes)} Pincodes with sudden intensity shifts.")
-        st.dataframe(rolling_spikes[['date', 'pincode', age_col, 'rolling_z']].head(10), width="stretch")
+def render_spikes(rolling_spikes):
+    with spikes_slot.container():
+        with st.expander(" Sudden Activity Spikes (Last 14 Days)"):
+            if not rolling_spikes.empty:
+                st.warning(f"Detected {len(rolling_spikes)} Pincodes with sudden intensity shifts.")
+                st.dataframe(rolling_spikes[['date', 'pincode', age_col, 'rolling_z']].head(10), width="stretch")
+            else:
+                st.write("No sudden spikes detected relative to local history.")
+
+def render_surges(surges):
+    with surges_slot.container():
+        with st.expander(f" Local Surge Radar ({surge_level} Residuals)"):
+            if not surges.empty:
+                st.dataframe(surges, width="stretch", hide_index=True)
+                st.caption(f" Largest unexplained surges in the last 14 days, after removing each {surge_level.lower()}'s own trend and weekly rhythm (in residual sigmas).")
+            else:
+                st.write("Not enough history to decompose local signals.")
+
+def render_log(anomalies, z_outliers):
+    with log_slot.container():
+        with st.expander(f" View Full Audit Log ({len(z_outliers)} Flagged Pincodes)"):
+            detailed_report = anomalies.merge(z_outliers[['pincode', 'z_score']], on='pincode', how='left')
+            detailed_report = detailed_report.rename(columns={age_col: "Total Enrollments", "z_score": "Intensity (Sigma)", "pincode": "Pincode"})
+            
+            st.dataframe(
+                detailed_report[["Pincode", "Total Enrollments", "Intensity (Sigma)"]].sort_values("Intensity (Sigma)", ascending=False),
+                width="stretch", # Updated to 2026 standard
+                hide_index=True
+            )
+
+# Panel -> (engines it needs, renderer)
+PANELS = {
+    'summary': (('anomalies',), render_summary, summary_slot),
+    'matrix': (('anomalies', 'z_outliers'), render_matrix, matrix_slot),
+    'noise': (('stl_result',), render_noise, noise_slot),
+    'spikes': (('rolling_spikes',), render_spikes, spikes_slot),
+    'surges': (('surges',), render_surges, surges_slot),
+    'log': (('anomalies', 'z_outliers'), render_log, log_slot),
+}
+
+# 8. Run Engines (The Audit Layers) concurrently; panels render on this thread as results land
+engines = {
+    # The model is trained once per dataset version; the slider only moves the score cut
+    'anomalies': lambda: detect_anomalies(pincode_totals, age_col, contamination=sensitivity, scored=get_anomaly_scores(age_col)),
+    'z_outliers': lambda: z_score_audit(pincode_totals, age_col),
+    # Spike alerts are kept up to date incrementally on disk; this only reads the current set
+    'rolling_spikes': lambda: get_early_warning_alerts(age_col),
+    'stl_result': lambda: decompose_signals(daily_totals, age_col),
+    'surges': lambda: surge_table(get_signal_decomposition(age_col, by=surge_level.lower())),
+}
+ENGINE_TIMEOUTS = {'anomalies': 120, 'z_outliers': 30, 'rolling_spikes': 120, 'stl_result': 60, 'surges': 120}
+
+# Workers get no script context: they only compute (their cached builders have no
+# spinner) and every st call happens on this thread, so a timed-out engine left
+# running in the background can never touch the page
+results, failed, timings = {}, {}, {}
+for name, status, result, seconds in run_engines(engines, ENGINE_TIMEOUTS):
+    timings[name] = f"{status} · {seconds:.2f}s"
+    if status == 'ok':
+        results[name] = result
     else:
-        st.write("No sudden spikes detected relative to local history.")
-
-# 6. DETAILED DATA TABLE
-with st.expander(f" View Full Audit Log ({len(z_outliers)} Flagged Pincodes)"):
-    detailed_report = anomalies.merge(z_outliers[['pincode', 'z_score']], on='pincode', how='left')
-    detailed_report = detailed_report.rename(columns={age_col: "Total Enrollments", "z_score": "Intensity (Sigma)", "pincode": "Pincode"})
-    
-    st.dataframe(
-        detailed_report[["Pincode", "Total Enrollments", "Intensity (Sigma)"]].sort_values("Intensity (Sigma)", ascending=False),
-        width="stretch", # Updated to 2026 standard
-        hide_index=True
-    )
+        failed[name] = "timed out" if status == 'timeout' else f"failed ({result})"
+
+    for panel, (needs, render, slot) in list(PANELS.items()):
+        if all(n in results for n in needs):
+            render(*(results[n] for n in needs))
+            PANELS.pop(panel)
+        elif any(n in failed for n in needs):
+            slot.warning(f"⚠️ Audit engine {', '.join(n for n in needs if n in failed)} "
+                         f"{'; '.join(failed[n] for n in needs if n in failed)}.")
+            PANELS.pop(panel)
+
+with st.expander(" Engine Timings"):
+    st.json(timings)
+    st.dataframe(stage_report(), width="stretch", hide_index=True)
+    finish_run()
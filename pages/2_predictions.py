@@ -3,19 +3,24 @@ import pandas as pd
 import streamlit as st
 import plotly.graph_objects as go
 import datetime
-from modules.data_processor import get_engine_data
-from modules.prediction import predict_saturation_date, get_burn_trend
+from modules.data_processor import get_aggregate
+from modules.prediction_cache import get_district_forecasts, get_saturation_model
+from modules.prediction import evaluate_saturation
+from modules.instrumentation import start_run, finish_run, stage_report
 
 # 1. Page Setup
 st.set_page_config(layout="wide", page_title="Predictive Forecasting")
 st.title(" Saturation Forecasting Engine")
 st.markdown("---")
+start_run('predictions')
 
 # 2. Load Data from Shared Processor
-df = get_engine_data()
+# Daily district totals (pandas groupby or DuckDB SQL, see $UIDAI_QUERY_BACKEND); no raw rows needed
+df = get_aggregate(('district', 'date'))
 
 if df.empty:
     st.error("❌ Data Engine Error: Could not load dataset.")
+    finish_run(status='stopped')
     st.stop()
 
 # 3. Sidebar Configuration
@@ -38,11 +43,11 @@ age_col = age_options[target_label]
 districts = sorted(df['district'].unique())
 selected_district = st.sidebar.selectbox("Target District:", districts)
 
-# Filter Data for Model
-district_df = df[df['district'] == selected_district].copy()
+# Fitted once per (dataset version, district, age group); slider moves only re-evaluate it
+model = get_saturation_model(selected_district, age_col)
 
 # 4. Scenario Simulation Input
-current_enrolled = district_df[age_col].sum()
+current_enrolled = model['enrolled'] if model else 0
 # AI Logic: Estimate a ceiling if user hasn't provided one (Assumption: 75% coverage achieved)
 default_pop = int(current_enrolled * 1.3) 
 
@@ -63,9 +68,9 @@ boost = st.sidebar.slider(
 )
 
 # 5. Run Prediction Model
-completion_date, velocity = predict_saturation_date(district_df, age_col, target_pop, boost_factor=boost)
+completion_date, velocity = evaluate_saturation(model, target_pop, boost_factor=boost)
 # Calculate baseline (1.0x speed) to find the difference
-original_date, _ = predict_saturation_date(district_df, age_col, target_pop, boost_factor=1.0)
+original_date, _ = evaluate_saturation(model, target_pop, boost_factor=1.0)
 
 # Calculate days saved
 if isinstance(completion_date, datetime.date) and isinstance(original_date, datetime.date):
@@ -128,11 +133,9 @@ st.caption(f"**Growth Velocity:** Analyzing trends at **{int(velocity)} enrollme
 
 # 7. Visualization: The Burn-Up Chart
 st.divider()
-trend = get_burn_trend(district_df, age_col)
+trend = model['trend'] if model else pd.DataFrame()
 
 if not trend.empty:
-    trend['cumulative'] = trend[age_col].cumsum()
-
     fig = go.Figure()
 
     # Actual Progress
@@ -175,3 +178,33 @@ with st.expander("📝 Technical Model Analysis"):
     **Boost Impact:** A boost factor of **{boost}x** increases the slope of the projection, simulating increased operational capacity.
     The Boost slider multiplies your enrollment velocity (speed), which steepens the slope of the trajectory line and pulls the predicted 100% saturation date closer to today.
     """)
+
+# 9. National Outlook: every district forecast in one vectorised pass
+st.divider()
+st.subheader(f" National Outlook: Districts Finishing Last ({target_label})")
+forecasts = get_district_forecasts()
+outlook = forecasts[forecasts['age_group'] == age_col]
+
+if outlook.empty:
+    st.info("No dated district records available for a national forecast.")
+else:
+    stalled = outlook[outlook['status'] == 'Stalled']
+    finishing_last = outlook[outlook['status'] == 'On Track'].sort_values(
+        ['completion_date', 'days_needed'], ascending=False, na_position='first').head(15)
+
+    o1, o2, o3 = st.columns(3)
+    o1.metric("Districts Forecast", f"{len(outlook):,}")
+    o2.metric("Stalled Districts", f"{len(stalled):,}", help="No positive enrolment velocity in the history.")
+    o3.metric("Latest Completion", finishing_last['completion_date'].max().strftime('%d %b %Y')
+              if finishing_last['completion_date'].notna().any() else "N/A")
+
+    st.dataframe(
+        finishing_last[['district', 'current_total', 'velocity', 'completion_date', 'days_needed']]
+        .assign(velocity=lambda t: t['velocity'].round(1), days_needed=lambda t: t['days_needed'].round()),
+        width="stretch", hide_index=True
+    )
+    st.caption("Targets assume 1.3x the enrolled total per district (the same default as the simulator above), at 1.0x speed.")
+
+with st.expander(" Engine Timings"):
+    st.dataframe(stage_report(), width="stretch", hide_index=True)
+    finish_run()
@@ -5,3 +5,4 @@ scikit-learn
 plotly
 folium
 streamlit-folium
+pyarrow
@@ -0,0 +1,35 @@
+"""
+Shared fixtures: one small synthetic drop (benchmarks/synthetic.py),
+ingested once per test session the way convert_data.py --stream does.
+"""
+import os
+
+import pytest
+
+from benchmarks.synthetic import make_geography, write_rows
+from modules.dataset import scan_dataset, compact_frame
+from modules.filter_index import sort_for_filtering
+from modules.ingest import stream_convert
+
+N_ROWS = 20_000
+CHUNKSIZE = 3_000  # several chunks, so partitions get more than one part file
+
+
+@pytest.fixture(scope='session')
+def raw_csv(tmp_path_factory):
+    path = os.path.join(tmp_path_factory.mktemp('raw'), 'datasets-uidai.csv')
+    write_rows(path, N_ROWS, make_geography(seed=0), seed=0)
+    return path
+
+
+@pytest.fixture(scope='session')
+def dataset_dir(raw_csv, tmp_path_factory):
+    output = str(tmp_path_factory.mktemp('dataset') / 'uidai_dataset')
+    stream_convert([raw_csv], output, chunksize=CHUNKSIZE, workers=1, min_files=2)
+    return output
+
+
+@pytest.fixture(scope='session')
+def engine_frame(dataset_dir):
+    """The app's engine frame without coordinates: compact schema, (state, date) order. Read-only."""
+    return sort_for_filtering(compact_frame(scan_dataset(dataset_dir)))
@@ -0,0 +1,46 @@
+"""Rollup cube and group totals against the original raw-row dashboard metrics."""
+import datetime
+
+import pandas as pd
+
+from modules.aggregates import (
+    AGE_COLUMNS, build_rollup_cube, group_totals, slice_cube, cube_totals, cube_daily_trend, cube_top_districts,
+)
+
+AGE_COL = 'age_0_5'
+
+
+def reference_metrics(df, state=None, date_range=None, age_col=AGE_COL):
+    """The original main_dashboard.py: filter raw rows, then sum, trend and rank them."""
+    filtered = df
+    if date_range is not None:
+        filtered = filtered[(filtered['date'].dt.date >= date_range[0]) & (filtered['date'].dt.date <= date_range[1])]
+    if state is not None:
+        filtered = filtered[filtered['state'] == state]
+    totals = {col: int(filtered[col].sum()) for col in AGE_COLUMNS}
+    trend = filtered.groupby('date')[age_col].sum().reset_index()
+    trend['7D_MA'] = trend[age_col].rolling(window=7).mean()
+    top = filtered.groupby('district', observed=True)[age_col].sum().nlargest(10).reset_index()
+    return totals, trend, top
+
+
+def test_cube_answers_dashboard_metrics(engine_frame):
+    cube = build_rollup_cube(engine_frame)
+    end = engine_frame['date'].max().date()
+    busiest = engine_frame['state'].value_counts().idxmax()
+    for state in (None, busiest):
+        for window in (None, (end - datetime.timedelta(days=89), end)):
+            totals, trend, top = reference_metrics(engine_frame, state, window)
+            cells = slice_cube(cube, state=state, date_range=window)
+            assert cube_totals(cells) == totals
+            pd.testing.assert_frame_equal(cube_daily_trend(cells, AGE_COL), trend, check_dtype=False)
+            got_top = cube_top_districts(cells, AGE_COL)
+            assert got_top[AGE_COL].tolist() == top[AGE_COL].tolist()
+            assert set(got_top['district']) == set(top['district'].astype(str))
+
+
+def test_group_totals_match_groupby(engine_frame):
+    for keys in (['pincode'], ['date'], ['district', 'date'], ['pincode', 'date']):
+        expected = engine_frame.groupby(keys, observed=True, dropna=False)[AGE_COLUMNS].sum().reset_index()
+        got = group_totals(engine_frame, keys)
+        pd.testing.assert_frame_equal(got, expected.astype({col: 'int64' for col in AGE_COLUMNS}))
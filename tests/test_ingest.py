@@ -0,0 +1,100 @@
+"""Streaming and incremental ingest against the original one-shot pandas conversion."""
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from modules.dataset import scan_dataset, pincode_keys
+from modules.ingest import (
+    COLUMN_NAMES, AGE_COLUMNS, incremental_convert, compact_dataset, load_manifest, clean_chunk, compile_geocode_index,
+)
+
+
+def reference_convert(csv_path):
+    """The original convert_data.py: read the whole CSV, parse dates, strip names."""
+    df = pd.read_csv(csv_path, names=COLUMN_NAMES, header=0)
+    df['date'] = pd.to_datetime(df['date'], dayfirst=True, errors='coerce')
+    df['state'] = df['state'].astype(str).str.strip()
+    df['district'] = df['district'].astype(str).str.strip()
+    return df
+
+
+def canonical(df):
+    """Same rows in the same order, whatever dtypes either side stores."""
+    out = pd.DataFrame({
+        'date': pd.to_datetime(df['date']).astype('datetime64[s]'),
+        'state': df['state'].astype(str).to_numpy(),
+        'district': df['district'].astype(str).to_numpy(),
+        'pincode': pd.to_numeric(df['pincode']).astype('float64').to_numpy(),
+    })
+    for col in AGE_COLUMNS:
+        out[col] = df[col].astype('int64').to_numpy()
+    return out.sort_values(COLUMN_NAMES, ignore_index=True)
+
+
+def part_files(output_dir):
+    return glob.glob(os.path.join(output_dir, '*', '*', '*.parquet'))
+
+
+def test_stream_convert_matches_reference(raw_csv, dataset_dir):
+    pd.testing.assert_frame_equal(canonical(scan_dataset(dataset_dir)), canonical(reference_convert(raw_csv)))
+
+
+def test_incremental_convert_reads_only_appended_rows(raw_csv, tmp_path):
+    with open(raw_csv, encoding='utf-8') as f:
+        lines = f.readlines()
+    csv_path = tmp_path / 'datasets-uidai.csv'
+    output = str(tmp_path / 'uidai_dataset')
+    split = len(lines) * 3 // 5
+
+    csv_path.write_text(''.join(lines[:split]), encoding='utf-8')
+    incremental_convert([str(csv_path)], output, chunksize=3_000, workers=1)
+    first_rows = load_manifest(output)['files'][str(csv_path)]['rows']
+
+    with open(csv_path, 'a', encoding='utf-8') as f:
+        f.writelines(lines[split:])
+    summaries, skipped, rewritten = incremental_convert([str(csv_path)], output, chunksize=3_000, workers=1)
+    assert (skipped, rewritten) == ([], [])
+    assert sum(s['rows'] for s in summaries.values()) == len(lines) - 1 - first_rows
+
+    pd.testing.assert_frame_equal(canonical(scan_dataset(output)), canonical(reference_convert(raw_csv)))
+
+    # Nothing new: no parsing, no new part files
+    files = part_files(output)
+    summaries, skipped, _ = incremental_convert([str(csv_path)], output, workers=1)
+    assert summaries == {} and skipped == [str(csv_path)]
+    assert sorted(part_files(output)) == sorted(files)
+
+
+def test_compaction_keeps_every_row(raw_csv, tmp_path):
+    csv_path = tmp_path / 'datasets-uidai.csv'
+    csv_path.write_text(open(raw_csv, encoding='utf-8').read(), encoding='utf-8')
+    output = str(tmp_path / 'uidai_dataset')
+    incremental_convert([str(csv_path)], output, chunksize=2_000, workers=1)
+    before = part_files(output)
+
+    compact_dataset(output, batch_id='1', workers=1, max_rows_per_file=200)
+    after = part_files(output)
+    assert len(after) < len(before)
+    leftovers = [d for _, dirs, _ in os.walk(output) for d in dirs if d.startswith('.')]
+    assert leftovers == []  # staging and swap directories are gone
+    pd.testing.assert_frame_equal(canonical(scan_dataset(output)), canonical(reference_convert(raw_csv)))
+
+
+def test_pincode_rule_is_shared(tmp_path):
+    """Ingest, the geocode index and lookup keys accept the same pincodes (dataset.PINCODE_RANGE)."""
+    raw = ['504299', '504299.0', ' 504299.7 ', '0', '999999', '999999.5', '1000000', '-1', '4294967295', 'abc', '']
+    expected = [504299, 504299, 504299, 0, 999999, 999999, None, None, None, None, None]
+
+    chunk = pd.DataFrame({col: ['1'] * len(raw) for col in COLUMN_NAMES})
+    chunk['date'], chunk['pincode'] = '20-03-2025', raw
+    assert clean_chunk(chunk)['pincode'].to_pylist() == expected
+
+    keys, valid = pincode_keys(pd.Series(raw, dtype=object))
+    assert [int(k) if v else None for k, v in zip(keys, valid)] == expected
+
+    mapping = tmp_path / 'pincode-mapping.csv'
+    mapping.write_text('pincode,lat,lon\n' + ''.join(f'"{p}",{20 + i},{80 + i}\n' for i, p in enumerate(raw)))
+    index = compile_geocode_index(str(mapping))
+    np.testing.assert_array_equal(index['pincode'], sorted({p for p in expected if p is not None}))
@@ -0,0 +1,45 @@
+"""Stage records: memory by default, and tracemalloc peaks that survive stages opening in other threads."""
+import threading
+import tracemalloc
+
+import numpy as np
+
+from modules.instrumentation import start_run, finish_run, stage, rss_bytes
+
+MB = 1e6
+
+
+def test_stage_reports_rss_by_default():
+    start_run('test')
+    with stage('hold 64 MB') as record:
+        held = np.ones(int(64 * MB), dtype=np.uint8)
+    finish_run()
+    assert held.sum() == 64 * MB
+    if rss_bytes() is not None:
+        assert record['rss_delta_mb'] > 32
+
+
+def test_peak_survives_a_sibling_thread_resetting_it():
+    """A worker's stage starting (and resetting tracemalloc's peak) must not erase the main stage's peak."""
+    started = tracemalloc.is_tracing()
+    tracemalloc.start()
+    freed, sibling_done = threading.Event(), threading.Event()
+
+    def sibling():
+        freed.wait()
+        with stage('sibling'):
+            pass
+        sibling_done.set()
+
+    worker = threading.Thread(target=sibling)
+    worker.start()
+    try:
+        with stage('main') as record:
+            np.ones(int(40 * MB), dtype=np.uint8).sum()  # allocated and freed before the sibling starts
+            freed.set()
+            sibling_done.wait()
+    finally:
+        worker.join()
+        if not started:
+            tracemalloc.stop()
+    assert record['alloc_peak_mb'] >= 40
@@ -0,0 +1,175 @@
+"""Rolling anomalies and the streaming early-warning detector against the original groupby-rolling code."""
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import IsolationForest
+from statsmodels.tsa.seasonal import seasonal_decompose
+
+from benchmarks.bench_rolling import reference_rolling_anomalies, make_rows
+from modules.dataset import scan_dataset, compact_frame, dataset_row_count
+from modules.ingest import incremental_convert
+from modules.intelligence import get_rolling_anomalies, score_anomalies, detect_anomalies, decompose_signals_batch
+from modules.early_warning import refresh_early_warning, scan_rows_since
+
+AGE_COL = 'age_0_5'
+ALERT_FIELDS = ['date', 'pincode', AGE_COL, 'rolling_avg', 'rolling_std', 'rolling_z']
+
+
+def canonical(alerts):
+    out = alerts[ALERT_FIELDS].astype({'date': 'datetime64[ns]', 'pincode': 'float64', AGE_COL: 'float64'})
+    return out.sort_values(ALERT_FIELDS[:3], ignore_index=True)
+
+
+def refresh(df, state_dir):
+    """The detector over an in-memory frame: rows from the watermark day on by a date mask."""
+    def read_rows(since):
+        return df if since is None else df[(df['date'] >= since).to_numpy()]
+    return refresh_early_warning(read_rows, int(df['date'].notna().sum()), AGE_COL, state_dir=state_dir)
+
+
+@pytest.fixture(scope='module')
+def frames(engine_frame):
+    """Dense daily pincode rows (many spikes) and the sparse synthetic drop (missing pincodes)."""
+    return {'dense': make_rows(20_000, 200), 'engine': engine_frame[['date', 'pincode', AGE_COL]]}
+
+
+@pytest.mark.parametrize('name', ['dense', 'engine'])
+def test_rolling_anomalies_match_reference(frames, name):
+    df = frames[name]
+    expected = reference_rolling_anomalies(df, AGE_COL)
+    assert len(expected) > 0
+    pd.testing.assert_frame_equal(canonical(get_rolling_anomalies(df, AGE_COL)), canonical(expected))
+
+
+@pytest.mark.parametrize('name', ['dense', 'engine'])
+def test_early_warning_matches_reference(frames, name, tmp_path):
+    df = frames[name]
+    expected = canonical(reference_rolling_anomalies(df, AGE_COL))
+    full = refresh(df, str(tmp_path / 'full'))
+    pd.testing.assert_frame_equal(canonical(full), expected)
+
+    # Fed in two increments (rows up to a cut-off date, then the rest): same alert log
+    cut = df['date'].sort_values().iloc[len(df) // 2]
+    state_dir = str(tmp_path / 'incremental')
+    refresh(df[(df['date'] <= cut).to_numpy()], state_dir)
+    pd.testing.assert_frame_equal(refresh(df, state_dir), full)
+
+
+def test_early_warning_rebuilds_on_rewritten_history(frames, tmp_path):
+    df = frames['dense']
+    state_dir = str(tmp_path / 'state')
+    refresh(df, state_dir)
+    rewritten = df.iloc[len(df) // 3:]  # rows dropped before the watermark
+    pd.testing.assert_frame_equal(canonical(refresh(rewritten, state_dir)),
+                                  canonical(reference_rolling_anomalies(rewritten, AGE_COL)))
+
+
+def day_sorted_lines(raw_csv):
+    """Header and the drop's lines in date order, with the index of a cut that keeps whole days on each side."""
+    with open(raw_csv, encoding='utf-8') as f:
+        header, *lines = f.readlines()
+    day = [datetime.datetime.strptime(line.split(',', 1)[0], '%d-%m-%Y') for line in lines]
+    lines = [line for _, line in sorted(zip(day, lines), key=lambda pair: pair[0])]
+    cut = len(lines) // 2
+    while lines[cut].split(',', 1)[0] == lines[cut - 1].split(',', 1)[0]:
+        cut += 1
+    return header, lines, cut
+
+
+def grow_and_refresh(first, appended, tmp_path):
+    """
+    Ingests and refreshes on `first`, appends `appended` to the same CSV and
+    refreshes again. Returns (second refresh's alerts, rows it read per
+    call, dated rows before the append, output folder).
+    """
+    source, output = str(tmp_path / 'drop.csv'), str(tmp_path / 'uidai_dataset')
+    state_dir = str(tmp_path / 'state')
+    with open(source, 'w', encoding='utf-8') as f:
+        f.writelines(first)
+    incremental_convert([source], output, workers=1)
+    refresh_early_warning(scan_rows_since(output, AGE_COL), dataset_row_count(output, dated=True), AGE_COL,
+                          state_dir=state_dir)
+    before = dataset_row_count(output, dated=True)
+
+    with open(source, 'a', encoding='utf-8') as f:
+        f.writelines(appended)
+    incremental_convert([source], output, workers=1)
+    reads = []
+    def read_rows(since):
+        reads.append(scan_rows_since(output, AGE_COL)(since))
+        return reads[-1]
+    got = refresh_early_warning(read_rows, dataset_row_count(output, dated=True), AGE_COL, state_dir=state_dir)
+    return got, reads, before, output
+
+
+def dated_reference(output):
+    """The batch rolling z-score over every dated row of the dataset (undated rows have no place in time)."""
+    frame = compact_frame(scan_dataset(output))
+    return reference_rolling_anomalies(frame[frame['date'].notna().to_numpy()], AGE_COL)
+
+
+def test_early_warning_scans_only_appended_rows(raw_csv, tmp_path):
+    """A CSV that grows day by day: the second refresh scans just the watermark day and the new rows, no rebuild."""
+    header, lines, cut = day_sorted_lines(raw_csv)
+    got, reads, before, output = grow_and_refresh([header] + lines[:cut], lines[cut:], tmp_path)
+
+    last_day = pd.Timestamp(datetime.datetime.strptime(lines[cut - 1].split(',', 1)[0], '%d-%m-%Y'))
+    read_days = pd.to_datetime(reads[0]['date'])
+    assert len(reads) == 1 and (read_days >= last_day).all()
+    assert (read_days > last_day).sum() == dataset_row_count(output, dated=True) - before == len(lines) - cut
+    assert dataset_row_count(output) == len(scan_dataset(output))
+    pd.testing.assert_frame_equal(canonical(got), canonical(dated_reference(output)))
+
+
+def test_early_warning_takes_undated_and_same_day_appends(raw_csv, tmp_path):
+    """Appended rows without a date, or dated on the watermark day, are an increment too: no rebuild, same alerts."""
+    header, lines, cut = day_sorted_lines(raw_csv)
+    last_day = lines[cut - 1].split(',', 1)[0]
+    same_day = [line for line in lines[:cut] if line.startswith(last_day)]
+    # More rows on the watermark day: repeats, and a spike for each pincode seen that day
+    spikes = [line.rsplit(',', 3)[0] + ',900,900,900\n' for line in same_day]
+    undated = ['31-02-2024,' + line.split(',', 1)[1] for line in lines[cut:cut + 50]]
+    got, reads, before, output = grow_and_refresh([header] + lines[:cut], same_day + spikes + undated, tmp_path)
+
+    assert dataset_row_count(output) - dataset_row_count(output, dated=True) == len(undated)
+    assert dataset_row_count(output, dated=True) - before == len(same_day) + len(spikes)
+    assert len(reads) == 1  # a rebuild would read everything a second time
+    assert (pd.to_datetime(got['date']) == pd.Timestamp(datetime.datetime.strptime(last_day, '%d-%m-%Y'))).any()
+    pd.testing.assert_frame_equal(canonical(got), canonical(dated_reference(output)))
+
+
+@pytest.mark.parametrize('contamination', [0.01, 0.05, 0.2])
+def test_stored_score_cut_matches_isolation_forest(engine_frame, contamination):
+    """The percentile cut on cached scores flags exactly the pincodes a model fitted with that contamination does."""
+    scored = score_anomalies(engine_frame, AGE_COL)
+    flagged = detect_anomalies(engine_frame, AGE_COL, contamination=contamination, scored=scored)
+
+    profile = scored['profile']
+    labels = IsolationForest(contamination=contamination, random_state=42).fit_predict(profile[[AGE_COL]])
+    assert (labels == -1).any()
+    assert np.array_equal(np.sort(flagged['pincode'].to_numpy()), np.sort(profile['pincode'][labels == -1].to_numpy()))
+
+
+def test_batch_decomposition_matches_seasonal_decompose():
+    """Every series of the batch equals statsmodels' classical additive decomposition of that series alone."""
+    rng = np.random.default_rng(7)
+    days = pd.date_range('2025-03-05', periods=60, freq='D')
+    weekly = np.array([5, 40, 35, 30, 32, 60, 10])
+    rows = []
+    for district, level in [('Alpha', 100), ('Beta', 20), ('Gamma', 300), ('Sparse', 50)]:
+        counts = level + weekly[days.dayofweek] + rng.poisson(10, len(days)) + np.arange(len(days))
+        keep = rng.random(len(days)) > 0.3 if district == 'Sparse' else np.ones(len(days), dtype=bool)
+        rows.append(pd.DataFrame({'district': district, 'date': days[keep], AGE_COL: counts[keep]}))
+    df = pd.concat(rows, ignore_index=True).sample(frac=1, random_state=0)
+    assert df.groupby('district')['date'].nunique()['Sparse'] < len(days)
+
+    batch = decompose_signals_batch(df, AGE_COL)
+    for district, series in df.groupby('district'):
+        daily = series.set_index('date')[AGE_COL].reindex(days, fill_value=0).astype('float64')
+        expected = seasonal_decompose(daily, model='additive', period=7)
+        for part, reference in [('observed', expected.observed), ('trend', expected.trend),
+                                ('seasonal', expected.seasonal), ('resid', expected.resid)]:
+            np.testing.assert_allclose(batch[part].loc[district].to_numpy(dtype='float64'), reference.to_numpy(),
+                                       rtol=1e-5, atol=1e-3, err_msg=f"{district} {part}")
@@ -0,0 +1,78 @@
+"""Batch district forecasts and the fitted what-if model against the original per-district regression."""
+import datetime
+
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from modules.aggregates import AGE_COLUMNS, group_totals
+from modules.prediction import forecast_all_districts, fit_saturation_model, evaluate_saturation
+
+TARGET_RATIO = 1.3
+BOOST = 1.5
+
+
+def reference_predict_saturation_date(df, age_col, target_population, boost_factor=1.0):
+    """The original predict_saturation_date: one LinearRegression per call."""
+    if df.empty or 'date' not in df.columns:
+        return None, 0
+    daily = df.groupby('date')[age_col].sum().reset_index()
+    daily['cumulative'] = daily[age_col].cumsum()
+    daily['day_num'] = (daily['date'] - daily['date'].min()).dt.days
+    model = LinearRegression()
+    model.fit(daily[['day_num']], daily['cumulative'])
+    adjusted_velocity = model.coef_[0] * boost_factor
+    if adjusted_velocity <= 0:
+        return "Stalled", 0
+    remaining = target_population - daily['cumulative'].max()
+    if remaining <= 0:
+        return "Already Saturated", adjusted_velocity
+    days_needed = remaining / adjusted_velocity
+    return (daily['date'].max() + datetime.timedelta(days=int(days_needed))).date(), adjusted_velocity
+
+
+def same_forecast(got_date, got_velocity, expected_date, expected_velocity):
+    assert got_velocity == pytest.approx(expected_velocity, rel=1e-6, abs=1e-9)
+    if isinstance(expected_date, datetime.date):
+        # int() of a day count that lands on a whole day may round either way
+        assert abs((got_date - expected_date).days) <= 1
+    else:
+        assert got_date == expected_date
+
+
+@pytest.fixture(scope='module')
+def districts(engine_frame):
+    """Every district's rows, as the original page sliced them."""
+    return {name: rows for name, rows in engine_frame.groupby('district', observed=True)}
+
+
+def test_forecast_all_districts_matches_reference(engine_frame, districts):
+    forecasts = forecast_all_districts(engine_frame, target_ratio=TARGET_RATIO, boost_factor=BOOST)
+    assert len(forecasts) == len(districts) * len(AGE_COLUMNS)
+    assert set(forecasts['status']) >= {'On Track', 'Stalled'}
+    for row in forecasts.itertuples():
+        rows = districts[row.district]
+        target = rows[row.age_group].sum() * TARGET_RATIO
+        expected_date, expected_velocity = reference_predict_saturation_date(rows, row.age_group, target, BOOST)
+        got_date = row.completion_date.date() if row.status == 'On Track' else row.status
+        same_forecast(got_date, row.velocity, expected_date, expected_velocity)
+
+
+def test_forecasts_from_totals_match_rows(engine_frame):
+    """The predictions page forecasts from ('district', 'date') totals instead of raw rows."""
+    totals = group_totals(engine_frame, ('district', 'date'))
+    from_rows = forecast_all_districts(engine_frame)
+    from_totals = forecast_all_districts(totals)
+    pd.testing.assert_frame_equal(from_totals, from_rows)
+
+
+def test_fitted_model_matches_reference(districts):
+    names = sorted(districts, key=lambda name: len(districts[name]), reverse=True)[:20]
+    for name in names:
+        rows = districts[name]
+        model = fit_saturation_model(rows, 'age_5_17')
+        for ratio in (0.5, 1.1, 3.0):
+            target = rows['age_5_17'].sum() * ratio
+            for boost in (0.5, 1.0, 2.0):
+                expected = reference_predict_saturation_date(rows, 'age_5_17', target, boost)
+                same_forecast(*evaluate_saturation(model, target, boost), *expected)
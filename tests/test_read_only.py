@@ -0,0 +1,94 @@
+"""Every page's engines leave the shared engine frame and the shared aggregates untouched."""
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.aggregates import build_rollup_cube, group_totals, slice_cube, cube_totals, cube_daily_trend, cube_top_districts
+from modules.filter_index import build_filter_index, build_date_index, slice_rows, date_slice
+from modules.grid_bins import bin_frame
+from modules.tiles import heatmap_points
+from modules.intelligence import (
+    score_anomalies, detect_anomalies, z_score_audit, get_rolling_anomalies, decompose_signals,
+    decompose_signals_batch, surge_table,
+)
+from modules.prediction import predict_traffic, fit_saturation_model, evaluate_saturation, forecast_all_districts
+
+AGE_COL = 'age_0_5'
+
+
+@pytest.fixture(scope='module')
+def shared(engine_frame):
+    """The engine frame with coordinates, as the app holds it (built once, then only read)."""
+    rng = np.random.default_rng(0)
+    frame = engine_frame.assign(lat=rng.uniform(8, 35, len(engine_frame)).astype('float32'),
+                                lon=rng.uniform(68, 97, len(engine_frame)).astype('float32'))
+    aggregates = {keys: group_totals(frame, keys) for keys in
+                  [('pincode',), ('date',), ('district', 'date'), ('pincode', 'date')]}
+    return frame, aggregates
+
+
+def buffers(df):
+    """The memory behind each column: a reassigned column (even with equal values) gets new memory."""
+    def buffer(array):
+        if isinstance(array, pd.Categorical):
+            return array.codes
+        return array._data if isinstance(array, pd.arrays.IntegerArray) else np.asarray(array)
+    return {col: buffer(df[col].array) for col in df.columns}
+
+
+def unchanged(run, frame, aggregates):
+    """Runs the engines, then checks every shared object against a deep copy taken before."""
+    shared = {'engine frame': frame, **{f"aggregate {keys}": df for keys, df in aggregates.items()}}
+    before = {name: (df.copy(deep=True), buffers(df)) for name, df in shared.items()}
+    run()
+    for name, df in shared.items():
+        copy, memory = before[name]
+        pd.testing.assert_frame_equal(df, copy, obj=name)
+        assert all(np.shares_memory(buffers(df)[col], memory[col]) for col in df.columns), name
+
+
+def test_dashboard_engines_leave_shared_frames_unchanged(shared):
+    frame, aggregates = shared
+    state = frame['state'].value_counts().idxmax()
+    end = frame['date'].max().date()
+    window = (end - datetime.timedelta(days=89), end)
+
+    def run():
+        index, by_date = build_filter_index(frame), build_date_index(frame)
+        for selection in (slice_rows(frame, index, state=state, date_range=window),
+                          slice_rows(frame, index, date_range=window, date_index=lambda: by_date),
+                          date_slice(frame[(frame['state'] == state).to_numpy()], window)):
+            bin_frame(selection, AGE_COL)
+            heatmap_points(selection, AGE_COL)
+        cells = slice_cube(build_rollup_cube(frame), state=state, date_range=window)
+        cube_totals(cells), cube_daily_trend(cells, AGE_COL), cube_top_districts(cells, AGE_COL)
+    unchanged(run, frame, aggregates)
+
+
+def test_intelligence_engines_leave_shared_frames_unchanged(shared):
+    frame, aggregates = shared
+
+    def run():
+        pincodes, daily = aggregates[('pincode',)], aggregates[('date',)]
+        detect_anomalies(pincodes, AGE_COL, scored=score_anomalies(pincodes, AGE_COL))
+        z_score_audit(pincodes, AGE_COL)
+        get_rolling_anomalies(frame, AGE_COL)
+        decompose_signals(daily, AGE_COL)
+        surge_table(decompose_signals_batch(aggregates[('district', 'date')], AGE_COL))
+        decompose_signals_batch(aggregates[('pincode', 'date')], AGE_COL, by='pincode', last_days=180)
+    unchanged(run, frame, aggregates)
+
+
+def test_prediction_engines_leave_shared_frames_unchanged(shared):
+    frame, aggregates = shared
+
+    def run():
+        daily = aggregates[('district', 'date')]
+        district = daily['district'].value_counts().idxmax()
+        model = fit_saturation_model(daily[daily['district'] == district], AGE_COL)
+        evaluate_saturation(model, model['enrolled'] * 1.3, boost_factor=1.5)
+        forecast_all_districts(daily)
+        predict_traffic(frame)
+    unchanged(run, frame, aggregates)
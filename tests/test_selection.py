@@ -0,0 +1,110 @@
+"""Dashboard selections (filter index, date index) and scan pushdown against the original boolean masks."""
+import datetime
+
+import pandas as pd
+import pytest
+
+from modules import data_processor, dashboard_cache
+from modules.dataset import scan_dataset, compact_frame
+from modules.filter_index import sort_for_filtering, build_filter_index, build_date_index, slice_rows, date_slice
+
+
+def reference_selection(df, state=None, date_range=None):
+    """The original main_dashboard.py filter: a date mask, then a state mask."""
+    filtered = df.copy()
+    if date_range is not None:
+        start_date, end_date = date_range
+        filtered = filtered[(filtered['date'].dt.date >= start_date) &
+                            (filtered['date'].dt.date <= end_date)]
+    if state is not None:
+        filtered = filtered[filtered['state'] == state]
+    return filtered
+
+
+def same_rows(got, expected):
+    """Row sets match; row order and category order may differ between paths."""
+    def canonical(df):
+        names = {col: df[col].astype(str) for col in ('state', 'district')}
+        return df.assign(**names).sort_values(list(expected.columns), ignore_index=True)
+    pd.testing.assert_frame_equal(canonical(got), canonical(expected))
+
+
+def selections(df):
+    busiest = df['state'].value_counts().idxmax()
+    end = df['date'].max().date()
+    start = df['date'].min().date()
+    windows = [None, (end - datetime.timedelta(days=89), end), (start, end),
+               (start - datetime.timedelta(days=30), start + datetime.timedelta(days=3)),
+               (end + datetime.timedelta(days=1), end + datetime.timedelta(days=9))]
+    return [(state, window) for state in (None, busiest, 'Nowhere') for window in windows]
+
+
+@pytest.fixture(scope='module')
+def indexes(engine_frame):
+    date_index = build_date_index(engine_frame)
+    return build_filter_index(engine_frame), lambda: date_index
+
+
+def test_slice_rows_matches_masks(engine_frame, indexes):
+    index, date_index = indexes
+    for state, window in selections(engine_frame):
+        expected = reference_selection(engine_frame, state, window)
+        same_rows(slice_rows(engine_frame, index, state=state, date_range=window), expected)
+        same_rows(slice_rows(engine_frame, index, state=state, date_range=window, date_index=date_index), expected)
+
+
+def test_date_index_keeps_date_order(engine_frame, indexes):
+    index, date_index = indexes
+    end = engine_frame['date'].max().date()
+    rows = slice_rows(engine_frame, index, date_range=(end - datetime.timedelta(days=30), end),
+                      date_index=date_index)
+    assert rows['date'].is_monotonic_increasing
+
+
+def test_pushdown_matches_masks(engine_frame, dataset_dir):
+    """What get_engine_data / load_dataset read for a scope: a state scan or a windowed scan."""
+    for state, window in selections(engine_frame):
+        expected = reference_selection(engine_frame, state, window)
+        if state is not None:
+            scoped = compact_frame(scan_dataset(dataset_dir, states=[state]))
+            got = date_slice(scoped.sort_values('date', kind='stable', ignore_index=True), window)
+        else:
+            got = compact_frame(scan_dataset(dataset_dir, date_range=window))
+        same_rows(got[list(expected.columns)], expected)
+
+
+def test_engine_cache_stays_within_budget(engine_frame, monkeypatch):
+    """Cached engine frames are trimmed by bytes, least recently used first, never the one returned."""
+    def build(version, columns, states):
+        df = engine_frame if states is None else engine_frame[engine_frame['state'] == states[0]]
+        return df, 100 if states is None else 40
+    monkeypatch.setattr(data_processor, '_build_frame', build)
+    monkeypatch.setattr(data_processor, '_FRAMES', data_processor.OrderedDict())
+    monkeypatch.setenv(data_processor.ENGINE_CACHE_MB_ENV, str(150 / 1e6))
+
+    a, b = engine_frame['state'].unique()[:2]
+    full = data_processor.engine_frame_for('v1')
+    data_processor.engine_frame_for('v1', None, (a,))
+    assert data_processor.engine_frame_for('v1') is full  # a hit moves the full frame to the back
+    data_processor.engine_frame_for('v1', None, (b,))
+    assert list(data_processor._FRAMES) == [('v1', None, None), ('v1', None, (b,))]
+
+    data_processor.engine_frame_for('v2')
+    assert list(data_processor._FRAMES) == [('v2', None, None)]  # other versions are dropped
+
+
+def test_state_session_reads_only_its_partitions(engine_frame, dataset_dir, monkeypatch):
+    """get_selection for one state builds a state-scoped frame; the full frame is never loaded."""
+    def build(version, columns, states):
+        df = sort_for_filtering(compact_frame(scan_dataset(dataset_dir, columns=columns, states=states)))
+        return df, len(df)
+    monkeypatch.setattr(data_processor, '_build_frame', build)
+    monkeypatch.setattr(data_processor, '_FRAMES', data_processor.OrderedDict())
+    monkeypatch.setattr(dashboard_cache, 'get_dataset_extent',
+                        lambda: (None, engine_frame['date'].min().date(), engine_frame['date'].max().date()))
+
+    state = engine_frame['state'].value_counts().idxmax()
+    for _, window in selections(engine_frame):
+        expected = reference_selection(engine_frame, state, window)
+        same_rows(dashboard_cache._selection_for('v1', state, window)[list(expected.columns)], expected)
+    assert list(data_processor._FRAMES) == [('v1', None, (state,))]
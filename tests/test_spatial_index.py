@@ -0,0 +1,76 @@
+"""Point-to-region assignment through the STR-tree against a brute-force scan of every polygon."""
+import numpy as np
+import pytest
+
+from modules.spatial_index import build_polygon_index, assign_points
+
+
+def square(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]
+
+
+def feature(name, geometry_type, coordinates):
+    return {'type': 'Feature', 'properties': {'ST_NM': name}, 'geometry': {'type': geometry_type, 'coordinates': coordinates}}
+
+
+# West has a hole; East shares West's right edge; Islands is a multipolygon with one part inside West's hole
+BOUNDARIES = {'type': 'FeatureCollection', 'features': [
+    feature('West', 'Polygon', [square(0, 0, 10, 10), square(3, 3, 6, 6)]),
+    feature('East', 'Polygon', [square(10, 0, 20, 10)]),
+    feature('Islands', 'MultiPolygon', [[square(4, 4, 5, 5)], [[[25, 0], [30, 0], [27.5, 8], [25, 0]]]]),
+    {'type': 'Feature', 'properties': {'ST_NM': 'Empty'}, 'geometry': None},
+]}
+
+
+def crosses(x, y, ring):
+    """Even-odd crossings of a ray to the right of (x, y), same half-open rule as points_in_rings."""
+    count = 0
+    for (x1, y1), (x2, y2) in zip(ring[:-1], ring[1:]):
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            count += 1
+    return count
+
+
+def brute_force(geo_data, lon, lat):
+    """Feature id per point from every ring of every polygon, no index."""
+    result = []
+    for x, y in zip(lon, lat):
+        found = -1
+        for fid, f in enumerate(geo_data['features']):
+            geometry = f['geometry'] or {}
+            parts = [geometry['coordinates']] if geometry.get('type') == 'Polygon' else geometry.get('coordinates', [])
+            if any(sum(crosses(x, y, ring) for ring in part) % 2 for part in parts):
+                found = fid
+                break
+        result.append(found)
+    return np.array(result)
+
+
+EDGE_POINTS = [
+    (10, 5), (0, 5), (20, 5), (5, 0), (5, 10),  # outer and shared edges
+    (0, 0), (10, 10), (20, 0),                  # corners
+    (3, 4.5), (6, 4.5), (4.5, 3), (4.5, 6),     # hole edges
+    (4, 4.5), (5, 4.5), (27.5, 8), (25, 0),     # island edges and vertices
+]
+
+
+@pytest.mark.parametrize('node_size', [2, 16])
+def test_assign_points_matches_brute_force(node_size):
+    rng = np.random.default_rng(3)
+    lon = np.concatenate([rng.uniform(-5, 35, 3000), [p[0] for p in EDGE_POINTS], [-1, 22, 40, np.nan]])
+    lat = np.concatenate([rng.uniform(-5, 15, 3000), [p[1] for p in EDGE_POINTS], [5, 5, 40, 5]])
+
+    index = build_polygon_index(BOUNDARIES, node_size=node_size)
+    got = assign_points(index, lon, lat)
+    np.testing.assert_array_equal(got, brute_force(BOUNDARIES, lon, lat))
+    assert index['names'] == ['West', 'East', 'Islands', 'Empty']
+    assert set(got) == {-1, 0, 1, 2}
+
+
+def test_assign_points_regions():
+    index = build_polygon_index(BOUNDARIES, node_size=2)
+    lon = [1, 15, 4.5, 5.5, 27.5, 22, 50, 10, np.nan]
+    lat = [1, 5, 4.5, 5.5, 2, 5, 50, 5, 1]
+    # In West, East, the island in West's hole, the hole itself, the triangle, the gap, far away,
+    # the shared West/East edge (exactly one side), and a missing coordinate
+    np.testing.assert_array_equal(assign_points(index, lon, lat), [0, 1, 2, -1, 2, -1, -1, 1, -1])
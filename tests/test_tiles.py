@@ -0,0 +1,120 @@
+"""Heatmap tile pyramids: PNGs that decode, keys that follow the dataset version, a bounded disk cache."""
+import os
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from modules import dataset
+from modules.dashboard_cache import heatmap_key
+from modules.ingest import incremental_convert
+from modules.tiles import (
+    TILE_SIZE, HEAT_LEVELS, HEAT_PALETTE, LAYER_FILE, lonlat_to_pixels, render_zoom, build_tile_layer, load_layer,
+    evict_tiles,
+)
+
+AGE_COL = 'age_0_5'
+
+
+def decode_png(data):
+    """RGBA pixels of an 8-bit palette PNG, every chunk CRC checked (encode_png writes no row filters)."""
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    chunks, pos = {}, 8
+    while pos < len(data):
+        length, = struct.unpack('>I', data[pos:pos + 4])
+        kind, body = data[pos + 4:pos + 8], data[pos + 8:pos + 8 + length]
+        crc, = struct.unpack('>I', data[pos + 8 + length:pos + 12 + length])
+        assert crc == zlib.crc32(kind + body) & 0xffffffff, kind
+        chunks[kind] = chunks.get(kind, b'') + body
+        pos += 12 + length
+    assert b'IEND' in chunks
+
+    width, height, depth, color_type = struct.unpack('>IIBB', chunks[b'IHDR'][:10])
+    assert (depth, color_type) == (8, 3)
+    raw = np.frombuffer(zlib.decompress(chunks[b'IDAT']), dtype=np.uint8).reshape(height, width + 1)
+    assert not raw[:, 0].any()
+    palette = np.frombuffer(chunks[b'PLTE'], dtype=np.uint8).reshape(-1, 3)
+    alpha = np.frombuffer(chunks[b'tRNS'], dtype=np.uint8)
+    return np.column_stack([palette, alpha])[raw[:, 1:]]
+
+
+def points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(18, 24, n), rng.uniform(74, 82, n), rng.integers(1, 50, n).astype(np.float64)
+
+
+def disk_bytes(root):
+    return sum(os.path.getsize(os.path.join(folder, name)) for folder, _, names in os.walk(root) for name in names)
+
+
+def test_rendered_tile_decodes(tmp_path):
+    lat, lon, zoom = np.array([21.0]), np.array([78.0]), 6
+    assert render_zoom(lat, lon, np.array([5.0]), zoom, str(tmp_path))[0] >= 1
+
+    px, py = lonlat_to_pixels(lat, lon, zoom)
+    tx, ty = int(px[0]) // TILE_SIZE, int(py[0]) // TILE_SIZE
+    with open(tmp_path / str(zoom) / str(tx) / f"{ty}.png", 'rb') as f:
+        rgba = decode_png(f.read())
+
+    assert rgba.shape == (TILE_SIZE, TILE_SIZE, 4)
+    # The point's pixel is the hottest step of the gradient; far from it the tile is transparent
+    x, y = int(px[0]) - tx * TILE_SIZE, int(py[0]) - ty * TILE_SIZE
+    np.testing.assert_array_equal(rgba[y, x], HEAT_PALETTE[HEAT_LEVELS])
+    far = (np.abs(np.arange(TILE_SIZE)[:, None] - y) > 40) | (np.abs(np.arange(TILE_SIZE)[None, :] - x) > 40)
+    assert not rgba[..., 3][far].any()
+
+    image = pytest.importorskip('PIL.Image')
+    with image.open(tmp_path / str(zoom) / str(tx) / f"{ty}.png") as png:
+        np.testing.assert_array_equal(np.asarray(png.convert('RGBA')), rgba)
+
+
+def test_tile_key_follows_dataset_version(raw_csv, tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset, 'VERSION_TTL', 0.0)
+    with open(raw_csv, encoding='utf-8') as f:
+        header, *lines = f.readlines()
+    source, output = str(tmp_path / 'drop.csv'), str(tmp_path / 'uidai_dataset')
+    with open(source, 'w', encoding='utf-8') as f:
+        f.writelines([header] + lines[:len(lines) // 2])
+    incremental_convert([source], output, workers=1)
+
+    selection = (None, None, AGE_COL)
+    version = dataset.dataset_version(output)
+    key = heatmap_key(version, *selection)
+    assert heatmap_key(dataset.dataset_version(output), *selection) == key
+    root = str(tmp_path / 'tiles')
+    build_tile_layer(key, *points(100), zooms=[5], root=root)
+
+    with open(source, 'a', encoding='utf-8') as f:
+        f.writelines(lines[len(lines) // 2:])
+    incremental_convert([source], output, workers=1)
+
+    new_version = dataset.dataset_version(output)
+    assert new_version != version
+    # The appended dataset gets a new key, so the old pyramid is never served for it
+    assert heatmap_key(new_version, *selection) != key
+    assert load_layer(key, root) is not None and load_layer(heatmap_key(new_version, *selection), root) is None
+
+
+def test_eviction_keeps_cache_within_budget(tmp_path):
+    root = str(tmp_path / 'tiles')
+    keys = [f"layer{i}" for i in range(5)]
+    now = os.path.getmtime(tmp_path)
+    for seed, key in enumerate(keys):
+        build_tile_layer(key, *points(300, seed=seed), zooms=[5, 6], root=root, max_mb=1e6)
+
+    for key in keys:  # what eviction counts is what the layer holds on disk
+        path = os.path.join(root, key)
+        assert load_layer(key, root)['bytes'] + os.path.getsize(os.path.join(path, LAYER_FILE)) == disk_bytes(path)
+        os.utime(os.path.join(path, LAYER_FILE), (now - 100 * (len(keys) - keys.index(key)),) * 2)  # layer4 newest
+
+    budget = disk_bytes(os.path.join(root, keys[-1])) + disk_bytes(os.path.join(root, keys[-2]))
+    assert disk_bytes(root) > budget
+
+    removed = evict_tiles(root, max_mb=budget / 1e6, grace=0)
+    assert disk_bytes(root) <= budget
+    assert sorted(removed) == keys[:3]  # least recently used first
+    assert sorted(os.listdir(root)) == keys[3:]
+
+    # Layers inside the grace window stay even over budget
+    assert evict_tiles(root, max_mb=0, grace=3600 * 24 * 365 * 100) == []